@@ -0,0 +1,210 @@
+#!/usr/bin/env python
+
+"""
+Purpose: asyncio REST engine listing branches, pull requests and commits over one pooled
+keep-alive (HTTP/2 when available) client, with pages fetched concurrently
+"""
+
+import asyncio
+import importlib.util
+from datetime import datetime
+from functools import partial
+from typing import (
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from github import GithubException, Repository
+
+from delete_branches import transport
+from delete_branches.inventory import (
+    PER_PAGE,
+    BranchInventory,
+    BranchRecord,
+    last_page,
+)
+
+MAX_CONCURRENCY = 16
+TIMEOUT = 60
+
+T = TypeVar("T")
+
+
+def import_httpx() -> Any:
+    """
+    Import the optional httpx dependency of the async engine
+    """
+    try:
+        import httpx
+    except ImportError:
+        raise ValueError("--api rest-async requires the async extra (pip install 'delete-branches[async]')")
+    return httpx
+
+
+class AsyncGitHub:
+    """
+    Minimal asyncio GitHub REST client for the endpoints of this tool, sending requests through
+    the installed rate-limit scheduler and, with a token pool installed, each request with the
+    token of the pool with the most budget left
+
+    Parameter(s):
+    base_url   : GitHub API url
+    token      : GitHub token (unused with a token pool)
+    concurrency: maximum number of requests in flight (and pooled connections)
+    """
+
+    def __init__(self, base_url: str, token: Optional[str], concurrency: int = MAX_CONCURRENCY):
+        self.httpx = import_httpx()
+        self.pool = transport.HTTPSPooledConnection.pool
+        headers = {"Accept": "application/vnd.github+json", "User-Agent": "delete-branches"}
+        if token and self.pool is None:
+            headers["Authorization"] = f"Bearer {token}"
+        self.client = self.httpx.AsyncClient(
+            base_url=base_url.rstrip("/"),
+            headers=headers,
+            http2=importlib.util.find_spec("h2") is not None,
+            limits=self.httpx.Limits(max_connections=concurrency, max_keepalive_connections=concurrency),
+            timeout=TIMEOUT,
+        )
+        self.semaphore = asyncio.Semaphore(concurrency)
+        self.scheduler = transport.HTTPSPooledConnection.scheduler
+
+    async def __aenter__(self) -> "AsyncGitHub":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.client.aclose()
+
+    async def request(self, verb: str, url: str, params: Optional[Dict[str, Any]] = None) -> Any:
+        """
+        Send one request, raising GithubException on an error status
+
+        Parameter(s):
+        verb  : HTTP method
+        url   : url relative to the API url
+        params: query parameters
+        """
+
+        async def send() -> Any:
+            if self.pool is None:
+                async with self.semaphore:
+                    return await self.client.request(verb, url, params=params)
+            """every attempt, retries included, goes to the token with the most budget left"""
+            authorization = f"token {self.pool.authorization(self.pool.acquire('core'))}"
+            async with self.semaphore:
+                response = await self.client.request(verb, url, params=params, headers={"Authorization": authorization})
+            self.pool.observe(authorization, response.headers)
+            return response
+
+        if self.scheduler is not None:
+            full_url = str(self.client.base_url) + url
+            response = await self.scheduler.send_async(verb, full_url, send, (self.httpx.TransportError,))
+        else:
+            response = await send()
+        if response.status_code >= 400:
+            raise GithubException(
+                response.status_code, response.json() if response.content else None, dict(response.headers)
+            )
+        return response
+
+    async def paginate(self, url: str, params: Optional[Dict[str, Any]] = None) -> List[Dict[str, Any]]:
+        """
+        Return all items of a listing; the first page announces the last page, so the remaining
+        pages are fetched concurrently instead of following next links one by one
+
+        Parameter(s):
+        url   : listing url relative to the API url
+        params: query parameters
+        """
+        params = {**(params or {}), "per_page": PER_PAGE}
+        first = await self.request("GET", url, {**params, "page": 1})
+        pages = [first.json()]
+        requests = [
+            self.request("GET", url, {**params, "page": page}) for page in range(2, last_page(first.headers.get("Link")) + 1)
+        ]
+        pages.extend(response.json() for response in await asyncio.gather(*requests))
+        return [item for page in pages for item in page]
+
+    async def list_branches(self, full_name: str) -> List[BranchRecord]:
+        return [
+            BranchRecord(name=item["name"], protected=item["protected"], sha=item["commit"]["sha"])
+            for item in await self.paginate(f"/repos/{full_name}/branches")
+        ]
+
+    async def list_pulls(self, full_name: str) -> List[Tuple[str, str]]:
+        return [(item["base"]["ref"], item["head"]["ref"]) for item in await self.paginate(f"/repos/{full_name}/pulls")]
+
+    async def resolve_commit_dates(self, full_name: str, branches: List[BranchRecord]) -> None:
+        """
+        Set commit dates of branches, all commit requests in flight together (bounded by concurrency)
+
+        Parameter(s):
+        full_name: repository full name
+        branches : branch records without commit date
+        """
+        responses = await asyncio.gather(*(self.request("GET", f"/repos/{full_name}/commits/{b.sha}") for b in branches))
+        for branch, response in zip(branches, responses):
+            branch.commit_date = datetime.fromisoformat(response.json()["commit"]["committer"]["date"])
+
+
+def run(repo: Repository.Repository, call: Callable[[AsyncGitHub], Awaitable[T]]) -> T:
+    """
+    Run a coroutine against a client created for the repository (one event loop per call)
+
+    Parameter(s):
+    repo: github repository object (API url and token)
+    call: coroutine function taking the client
+    """
+
+    async def main() -> T:
+        token = None if transport.HTTPSPooledConnection.pool is not None else getattr(repo.requester.auth, "token", None)
+        async with AsyncGitHub(repo.requester.base_url, token) as gh:
+            return await call(gh)
+
+    return asyncio.run(main())
+
+
+def resolve_commit_dates_async(repo: Repository.Repository, branches: List[BranchRecord]) -> None:
+    """
+    Set commit dates of branches with concurrent commit requests
+
+    Parameter(s):
+    repo    : github repository object
+    branches: branch records without commit date
+    """
+    run(repo, lambda gh: gh.resolve_commit_dates(repo.full_name, branches))
+
+
+def list_pulls_async(repo: Repository.Repository) -> List[Tuple[str, str]]:
+    """
+    List open pull request (base, head) branch names with concurrent page requests
+
+    Parameter(s):
+    repo: github repository object
+    """
+    return run(repo, lambda gh: gh.list_pulls(repo.full_name))
+
+
+def build_inventory_async(repo: Repository.Repository) -> BranchInventory:
+    """
+    Build branch inventory listing branches and open pull requests concurrently; commit dates
+    are resolved later with concurrent requests, only for not-exempt branches
+
+    Parameter(s):
+    repo: github repository object
+    """
+
+    async def list_all(gh: AsyncGitHub) -> Tuple[List[BranchRecord], List[Tuple[str, str]]]:
+        branches, pulls = await asyncio.gather(gh.list_branches(repo.full_name), gh.list_pulls(repo.full_name))
+        return branches, pulls
+
+    records, pulls = run(repo, list_all)
+    return BranchInventory(
+        {record.name: record for record in records}, pulls, resolver=partial(resolve_commit_dates_async, repo)
+    )
@@ -0,0 +1,198 @@
+#!/usr/bin/env python
+
+"""
+Purpose: Persistent on-disk cache of branch metadata and listing-page ETags
+"""
+
+import json
+import os
+import sqlite3
+import threading
+import time
+import urllib.parse
+import zlib
+from datetime import datetime, timezone
+from typing import Iterable, Optional
+
+import requests
+
+from delete_branches.inventory import BranchRecord
+
+CACHE_FILE = "delete-branches.sqlite3"
+CACHEABLE_LISTINGS = ("/branches", "/pulls")
+CACHED_HEADERS = ("Link", "ETag", "Content-Type")
+SQL_CHUNK_SIZE = 500
+"""seconds a write waits for another process (shard worker) holding the database lock"""
+BUSY_TIMEOUT = 30.0
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS commits (
+    repo TEXT NOT NULL,
+    sha TEXT NOT NULL,
+    commit_date REAL NOT NULL,
+    accessed REAL NOT NULL,
+    PRIMARY KEY (repo, sha)
+);
+CREATE TABLE IF NOT EXISTS pages (
+    url TEXT PRIMARY KEY,
+    etag TEXT NOT NULL,
+    headers TEXT NOT NULL,
+    body BLOB NOT NULL,
+    accessed REAL NOT NULL
+);
+"""
+
+
+class BranchCache:
+    """
+    SQLite cache keyed by repository storing head sha -> commit date, and listing pages with
+    their ETags so later runs send conditional requests (304 responses do not count against
+    the rate limit)
+
+    Parameter(s):
+    cache_dir   : directory holding the cache database (restorable with actions/cache)
+    max_age_days: entries not used for longer than this are evicted
+    max_size_mb : least recently used pages are evicted above this size
+    """
+
+    def __init__(self, cache_dir: str, max_age_days: int = 30, max_size_mb: int = 200, clock=time.time):
+        os.makedirs(cache_dir, exist_ok=True)
+        self.path = os.path.join(cache_dir, CACHE_FILE)
+        self.max_age_days = max_age_days
+        self.max_size_mb = max_size_mb
+        self.clock = clock
+        self.hits = 0
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        """write-ahead log: shard workers sharing the cache read while one of them writes"""
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.executescript(SCHEMA)
+
+    def close(self) -> None:
+        with self.lock:
+            self.db.close()
+
+    """commit dates"""
+
+    def fill_commit_dates(self, repo: str, branches: Iterable[BranchRecord]) -> int:
+        """
+        Set commit dates of branches whose head sha is cached, returning the number filled
+
+        Parameter(s):
+        repo    : repository full name
+        branches: branch records (an inventory or a page of a streamed listing)
+        """
+        unresolved = {branch.sha: branch for branch in branches if branch.commit_date is None}
+        if not unresolved:
+            return 0
+        shas = list(unresolved)
+        filled = []
+        with self.lock:
+            """look up shas in chunks below the SQLite host parameter limit"""
+            for start in range(0, len(shas), SQL_CHUNK_SIZE):
+                end = start + SQL_CHUNK_SIZE
+                chunk = shas[start:end]
+                placeholders = ", ".join("?" * len(chunk))
+                query = f"SELECT sha, commit_date FROM commits WHERE repo = ? AND sha IN ({placeholders})"
+                filled.extend(self.db.execute(query, (repo, *chunk)).fetchall())
+            self.db.executemany(
+                "UPDATE commits SET accessed = ? WHERE repo = ? AND sha = ?",
+                [(self.clock(), repo, sha) for sha, _ in filled],
+            )
+            self.db.commit()
+        for sha, commit_date in filled:
+            unresolved[sha].commit_date = datetime.fromtimestamp(commit_date, timezone.utc)
+        return len(filled)
+
+    def store_commit_dates(self, repo: str, branches: Iterable[BranchRecord]) -> None:
+        """
+        Store commit dates resolved during the run
+
+        Parameter(s):
+        repo    : repository full name
+        branches: branch records (an inventory or a page of a streamed listing)
+        """
+        now = self.clock()
+        rows = [(repo, branch.sha, branch.commit_date.timestamp(), now) for branch in branches if branch.commit_date]
+        with self.lock:
+            self.db.executemany("INSERT OR REPLACE INTO commits VALUES (?, ?, ?, ?)", rows)
+            self.db.commit()
+
+    """listing pages"""
+
+    @staticmethod
+    def cacheable(verb: str, url: str) -> bool:
+        return verb == "GET" and urllib.parse.urlsplit(url).path.endswith(CACHEABLE_LISTINGS)
+
+    def etag(self, url: str) -> Optional[str]:
+        with self.lock:
+            row = self.db.execute("SELECT etag FROM pages WHERE url = ?", (url,)).fetchone()
+        return row[0] if row else None
+
+    def replay(self, url: str, response: requests.Response) -> requests.Response:
+        """
+        Turn a 304 response into the cached 200 response of the page
+        """
+        with self.lock:
+            row = self.db.execute("SELECT headers, body FROM pages WHERE url = ?", (url,)).fetchone()
+            self.db.execute("UPDATE pages SET accessed = ? WHERE url = ?", (self.clock(), url))
+            self.db.commit()
+            self.hits += 1
+        cached = requests.Response()
+        cached.status_code = 200
+        cached.url = url
+        cached.request = response.request
+        cached.headers.update(response.headers)
+        cached.headers.update(json.loads(row[0]))
+        cached._content = zlib.decompress(row[1])
+        return cached
+
+    def store_page(self, url: str, response: requests.Response) -> None:
+        if response.status_code != 200 or "ETag" not in response.headers:
+            return
+        headers = {key: response.headers[key] for key in CACHED_HEADERS if key in response.headers}
+        with self.lock:
+            self.db.execute(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?, ?, ?)",
+                (url, response.headers["ETag"], json.dumps(headers), zlib.compress(response.content), self.clock()),
+            )
+            self.db.commit()
+
+    def send(self, verb: str, url: str, headers: dict, request) -> requests.Response:
+        """
+        Send a request, making it conditional when a cached page exists
+
+        Parameter(s):
+        verb   : HTTP method
+        url    : request url
+        headers: request headers
+        request: callable sending the request with the given headers
+        """
+        if not self.cacheable(verb, url):
+            return request(headers)
+        etag = self.etag(url)
+        response = request({**headers, "If-None-Match": etag} if etag else headers)
+        if etag and response.status_code == 304:
+            return self.replay(url, response)
+        self.store_page(url, response)
+        return response
+
+    """eviction"""
+
+    def evict(self) -> None:
+        """
+        Drop entries unused for max_age_days, then least recently used pages above max_size_mb
+        """
+        cutoff = self.clock() - self.max_age_days * 86400
+        max_bytes = self.max_size_mb * 1024 * 1024
+        with self.lock:
+            self.db.execute("DELETE FROM commits WHERE accessed < ?", (cutoff,))
+            self.db.execute("DELETE FROM pages WHERE accessed < ?", (cutoff,))
+            size = self.db.execute("SELECT COALESCE(SUM(LENGTH(body)), 0) FROM pages").fetchone()[0]
+            for url, length in self.db.execute("SELECT url, LENGTH(body) FROM pages ORDER BY accessed").fetchall():
+                if size <= max_bytes:
+                    break
+                self.db.execute("DELETE FROM pages WHERE url = ?", (url,))
+                size -= length
+            self.db.commit()
+            self.db.execute("VACUUM")
@@ -4,32 +4,149 @@
 Purpose: Delete GitHub Branches
 """
 
+from __future__ import annotations
+
+import importlib
 import os
 import sys
 from contextlib import suppress
+from dataclasses import dataclass
 from datetime import datetime, timedelta, timezone
-from typing import Set, Tuple
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+    Union,
+)
 
 import click
-from github import (
-    Auth,
-    BadCredentialsException,
-    Github,
-    Repository,
-    UnknownObjectException,
-)
 
 from delete_branches import __version__
+from delete_branches.metrics import (
+    build_metrics,
+    write_github_outputs,
+    write_metrics_file,
+)
+from delete_branches.rules import BranchRules
+from delete_branches.scheduler import DEFAULT_POINTS_PER_MINUTE, RateLimitScheduler
+from delete_branches.sweep import (
+    RepoResult,
+    print_summary_table,
+    read_repo_list,
+    sweep,
+)
+
+if TYPE_CHECKING:
+    from github import (
+        Auth,
+        BadCredentialsException,
+        Consts,
+        Github,
+        Repository,
+        UnknownObjectException,
+    )
+
+    from delete_branches.cache import BranchCache
+    from delete_branches.daemon import BranchDaemon
+    from delete_branches.inventory import BranchInventory
+    from delete_branches.plan import DeletionPlan, RepoPlan
+    from delete_branches.policy import BranchPolicy
+    from delete_branches.protection import ProtectionRules
+    from delete_branches.state import RepoState, RunState
+    from delete_branches.token_pool import TokenPool, TokenUsage
+
+"""
+PyGithub (with requests, jwt and cryptography) and the modules using it are imported when API work
+begins, so `--version` and `--help` start without them
+"""
+GITHUB_NAMES = ("Auth", "BadCredentialsException", "Consts", "Github", "UnknownObjectException")
+
+
+def load_github() -> None:
+    """
+    Import the PyGithub names used by this module (names already set, e.g. patched, are kept)
+    """
+    github = importlib.import_module("github")
+    for name in GITHUB_NAMES:
+        globals().setdefault(name, getattr(github, name))
+
+
+def __getattr__(name: str) -> Any:
+    if name in GITHUB_NAMES:
+        load_github()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def lazy_function(module: str, name: str) -> Callable[..., Any]:
+    """
+    Return a function importing `module` on its first call
+
+    Parameter(s):
+    module: module name
+    name  : function name in the module
+    """
+
+    def call(*args: Any, **kwargs: Any) -> Any:
+        return getattr(importlib.import_module(module), name)(*args, **kwargs)
 
+    return call
 
-def get_auth() -> Github:
+
+INVENTORY_BACKENDS = {
+    "rest": lazy_function("delete_branches.inventory", "build_inventory"),
+    "rest-async": lazy_function("delete_branches.async_api", "build_inventory_async"),
+    "graphql": lazy_function("delete_branches.graphql_api", "build_inventory_graphql"),
+    "ls-remote": lazy_function("delete_branches.ls_remote", "build_inventory_ls_remote"),
+}
+
+
+def get_auth(
+    concurrency: int = 1,
+    scheduler: Optional[RateLimitScheduler] = None,
+    cache: Optional[BranchCache] = None,
+    tokens: Optional[Dict[str, TokenUsage]] = None,
+) -> Github:
     """
     Creates an instance of Github class to interact with GitHub API
+    (GITHUB_API_URL selects a GitHub Enterprise Server or a local API endpoint)
+
+    Parameter(s):
+    concurrency: number of concurrent requests sharing the connection pool
+    scheduler  : rate-limit scheduler pacing and retrying every request
+    cache      : cache making branch and pull request listings conditional requests
+    tokens     : primed usage of the pool tokens to use, by label (a shard worker's slice of the pool)
     """
+    from delete_branches import transport
+    from delete_branches.token_pool import PooledAuth, load_token_pool
+
+    load_github()
     try:
-        gh_token = os.environ["GH_TOKEN"]
-        gh = Github(auth=Auth.Token(gh_token), per_page=100)
-        gh.get_rate_limit()
+        base_url = os.environ.get("GITHUB_API_URL", Consts.DEFAULT_BASE_URL)
+        pool = load_token_pool(os.environ, base_url)
+        if pool is not None and tokens is not None:
+            pool = pool.subset(tokens)
+        auth = PooledAuth(pool) if pool is not None else Auth.Token(os.environ["GH_TOKEN"])
+        transport.install(scheduler, cache, pool)
+
+        """the scheduler paces and retries requests; fixed per-request delays would serialize the worker pool"""
+        pacing: Dict[str, Any] = {}
+        if scheduler is not None:
+            pacing = {"retry": None, "seconds_between_requests": None, "seconds_between_writes": None}
+        elif concurrency > 1:
+            pacing = {"seconds_between_requests": None, "seconds_between_writes": None}
+
+        gh = Github(auth=auth, base_url=base_url, per_page=100, pool_size=concurrency, **pacing)
+        if pool is not None:
+            if tokens is None:
+                pool.prime(gh.requester)
+        else:
+            gh.get_rate_limit()
         return gh
 
     except KeyError:
@@ -45,6 +162,7 @@ def get_repo(gh: Github, repo_url: str) -> Repository.Repository:
     Parameter(s):
     repo_url: repository url (e.g. https://github.com/{user/org}/repo.git)
     """
+    load_github()
     try:
         list_gh_substrings = ["https://github.com", "git@github.com:"]
         if not any(gh_substring in repo_url for gh_substring in list_gh_substrings):
@@ -64,31 +182,43 @@ def get_repo(gh: Github, repo_url: str) -> Repository.Repository:
         raise ValueError(f"{repo_url} repository not found ({e.status})")
 
 
-def get_exempt_branches(repo: Repository.Repository, set_exclude_branches: set) -> set:
+def get_exempt_branches(
+    repo: Repository.Repository,
+    set_exclude_branches: set,
+    inventory: Optional[BranchInventory] = None,
+    rules: Optional[BranchRules] = None,
+    protection: Optional[ProtectionRules] = None,
+) -> set:
     """
     Add default, protected, and PR base branches to build a set of exempt branches
-    Remove user specified branches from exempt branches if the specified branches do not exist
+    Add existing branches matching user exclude patterns (or outside user include patterns)
 
     Parameter(s):
-    repo                     : github repository object
-    set_exclude_branches: set of branch(es) excluded from delete via user inputs
+    repo                : github repository object
+    set_exclude_branches: set of branch(es) excluded from delete via user inputs (names, globs or regexes)
+    inventory           : branch inventory shared with get_branches_to_delete (built here when not given)
+    rules               : exclude and include patterns compiled once per run (built from set_exclude_branches when not given)
+    protection          : protection rules and rulesets of the repository (None relies on the protected flag of branches)
     """
+    from delete_branches.inventory import build_inventory, list_pulls
 
-    """use copy() here to prevent 'Exception Error: Set changed size during iteration'"""
-    set_exempt_branches = set_exclude_branches.copy()
-    all_branches = repo.get_branches()
-    set_all_branches = set()
+    if inventory is None:
+        inventory = build_inventory(repo)
+    if rules is None:
+        rules = BranchRules(set_exclude_branches)
+    if protection is not None:
+        protection.mark(inventory)
 
-    """iterate all branches"""
-    for branch in all_branches:
-        set_all_branches.add(branch.name)
+    """match every existing branch once against the compiled exclude patterns"""
+    set_branch_names = inventory.names
+    set_exempt_branches = rules.exclude.filter(set_branch_names)
+    print(f"Refined User Exclude Branch(es): {set_exempt_branches}") if len(set_exempt_branches) else ""
 
-    """remove branch from set_exempt_branches if the branch is not found in existing branches"""
-    if len(set_exclude_branches) > 0:
-        for user_exclude_branch in set_exclude_branches:
-            if user_exclude_branch not in set_all_branches:
-                set_exempt_branches.remove(user_exclude_branch)
-        print(f"Refined User Exclude Branch(es): {set_exempt_branches}") if len(set_exempt_branches) else ""
+    """branches outside the include patterns are exempt"""
+    set_not_included_branches = rules.not_included(set_branch_names)
+    if rules.include:
+        set_exempt_branches |= set_not_included_branches
+        print(f"Not Included Branch(es)  : {len(set_not_included_branches)}")
 
     """add to set_exempt_branch - default branch"""
     default_branch = repo.default_branch
@@ -96,18 +226,14 @@ def get_exempt_branches(repo: Repository.Repository, set_exclude_branches: set)
     print(f"Default Branch           : {default_branch}")
 
     """add protected branch to set_exempt_branch"""
-    for branch in all_branches:
-        if branch.protected:
-            set_exempt_branches.add(branch.name)
-            print(f"Protected Branch         : {branch.name}")
+    for branch in inventory.protected():
+        set_exempt_branches.add(branch.name)
+        print(f"Protected Branch         : {branch.name}")
 
     """add to set_exempt_branch - PR head branch"""
-    pulls = repo.get_pulls()
-    for pull in pulls:
-        base_branch = pull.base.ref
+    pulls = list_pulls(repo) if inventory.pulls is None else inventory.pulls
+    for base_branch, head_branch in pulls:
         set_exempt_branches.add(base_branch)
-
-        head_branch = pull.head.ref
         set_exempt_branches.add(head_branch)
         print(f"Pull Request Head Branch : {head_branch}")
 
@@ -115,7 +241,13 @@ def get_exempt_branches(repo: Repository.Repository, set_exclude_branches: set)
 
 
 def get_branches_to_delete(
-    repo: Repository.Repository, set_exempt_branches: set, branch_max_idle: datetime
+    repo: Repository.Repository,
+    set_exempt_branches: set,
+    branch_max_idle: datetime,
+    inventory: Optional[BranchInventory] = None,
+    merged: bool = False,
+    state: Optional[RepoState] = None,
+    policy: Optional[BranchPolicy] = None,
 ) -> Tuple[list, int]:
     """
     get to-be-deleted branches from not-exempt branches
@@ -124,20 +256,56 @@ def get_branches_to_delete(
     repo               : github repository object
     set_exempt_branches: set of exempt branches excluded from delete
     branch_max_idle    : datetime on maximum number of days that the branch has been idle
+    inventory          : branch inventory shared with get_exempt_branches (built here when not given)
+    merged             : also select branches merged into the default branch regardless of idle days
+    state              : branch heads of the previous run (unchanged branches reuse their commit date)
+    policy             : policy the selected branches must also match (None keeps them all)
     """
+    from delete_branches.graphql_api import get_merged_branches
+    from delete_branches.inventory import build_inventory
+
+    if inventory is None:
+        inventory = build_inventory(repo)
+
     list_branches_to_delete = []
-    total_branch_count = 0
-    count_not_exempt_branch = 0
-    for branch in repo.get_branches():
-        total_branch_count += 1
-        if branch.name not in set_exempt_branches:
-            count_not_exempt_branch += 1
-            if branch_max_idle > branch.commit.commit.committer.date:
-                list_branches_to_delete.append(branch.name)
+    list_active_branches = []
+    total_branch_count = len(inventory)
+    list_not_exempt_branches = [branch for branch in inventory if branch.name not in set_exempt_branches]
+    count_not_exempt_branch = len(list_not_exempt_branches)
+
+    """with run state, only branches whose head moved since the last run need their commit date resolved"""
+    list_changed_branches = list_not_exempt_branches
+    if state is not None:
+        list_changed_branches = state.fill_commit_dates(list_not_exempt_branches)
+
+    """resolve commit dates of not-exempt branches in batches when the inventory supports it"""
+    inventory.resolve_commit_dates(list_changed_branches)
+    for branch in list_not_exempt_branches:
+        if branch_max_idle > branch.get_commit_date():
+            list_branches_to_delete.append(branch)
+        else:
+            list_active_branches.append(branch)
 
     print(f"\nTotal Number of Branches                         : {total_branch_count}")
     print(f"Total Number of Branches (Exempt-From-Delete)    : {len(set_exempt_branches)}")
     print(f"Total Number of Branches (Not-Exempt-From-Delete): {count_not_exempt_branch}")
+    if state is not None:
+        count_crossed_branch = len(state.crossed(list_branches_to_delete, branch_max_idle))
+        print(f"Total Number of Branches (Changed-Since-Last-Run): {len(list_changed_branches)}")
+        print(f"Total Number of Branches (Crossed-Idle-Threshold): {count_crossed_branch}")
+        state.record(list_not_exempt_branches)
+
+    """only branches not already selected as idle need a merged check, compared in batches"""
+    if merged:
+        set_merged_branches = get_merged_branches(repo, [branch.name for branch in list_active_branches])
+        list_branches_to_delete.extend(branch for branch in list_active_branches if branch.name in set_merged_branches)
+        print(f"Total Number of Branches (Merged-Not-Idle)       : {len(set_merged_branches)}")
+
+    """the policy is evaluated over one table of the selected branches' attributes"""
+    if policy is not None:
+        count_selected_branch = len(list_branches_to_delete)
+        list_branches_to_delete = policy.select(repo, list_branches_to_delete)
+        print(f"Total Number of Branches (Not-Matching-Policy)   : {count_selected_branch - len(list_branches_to_delete)}")
 
     return list_branches_to_delete, count_not_exempt_branch
 
@@ -148,35 +316,35 @@ def delete_branches(
     max_idle_days: int,
     list_branches_to_delete: list,
     count_not_exempt_branch: int,
-) -> bool:
+    concurrency: int = 1,
+    batch_size: int = 1,
+    local_repo: Optional[str] = None,
+) -> Tuple[int, int]:
     """
-    delete branches
+    delete branches, returning the number of branches deleted and failed
 
     Parameter(s):
     repo                   : github repository object
     max_idle_days          : maximum number of days that the branch has been idle (without new commits)
-    list_branches_to_delete: list of branches to delete
+    list_branches_to_delete: list of branch records (with sha and commit date from selection) to delete
     count_not_exempt_branch: number of branches not exempt from delete
+    concurrency            : maximum number of concurrent delete requests
+    batch_size             : number of branch refs deleted per round trip (1 deletes one branch per REST request)
+    local_repo             : local clone path deleting with `git push --delete` when batched
     """
-    dry_run_msg = "(MOCK) " if dry_run else "✅ "
+    from delete_branches.deletion import iter_deletes, print_deletes
+
     print(
         f"\nFrom {count_not_exempt_branch} Not-Exempt-From-Delete branch(es), "
         + f"{len(list_branches_to_delete)} branch is idle more than {max_idle_days} day(s)"
     )
     print("-" * 90)
     if len(list_branches_to_delete) > 0:
-        for branch_to_delete in list_branches_to_delete:
-            branch = repo.get_branch(branch_to_delete)
-            branch_last_commit_time = branch.commit.commit.committer.date.strftime("%Y-%m-%d %H:%M:%S")
-
-            ref = repo.get_git_ref(f"heads/{branch_to_delete}")
-            ref.delete() if not dry_run else ""
-
-            print(f"{dry_run_msg}Delete branch - last update UTC {branch_last_commit_time}: {branch_to_delete}")
-    else:
-        print("There is no branch to delete")
+        deletes = iter_deletes(repo, list_branches_to_delete, dry_run, concurrency, batch_size, local_repo)
+        return print_deletes(deletes, dry_run)
 
-    return True
+    print("There is no branch to delete")
+    return 0, 0
 
 
 def build_set_exclude_branches(exclude_branches: str) -> Set[str]:
@@ -197,43 +365,705 @@ def build_set_exclude_branches(exclude_branches: str) -> Set[str]:
         return set()
 
 
+def get_org_repos(gh: Github, org: str) -> List[Repository.Repository]:
+    """
+    Get all non-archived repositories of an organization (branches of archived repositories cannot be deleted)
+
+    Parameter(s):
+    gh : github object
+    org: organization name
+    """
+    load_github()
+    try:
+        return [repo for repo in gh.get_organization(org).get_repos(type="all") if not repo.archived]
+
+    except UnknownObjectException as e:
+        raise ValueError(f"{org} organization not found ({e.status})")
+
+
+@dataclass
+class RunOptions:
+    """
+    Options applied to every repository of the run
+
+    Attribute(s):
+    dry_run             : mock delete when true
+    max_idle_days       : maximum number of days that the branch has been idle (without new commits)
+    branch_max_idle     : datetime on maximum number of days that the branch has been idle
+    set_exclude_branches: set of branch(es) excluded from delete via user inputs
+    api                 : API used to list branches and pull requests
+    concurrency         : maximum number of concurrent delete requests
+    merged              : also delete branches merged into the default branch
+    stream              : delete page by page while listing instead of listing all branches first
+    local_repo          : local clone path branches and commit dates are read from (None lists through the API)
+    delete_batch_size   : number of branch refs deleted per round trip (1 deletes one branch per REST request)
+    rules               : exclude and include patterns compiled once for all repositories
+    cache               : cache of commit dates by head sha (None disables caching)
+    state               : run state file of branch heads per repository (None re-examines every branch)
+    plan                : deletion plan the selected branches are added to (None writes no plan)
+    policy              : policy the selected branches must also match (None keeps them all)
+    """
+
+    dry_run: bool
+    max_idle_days: int
+    branch_max_idle: datetime
+    set_exclude_branches: Set[str]
+    api: str = "rest"
+    concurrency: int = 1
+    merged: bool = False
+    stream: bool = False
+    local_repo: Optional[str] = None
+    delete_batch_size: int = 1
+    rules: Optional[BranchRules] = None
+    cache: Optional[BranchCache] = None
+    state: Optional[RunState] = None
+    plan: Optional[DeletionPlan] = None
+    policy: Optional[BranchPolicy] = None
+
+
+def build_repo_inventory(
+    repo: Repository.Repository, options: RunOptions
+) -> Tuple[BranchInventory, Optional[ProtectionRules]]:
+    """
+    List branches once for both exemption and idle-selection phases; protection rules and rulesets
+    are fetched once and matched against every branch in memory
+
+    Parameter(s):
+    repo   : github repository object
+    options: options applied to every repository
+    """
+    from delete_branches.local_repo import build_inventory_local
+    from delete_branches.ls_remote import build_inventory_ls_remote
+    from delete_branches.protection import get_protection_rules
+
+    protection = get_protection_rules(repo)
+    if options.local_repo:
+        inventory = build_inventory_local(repo, options.local_repo, protection)
+    elif options.api == "ls-remote":
+        inventory = build_inventory_ls_remote(repo, protection=protection)
+    else:
+        inventory = INVENTORY_BACKENDS[options.api](repo)
+
+    """only resolve commit dates of branches whose head sha moved since the cached run"""
+    if options.cache is not None:
+        cached_dates = options.cache.fill_commit_dates(repo.full_name, inventory)
+        print(f"Cached Commit Date(s)    : {cached_dates}")
+    return inventory, protection
+
+
+def process_repo(
+    gh: Github, target: Union[str, Repository.Repository], options: RunOptions, scheduler: RateLimitScheduler
+) -> RepoResult:
+    """
+    Run exemption, selection and deletion for one repository
+
+    Parameter(s):
+    gh       : github object
+    target   : repository url or repository object
+    options  : options applied to every repository
+    scheduler: rate-limit scheduler recording usage per phase
+    """
+    from delete_branches.pipeline import run_pipeline
+
+    result = RepoResult(repo=target if isinstance(target, str) else target.full_name)
+    try:
+        with scheduler.phase("repo"):
+            repo = get_repo(gh, target) if isinstance(target, str) else target
+        result.repo = repo.full_name
+        print(f"Repository               : {repo.full_name}")
+        repo_state = options.state.repo(repo.full_name) if options.state is not None else None
+        repo_plan = options.plan.repo(repo.full_name) if options.plan is not None else None
+        if repo_state is not None and repo_state.last_run is not None:
+            print(f"Last Run (UTC)           : {repo_state.last_run.strftime('%Y-%m-%d %H:%M:%S')}")
+
+        """stream pages of branches through exemption, selection and deletion"""
+        if options.stream:
+            with scheduler.phase("pipeline"):
+                counts = run_pipeline(
+                    repo,
+                    options.api,
+                    options.set_exclude_branches,
+                    options.branch_max_idle,
+                    options.dry_run,
+                    options.concurrency,
+                    options.merged,
+                    options.cache,
+                    options.local_repo,
+                    options.delete_batch_size,
+                    options.rules,
+                    repo_state,
+                    repo_plan,
+                    options.policy,
+                )
+            result.total = counts.total
+            result.exempt = counts.exempt
+            result.not_exempt = counts.not_exempt
+            result.idle = counts.idle
+            result.deleted = counts.deleted
+            if counts.failed:
+                result.error = f"{counts.failed} branch delete(s) failed"
+            return result
+
+        with scheduler.phase("inventory"):
+            inventory, protection = build_repo_inventory(repo, options)
+
+        """build exempt branches"""
+        with scheduler.phase("exemption"):
+            set_exempt_branches = get_exempt_branches(
+                repo, options.set_exclude_branches, inventory, options.rules, protection
+            )
+
+        """get list of to-be-deleted branches and number of not-exempt branch"""
+        with scheduler.phase("selection"):
+            list_branches_to_delete, count_not_exempt_branch = get_branches_to_delete(
+                repo, set_exempt_branches, options.branch_max_idle, inventory, options.merged, repo_state, options.policy
+            )
+        if options.cache is not None:
+            options.cache.store_commit_dates(repo.full_name, inventory)
+        if repo_plan is not None:
+            repo_plan.add(list_branches_to_delete)
+
+        """delete to-be-deleted branches"""
+        with scheduler.phase("deletion"):
+            deleted, failed = delete_branches(
+                repo,
+                options.dry_run,
+                options.max_idle_days,
+                list_branches_to_delete,
+                count_not_exempt_branch,
+                options.concurrency,
+                options.delete_batch_size,
+                options.local_repo,
+            )
+
+        result.total = len(inventory)
+        result.exempt = len(set_exempt_branches)
+        result.not_exempt = count_not_exempt_branch
+        result.idle = len(list_branches_to_delete)
+        result.deleted = deleted
+        if failed:
+            result.error = f"{failed} branch delete(s) failed"
+
+    except Exception as e:
+        print(f"Error: {e}\n")
+        result.error = str(e)
+
+    return result
+
+
+def index_repo(
+    gh: Github,
+    target: Union[str, Repository.Repository],
+    options: RunOptions,
+    scheduler: RateLimitScheduler,
+    branch_daemon: BranchDaemon,
+) -> RepoResult:
+    """
+    Run exemption and selection for one repository and hand its branches to the daemon, which
+    deletes idle branches as their deadlines pass
+
+    Parameter(s):
+    gh           : github object
+    target       : repository url or repository object
+    options      : options applied to every repository
+    scheduler    : rate-limit scheduler recording usage per phase
+    branch_daemon: daemon keeping the branch index
+    """
+    from delete_branches.inventory import list_pulls
+
+    result = RepoResult(repo=target if isinstance(target, str) else target.full_name)
+    try:
+        with scheduler.phase("repo"):
+            repo = get_repo(gh, target) if isinstance(target, str) else target
+        result.repo = repo.full_name
+        print(f"Repository               : {repo.full_name}")
+
+        with scheduler.phase("inventory"):
+            inventory, protection = build_repo_inventory(repo, options)
+
+        """pull requests are kept apart from the other exemptions, as webhooks open and close them"""
+        with scheduler.phase("exemption"):
+            if inventory.pulls is None:
+                inventory.pulls = list_pulls(repo)
+            set_exempt_branches = get_exempt_branches(
+                repo, options.set_exclude_branches, inventory, options.rules, protection
+            )
+
+        """resolve commit dates of not-exempt branches, so each is scheduled at its idle deadline"""
+        with scheduler.phase("selection"):
+            list_branches_to_delete, count_not_exempt_branch = get_branches_to_delete(
+                repo, set_exempt_branches, options.branch_max_idle, inventory
+            )
+        if options.cache is not None:
+            options.cache.store_commit_dates(repo.full_name, inventory)
+        branch_daemon.add_repo(repo, inventory, protection, inventory.pulls)
+
+        result.total = len(inventory)
+        result.exempt = len(set_exempt_branches)
+        result.not_exempt = count_not_exempt_branch
+        result.idle = len(list_branches_to_delete)
+
+    except Exception as e:
+        print(f"Error: {e}\n")
+        result.error = str(e)
+
+    return result
+
+
+def run_daemon(
+    gh: Github,
+    targets: List[Union[str, Repository.Repository]],
+    options: RunOptions,
+    scheduler: RateLimitScheduler,
+    repo_concurrency: int,
+    webhook_host: str,
+    webhook_port: int,
+) -> List[RepoResult]:
+    """
+    Index the branches of every repository, then serve webhooks and delete branches as they cross
+    the idle threshold until interrupted
+
+    Parameter(s):
+    gh              : github object
+    targets         : repository urls or repository objects
+    options         : options applied to every repository
+    scheduler       : rate-limit scheduler recording usage per phase
+    repo_concurrency: maximum number of repositories indexed concurrently
+    webhook_host    : address the webhook server listens on
+    webhook_port    : port the webhook server listens on
+    """
+    from delete_branches.daemon import BranchDaemon, serve
+
+    if options.stream or options.local_repo or options.merged or options.state or options.plan or options.policy:
+        raise ValueError(
+            "--webhook-port keeps its own branch index "
+            + "(without --stream, --local-repo, --merged, --state-file, --plan-out or --policy)"
+        )
+    if not targets:
+        raise ValueError("--webhook-port requires one of --repo-url, --repo-list or --org")
+    try:
+        webhook_secret = os.environ["WEBHOOK_SECRET"]
+    except KeyError:
+        raise KeyError("WEBHOOK_SECRET (environment variable) not found")
+
+    branch_daemon = BranchDaemon(
+        options.max_idle_days,
+        options.rules or BranchRules(options.set_exclude_branches),
+        options.dry_run,
+        options.concurrency,
+        options.delete_batch_size,
+    )
+    results = sweep(targets, lambda target: index_repo(gh, target, options, scheduler, branch_daemon), repo_concurrency)
+    with scheduler.phase("daemon"):
+        serve(branch_daemon, webhook_host, webhook_port, webhook_secret)
+
+    for result in results:
+        index = branch_daemon.repos.get(result.repo)
+        if index is not None:
+            result.deleted += index.deleted
+            if index.failed:
+                result.error = f"{index.failed} branch delete(s) failed"
+    return results
+
+
+def check_targets(
+    targets: List[Union[str, Repository.Repository]],
+    org: Optional[str],
+    local_repo: Optional[str],
+    applied_plan: Optional[DeletionPlan],
+    plan_out: Optional[str],
+    processes: int = 1,
+    webhook_port: Optional[int] = None,
+) -> None:
+    """
+    Check that the repository options select repositories one way
+
+    Parameter(s):
+    targets     : repository urls from --repo-url and --repo-list
+    org         : organization name
+    local_repo  : local clone path
+    applied_plan: deletion plan applied instead of selecting branches
+    plan_out    : deletion plan output path
+    processes   : number of worker processes repositories are sharded across
+    webhook_port: port of the webhook server (None runs once)
+    """
+    if processes > 1 and (applied_plan is not None or local_repo or webhook_port is not None):
+        raise ValueError(
+            "--processes shards --repo-url, --repo-list and --org sweeps "
+            + "(without --apply-plan, --local-repo or --webhook-port)"
+        )
+    if applied_plan is not None:
+        if targets or org or plan_out:
+            raise ValueError(
+                "--apply-plan takes repositories from the plan (without --repo-url, --repo-list, --org or --plan-out)"
+            )
+        if local_repo and len(applied_plan.repos) > 1:
+            raise ValueError("--local-repo requires a plan of a single repository")
+        return
+    if not targets and not org:
+        raise ValueError("one of --repo-url, --repo-list or --org is required")
+    if local_repo and (org or len(targets) > 1):
+        raise ValueError("--local-repo requires a single --repo-url")
+
+
+def apply_repo_plan(
+    gh: Github, full_name: str, repo_plan: RepoPlan, options: RunOptions, scheduler: RateLimitScheduler
+) -> RepoResult:
+    """
+    Delete the planned branches of one repository that still point at their planned head, without
+    listing or selecting branches again
+
+    Parameter(s):
+    gh       : github object
+    full_name: repository full name
+    repo_plan: planned branches of the repository
+    options  : options applied to every repository
+    scheduler: rate-limit scheduler recording usage per phase
+    """
+    from delete_branches.deletion import iter_deletes, print_deletes
+    from delete_branches.graphql_api import PAGE_SIZE
+    from delete_branches.plan import compare_heads
+
+    result = RepoResult(repo=full_name, total=len(repo_plan.entries), not_exempt=len(repo_plan.entries))
+    try:
+        with scheduler.phase("repo"):
+            repo = gh.get_repo(full_name)
+        print(f"Repository               : {repo.full_name}")
+
+        """compare-and-delete: branches whose head moved since the plan was written are skipped"""
+        with scheduler.phase("comparison"):
+            list_branches_to_delete, skipped = compare_heads(repo, repo_plan.entries)
+        for name, reason in skipped.items():
+            print(f"⏭️  Skipped branch - {name}: {reason}")
+        print(
+            f"\nFrom {len(repo_plan.entries)} planned branch(es), "
+            + f"{len(list_branches_to_delete)} branch(es) still at the planned head"
+        )
+        print("-" * 90)
+
+        """batched deletes only remove a ref still at its planned sha, so a push after the comparison keeps the branch"""
+        with scheduler.phase("deletion"):
+            batch_size = options.delete_batch_size if options.delete_batch_size > 1 else PAGE_SIZE
+            deletes = iter_deletes(
+                repo, list_branches_to_delete, options.dry_run, options.concurrency, batch_size, options.local_repo
+            )
+            deleted, failed = print_deletes(deletes, options.dry_run)
+
+        result.idle = len(list_branches_to_delete)
+        result.deleted = deleted
+        if failed:
+            result.error = f"{failed} branch delete(s) failed"
+
+    except Exception as e:
+        print(f"Error: {e}\n")
+        result.error = str(e)
+
+    return result
+
+
+def print_run_summary(
+    results: List[RepoResult],
+    scheduler: RateLimitScheduler,
+    cache: Optional[BranchCache],
+    pool: Optional[TokenPool],
+) -> None:
+    """
+    Print the per-repository table, API budget per phase and per token, and cache hits of the run
+
+    Parameter(s):
+    results  : per-repository results
+    scheduler: rate-limit scheduler holding usage per phase
+    cache    : branch cache of the run
+    pool     : token pool of the run (None with a single token)
+    """
+    if len(results) > 1:
+        print_summary_table(results)
+    scheduler.print_summary()
+    if pool is not None:
+        pool.print_summary()
+    if cache is not None:
+        print(f"Cache Hits (304)         : {cache.hits}")
+
+
+def save_run(options: RunOptions, plan_out: Optional[str], run_time: datetime) -> None:
+    """
+    Write the run state and the deletion plan of the run when requested
+
+    Parameter(s):
+    options : options applied to every repository
+    plan_out: deletion plan output path
+    run_time: time of the run
+    """
+    if options.state is not None:
+        options.state.save(run_time, options.branch_max_idle)
+    if options.plan is not None and plan_out:
+        options.plan.save(plan_out, run_time)
+        print(f"Deletion Plan            : {plan_out}")
+
+
 @click.command()
 @click.option("--dry-run", required=False, type=bool, default=True, help="default: true")
-@click.option("--repo-url", required=True, help="e.g. https://github.com/{owner}/{repo}")
-@click.option("--exclude-branches", required=False, type=str, help="e.g. 'exclude-branch-1, exclude-branch-2'")
-@click.option("--max-idle-days", required=True, type=int, help="Max. no. of idle days (without commits)")
+@click.option("--repo-url", required=False, multiple=True, help="e.g. https://github.com/{owner}/{repo} (repeatable)")
+@click.option(
+    "--repo-list", required=False, type=click.Path(exists=True, dir_okay=False), help="File with one repository url per line"
+)
+@click.option("--org", required=False, type=str, help="Process all non-archived repositories of the organization")
+@click.option(
+    "--repo-concurrency",
+    required=False,
+    type=click.IntRange(min=1),
+    default=4,
+    help="Max. repositories processed concurrently, default: 4",
+)
+@click.option("--exclude-branches", required=False, type=str, help="e.g. 'exclude-branch-1, release/*, ^renovate/.*'")
+@click.option(
+    "--include-branches", required=False, type=str, help="Only delete matching branches, e.g. 'feature/*, ^fix-.*'"
+)
+@click.option("--max-idle-days", required=False, type=int, help="Max. no. of idle days (without commits)")
+@click.option(
+    "--policy",
+    required=False,
+    type=str,
+    help="Expression idle branches must also match, e.g. 'author != \"release-bot\" and behind > 100'",
+)
+@click.option(
+    "--merged",
+    required=False,
+    type=bool,
+    default=False,
+    help="Also delete branches merged into the default branch, default: false",
+)
+@click.option(
+    "--stream",
+    required=False,
+    type=bool,
+    default=False,
+    help="Delete page by page while branches are listed, default: false",
+)
+@click.option(
+    "--local-repo",
+    required=False,
+    type=click.Path(exists=True, file_okay=False),
+    help="Read branches and commit dates from this local clone (single repository)",
+)
+@click.option(
+    "--delete-batch-size",
+    required=False,
+    type=click.IntRange(min=1, max=100),
+    default=1,
+    help="Branches deleted per GraphQL mutation or git push (with --local-repo), default: 1 (REST delete per branch)",
+)
+@click.option("--api", required=False, type=click.Choice(list(INVENTORY_BACKENDS)), default="rest", help="default: rest")
+@click.option(
+    "--concurrency", required=False, type=click.IntRange(min=1), default=1, help="Max. concurrent deletes, default: 1"
+)
+@click.option(
+    "--processes",
+    required=False,
+    type=click.IntRange(min=1),
+    default=1,
+    help="Worker processes repositories are sharded across (each with its own session and a share of --rate-budget "
+    + "and --repo-concurrency), default: 1",
+)
+@click.option(
+    "--rate-budget",
+    required=False,
+    type=click.IntRange(min=1),
+    default=DEFAULT_POINTS_PER_MINUTE,
+    help=f"Max. API points per minute (read: 1, write: 5), default: {DEFAULT_POINTS_PER_MINUTE}",
+)
+@click.option(
+    "--rate-limit-reserve",
+    required=False,
+    type=click.IntRange(min=0),
+    default=0,
+    help="API requests left unused before waiting for rate-limit reset, default: 0",
+)
+@click.option("--cache-dir", required=False, type=click.Path(file_okay=False), help="Directory of the branch cache (opt-in)")
+@click.option(
+    "--cache-max-age-days",
+    required=False,
+    type=click.IntRange(min=0),
+    default=30,
+    help="Evict cache entries unused for more days, default: 30",
+)
+@click.option(
+    "--cache-max-size-mb",
+    required=False,
+    type=click.IntRange(min=0),
+    default=200,
+    help="Evict least recently used cache pages above this size, default: 200",
+)
+@click.option(
+    "--state-file",
+    required=False,
+    type=click.Path(dir_okay=False),
+    help="Run state of branch heads; later runs only re-examine changed branches (opt-in)",
+)
+@click.option(
+    "--plan-out",
+    required=False,
+    type=click.Path(dir_okay=False),
+    help="Write the branches selected for delete (branch, sha, last commit date, reason) as JSON",
+)
+@click.option(
+    "--apply-plan",
+    required=False,
+    type=click.Path(exists=True, dir_okay=False),
+    help="Delete the branches of a plan still at their planned sha, without listing or selection",
+)
+@click.option(
+    "--webhook-port",
+    required=False,
+    type=click.IntRange(min=0, max=65535),
+    help="Run as a service: keep a branch index updated from webhooks (signed with WEBHOOK_SECRET) "
+    + "and delete branches as they cross --max-idle-days",
+)
+@click.option(
+    "--webhook-host", required=False, type=str, default="127.0.0.1", help="Webhook server address, default: 127.0.0.1"
+)
+@click.option("--metrics-file", required=False, type=click.Path(dir_okay=False), help="Write per-phase API metrics as JSON")
 @click.version_option(version=__version__)
-def main(dry_run: bool, repo_url: str, exclude_branches: str, max_idle_days: int):
+def main(
+    dry_run: bool,
+    repo_url: Tuple[str, ...],
+    repo_list: Optional[str],
+    org: Optional[str],
+    repo_concurrency: int,
+    exclude_branches: str,
+    include_branches: str,
+    max_idle_days: int,
+    policy: Optional[str],
+    merged: bool,
+    stream: bool,
+    local_repo: Optional[str],
+    delete_batch_size: int,
+    api: str,
+    concurrency: int,
+    processes: int,
+    rate_budget: int,
+    rate_limit_reserve: int,
+    cache_dir: Optional[str],
+    cache_max_age_days: int,
+    cache_max_size_mb: int,
+    state_file: Optional[str],
+    plan_out: Optional[str],
+    apply_plan: Optional[str],
+    webhook_port: Optional[int],
+    webhook_host: str,
+    metrics_file: Optional[str],
+):
+    if max_idle_days is None and not apply_plan:
+        raise click.UsageError("Missing option '--max-idle-days'.")
+
+    from delete_branches import transport
+    from delete_branches.cache import BranchCache
+    from delete_branches.inventory import PULLS_CONCURRENCY
+    from delete_branches.plan import DeletionPlan
+    from delete_branches.policy import BranchPolicy
+    from delete_branches.shard import shard_config, sweep_processes
+    from delete_branches.state import RunState
+
     print(
         f"\n🚀 Starting Delete GitHub Branches (dry-run: {dry_run}, exclude-branches: "
-        + f"{exclude_branches}, max-idle-days: {max_idle_days})\n"
+        + f"{exclude_branches}, max-idle-days: {max_idle_days}, merged: {merged}, api: {api})\n"
     )
 
+    scheduler = RateLimitScheduler(points_per_minute=rate_budget, reserve=rate_limit_reserve)
+    cache = BranchCache(cache_dir, cache_max_age_days, cache_max_size_mb) if cache_dir else None
     try:
-        gh = get_auth()
-        repo = get_repo(gh, repo_url)
-        set_exclude_branches = build_set_exclude_branches(exclude_branches)
-        with suppress(ValueError):
+        targets: List[Union[str, Repository.Repository]] = list(repo_url)
+        if repo_list:
+            targets.extend(read_repo_list(repo_list))
+        applied_plan = DeletionPlan.load(apply_plan) if apply_plan else None
+        check_targets(targets, org, local_repo, applied_plan, plan_out, processes, webhook_port)
+        branch_policy = BranchPolicy(policy) if policy else None
+
+        with scheduler.phase("auth"):
+            gh = get_auth(max(concurrency, PULLS_CONCURRENCY) * repo_concurrency, scheduler, cache)
+        if org:
+            with scheduler.phase("repo"):
+                targets.extend(get_org_repos(gh, org))
+
+        with suppress(ValueError, TypeError):
             max_idle_days = int(max_idle_days)
 
-        """set time"""
+        """set time (a plan is applied with the idle threshold it was selected with)"""
         current_datetime_tzutc = datetime.now(timezone.utc)
-        branch_max_idle = current_datetime_tzutc - timedelta(days=max_idle_days)
+        if applied_plan is not None:
+            branch_max_idle = applied_plan.branch_max_idle or current_datetime_tzutc
+        else:
+            branch_max_idle = current_datetime_tzutc - timedelta(days=max_idle_days)
         print(f'Current Time (UTC): {current_datetime_tzutc.strftime("%Y-%m-%d %H:%M:%S")}\n')
 
-        """build exempt branches"""
-        set_exempt_branches = get_exempt_branches(repo, set_exclude_branches)
+        set_exclude_branches = build_set_exclude_branches(exclude_branches)
+        set_include_branches = build_set_exclude_branches(include_branches) - {""}
+        options = RunOptions(
+            dry_run=dry_run,
+            max_idle_days=max_idle_days or 0,
+            branch_max_idle=branch_max_idle,
+            set_exclude_branches=set_exclude_branches,
+            api=api,
+            concurrency=concurrency,
+            merged=merged,
+            stream=stream,
+            local_repo=local_repo,
+            delete_batch_size=delete_batch_size,
+            rules=BranchRules(set_exclude_branches, set_include_branches),
+            cache=cache,
+            state=RunState(state_file) if state_file else None,
+            plan=DeletionPlan(branch_max_idle) if plan_out else None,
+            policy=branch_policy,
+        )
+        if webhook_port is not None:
+            results = run_daemon(gh, targets, options, scheduler, repo_concurrency, webhook_host, webhook_port)
+        elif applied_plan is not None:
+            repo_plans = applied_plan.repos
+            results = sweep(
+                list(repo_plans),
+                lambda full_name: apply_repo_plan(gh, full_name, repo_plans[full_name], options, scheduler),
+                repo_concurrency,
+            )
+        elif processes > 1:
+            config = shard_config(
+                options,
+                processes,
+                rate_budget,
+                rate_limit_reserve,
+                repo_concurrency,
+                cache_dir,
+                cache_max_age_days,
+                cache_max_size_mb,
+                state_file,
+                plan_out is not None,
+            )
+            results = sweep_processes(targets, config, processes, scheduler, options)
+        else:
+            results = sweep(targets, lambda target: process_repo(gh, target, options, scheduler), repo_concurrency)
 
-        """get list of to-be-deleted branches and number of not-exempt branch"""
-        list_branches_to_delete, count_not_exempt_branch = get_branches_to_delete(repo, set_exempt_branches, branch_max_idle)
+        pool = transport.HTTPSPooledConnection.pool
+        print_run_summary(results, scheduler, cache, pool)
+        save_run(options, plan_out, current_datetime_tzutc)
 
-        """delete to-be-deleted branches"""
-        delete_branches(repo, dry_run, max_idle_days, list_branches_to_delete, count_not_exempt_branch)
+        metrics = build_metrics(scheduler, results, pool.metrics() if pool is not None else None)
+        if metrics_file:
+            write_metrics_file(metrics_file, metrics)
+        write_github_outputs(metrics)
 
     except Exception as e:
         print(f"Error: {e}\n")
         sys.exit(1)
 
+    finally:
+        if cache is not None:
+            """stop sending conditional requests once the cache is closed"""
+            transport.install(scheduler, pool=transport.HTTPSPooledConnection.pool)
+            cache.evict()
+            cache.close()
+
+    if any(result.error for result in results):
+        sys.exit(1)
+
 
 if __name__ == "__main__":  # pragma: no cover
     main()
@@ -0,0 +1,545 @@
+#!/usr/bin/env python
+
+"""
+Purpose: Long-running webhook mode keeping an in-memory branch index per repository, updated from
+push / pull_request / delete webhook payloads, and deleting branches on a timer wheel as they cross
+the idle threshold
+"""
+
+import hashlib
+import hmac
+import json
+import queue
+import signal
+import threading
+import time
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Generic,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+    TypeVar,
+)
+
+from github import Repository
+
+from delete_branches.deletion import iter_deletes, print_deletes
+from delete_branches.inventory import BranchInventory, BranchRecord
+from delete_branches.protection import ProtectionRules
+from delete_branches.rules import BranchRules
+
+T = TypeVar("T")
+HEADS_PREFIX = "refs/heads/"
+TICK_SECONDS = 60
+WHEEL_SLOTS = 1440
+RETRY_SECONDS = 3600
+"""one revolution of the wheel is a day of one-minute ticks; failed deletes are retried an hour later"""
+
+
+class TimerWheel(Generic[T]):
+    """
+    Hashed timer wheel: a timer lands in the slot of its deadline tick and fires once the wheel
+    passes that tick, so scheduling and firing cost O(1) per timer however many branches are
+    tracked.  Timers due more than one revolution ahead stay in their slot until their tick comes
+    round; timers already due fire on the next advance().
+
+    Parameter(s):
+    tick : seconds per slot
+    slots: number of slots
+    start: epoch seconds the wheel starts at
+    """
+
+    def __init__(self, tick: float = TICK_SECONDS, slots: int = WHEEL_SLOTS, start: float = 0):
+        self.tick = tick
+        self.current = int(start // tick)
+        self.slots: List[List[Tuple[int, T]]] = [[] for _ in range(slots)]
+        self.due: List[T] = []
+        self.count = 0
+
+    def __len__(self) -> int:
+        return self.count + len(self.due)
+
+    def schedule(self, deadline: float, key: T) -> None:
+        """
+        Add a timer (timers are not cancelled: the caller checks whether a fired key is still current)
+
+        Parameter(s):
+        deadline: epoch seconds the timer fires at
+        key     : value returned by advance() once the deadline passes
+        """
+        deadline_tick = int(deadline // self.tick)
+        if deadline_tick <= self.current:
+            self.due.append(key)
+            return
+        self.slots[deadline_tick % len(self.slots)].append((deadline_tick, key))
+        self.count += 1
+
+    def advance(self, now: float) -> List[T]:
+        """
+        Move the wheel to `now`, returning the keys of timers due by then
+
+        Parameter(s):
+        now: epoch seconds
+        """
+        fired, self.due = self.due, []
+        target = int(now // self.tick)
+        """a gap longer than one revolution visits every slot once"""
+        for current in range(self.current + 1, self.current + 1 + min(target - self.current, len(self.slots))):
+            index = current % len(self.slots)
+            slot = self.slots[index]
+            if not slot:
+                continue
+            kept = [(deadline_tick, key) for deadline_tick, key in slot if deadline_tick > target]
+            fired.extend(key for deadline_tick, key in slot if deadline_tick <= target)
+            self.count -= len(slot) - len(kept)
+            self.slots[index] = kept
+        self.current = max(self.current, target)
+        return fired
+
+    def seconds_to_next_tick(self, now: float) -> float:
+        """
+        Return the seconds until the wheel can fire again (0 with timers already due)
+
+        Parameter(s):
+        now: epoch seconds
+        """
+        if self.due:
+            return 0
+        return max((self.current + 1) * self.tick - now, 0)
+
+
+@dataclass
+class RepoIndex:
+    """
+    Branches, head dates and pull request exemptions of one repository, kept current from webhook payloads
+
+    Attribute(s):
+    repo          : github repository object
+    default_branch: default branch name
+    records       : branch name to record (sha and head commit date)
+    protection    : protection rules and rulesets of the repository (None relies on the protected flag of branches)
+    pulls         : open pull request number to (base, head) branch names
+    pull_branches : number of open pull requests per base or head branch name
+    deleted       : number of branches deleted by the daemon
+    failed        : number of branch deletes failed
+    """
+
+    repo: Repository.Repository
+    default_branch: str
+    records: Dict[str, BranchRecord] = field(default_factory=dict)
+    protection: Optional[ProtectionRules] = None
+    pulls: Dict[int, Tuple[str, str]] = field(default_factory=dict)
+    pull_branches: Counter = field(default_factory=Counter)
+    deleted: int = 0
+    failed: int = 0
+
+    def exempt(self, name: str, rules: BranchRules) -> bool:
+        """
+        Return True when the branch is exempt from delete: the per-branch form of get_exempt_branches()
+
+        Parameter(s):
+        name : branch name
+        rules: exclude and include patterns
+        """
+        record = self.records.get(name)
+        return (
+            name == self.default_branch
+            or rules.exempt(name)
+            or self.pull_branches[name] > 0
+            or (record is not None and record.protected)
+            or (self.protection is not None and name in self.protection)
+        )
+
+    def open_pull(self, number: int, base: str, head: str) -> List[str]:
+        """
+        Track an opened (or retargeted) pull request, returning the names no longer in any pull request
+
+        Parameter(s):
+        number: pull request number
+        base  : base branch name
+        head  : head branch name
+        """
+        released = self.close_pull(number, base, head)
+        self.pulls[number] = (base, head)
+        self.pull_branches.update((base, head))
+        return [name for name in released if self.pull_branches[name] == 0]
+
+    def close_pull(self, number: int, base: str, head: str) -> List[str]:
+        """
+        Stop tracking a pull request, returning the names no longer in any pull request
+
+        Parameter(s):
+        number: pull request number
+        base  : base branch name (matches a pull request listed at startup when the number is not tracked)
+        head  : head branch name
+        """
+        if number not in self.pulls:
+            number = next((key for key, pull in self.pulls.items() if key < 0 and pull == (base, head)), number)
+        if number not in self.pulls:
+            return []
+        names = self.pulls.pop(number)
+        self.pull_branches.subtract(names)
+        released = [name for name in dict.fromkeys(names) if self.pull_branches[name] <= 0]
+        for name in released:
+            del self.pull_branches[name]
+        return released
+
+
+def track_outcomes(
+    deletes: Iterable[Tuple[BranchRecord, Optional[str]]], outcomes: Dict[str, Optional[str]]
+) -> Iterator[Tuple[BranchRecord, Optional[str]]]:
+    """
+    Pass (branch, error) per branch delete on, recording the error (None once deleted) by branch name
+
+    Parameter(s):
+    deletes : (branch, error) per branch from iter_deletes()
+    outcomes: branch name to error
+    """
+    for branch, error in deletes:
+        outcomes[branch.name] = error
+        yield branch, error
+
+
+class BranchDaemon:
+    """
+    Branch index of every repository served, a queue of webhook events and a timer wheel of branch
+    idle deadlines.  One thread applies events and deletes due branches; the lock guards the index
+    while repositories are indexed concurrently at startup.
+
+    Parameter(s):
+    max_idle_days: maximum number of days that the branch has been idle (without new commits)
+    rules        : exclude and include patterns of every repository
+    dry_run      : mock delete when true
+    concurrency  : maximum number of concurrent delete requests
+    batch_size   : number of branch refs deleted per round trip (1 deletes one branch per REST request)
+    tick         : seconds per timer wheel slot
+    clock        : callable returning epoch seconds
+    """
+
+    def __init__(
+        self,
+        max_idle_days: int,
+        rules: BranchRules,
+        dry_run: bool = True,
+        concurrency: int = 1,
+        batch_size: int = 1,
+        tick: float = TICK_SECONDS,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.max_idle = timedelta(days=max_idle_days).total_seconds()
+        self.rules = rules
+        self.dry_run = dry_run
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self.clock = clock
+        self.wheel: TimerWheel[Tuple[str, str, str]] = TimerWheel(tick, start=clock())
+        self.repos: Dict[str, RepoIndex] = {}
+        self.events: queue.Queue = queue.Queue()
+        self.lock = threading.Lock()
+
+    def add_repo(
+        self,
+        repo: Repository.Repository,
+        inventory: BranchInventory,
+        protection: Optional[ProtectionRules] = None,
+        pulls: Iterable[Tuple[str, str]] = (),
+    ) -> int:
+        """
+        Index the branches of a repository (commit dates of not-exempt branches resolved by
+        get_branches_to_delete) and schedule each not-exempt branch at its idle deadline, returning
+        the number of branches already due
+
+        Parameter(s):
+        repo      : github repository object
+        inventory : branches listed once at startup
+        protection: protection rules and rulesets of the repository
+        pulls     : open pull request (base, head) branch names (numbers are unknown until their webhooks)
+        """
+        index = RepoIndex(repo, repo.default_branch, dict(inventory.records), protection)
+        for key, (base, head) in enumerate(pulls, start=1):
+            """listed pull requests are keyed by negative numbers until a webhook names them"""
+            index.pulls[-key] = (base, head)
+            index.pull_branches.update((base, head))
+        pending = self.resolve([record for record in index.records.values() if not index.exempt(record.name, self.rules)])
+        now = self.clock()
+        with self.lock:
+            self.repos[repo.full_name] = index
+            return sum(self.schedule(index, record, now) for record in pending)
+
+    @staticmethod
+    def resolve(records: List[BranchRecord]) -> List[BranchRecord]:
+        """
+        Resolve the commit dates not known yet (one commit request per branch), returning the records;
+        called without holding the lock, so webhooks and the due sweep are not held up by requests
+
+        Parameter(s):
+        records: branch records
+        """
+        for record in records:
+            record.get_commit_date()
+        return records
+
+    def schedule(self, index: RepoIndex, record: BranchRecord, now: Optional[float] = None) -> bool:
+        """
+        Schedule a not-exempt branch at its idle deadline, returning True when it is already due
+
+        Parameter(s):
+        index : repository index of the branch
+        record: branch record (commit date resolved)
+        now   : epoch seconds (clock when not given)
+        """
+        if index.exempt(record.name, self.rules) or record.committed_at is None:
+            return False
+        deadline = record.committed_at + self.max_idle
+        self.wheel.schedule(deadline, (index.repo.full_name, record.name, record.sha))
+        return deadline <= (self.clock() if now is None else now)
+
+    def handle(self, event: str, payload: Dict[str, Any]) -> None:
+        """
+        Apply one webhook payload to the index of its repository
+
+        Parameter(s):
+        event  : X-GitHub-Event header (push, pull_request or delete; others are ignored)
+        payload: webhook payload
+        """
+        full_name = payload.get("repository", {}).get("full_name")
+        index = self.repos.get(full_name)
+        if index is None:
+            return
+        pending: List[BranchRecord] = []
+        with self.lock:
+            if event == "push":
+                pending = self.handle_push(index, payload)
+            elif event == "pull_request":
+                pending = self.handle_pull_request(index, payload)
+            elif event == "delete" and payload.get("ref_type") == "branch":
+                index.records.pop(payload["ref"], None)
+            pending = [record for record in pending if not index.exempt(record.name, self.rules)]
+        if not pending:
+            return
+        self.resolve(pending)
+        with self.lock:
+            for record in pending:
+                self.schedule(index, record)
+
+    def handle_push(self, index: RepoIndex, payload: Dict[str, Any]) -> List[BranchRecord]:
+        """
+        Record the new head of a pushed branch (created, updated or deleted), returning the branches
+        to schedule at their new deadline
+        """
+        if not payload["ref"].startswith(HEADS_PREFIX):
+            return []
+        pending = []
+        name = payload["ref"].removeprefix(HEADS_PREFIX)
+        default_branch = payload["repository"].get("default_branch", index.default_branch)
+        if default_branch != index.default_branch:
+            """the former default branch is no longer exempt"""
+            previous = index.records.get(index.default_branch)
+            index.default_branch = default_branch
+            if previous is not None:
+                pending.append(previous)
+        if payload.get("deleted"):
+            index.records.pop(name, None)
+            return pending
+
+        """head_commit carries the commit timestamp; without it the date is resolved from the repository"""
+        head_commit = payload.get("head_commit") or {}
+        timestamp = head_commit.get("timestamp") if head_commit.get("id") == payload["after"] else None
+        previous = index.records.get(name)
+        record = BranchRecord(
+            name,
+            previous is not None and previous.protected,
+            payload["after"],
+            datetime.fromisoformat(timestamp) if timestamp else None,
+            repo=index.repo,
+        )
+        index.records[name] = record
+        return pending + [record]
+
+    def handle_pull_request(self, index: RepoIndex, payload: Dict[str, Any]) -> List[BranchRecord]:
+        """
+        Exempt the base and head branches of open pull requests, returning the branches released on
+        close to schedule
+        """
+        pull = payload["pull_request"]
+        if payload["action"] in ("opened", "reopened", "edited"):
+            released = index.open_pull(pull["number"], pull["base"]["ref"], pull["head"]["ref"])
+        elif payload["action"] == "closed":
+            released = index.close_pull(pull["number"], pull["base"]["ref"], pull["head"]["ref"])
+        else:
+            return []
+        return [index.records[name] for name in released if name in index.records]
+
+    def due_branches(self, now: float) -> Dict[str, List[BranchRecord]]:
+        """
+        Advance the timer wheel, returning per repository the branches still at the head they were
+        scheduled with, not exempt and idle (timers of moved, deleted or exempted branches are dropped)
+
+        Parameter(s):
+        now: epoch seconds
+        """
+        candidates = []
+        with self.lock:
+            for full_name, name, sha in self.wheel.advance(now):
+                index = self.repos[full_name]
+                record = index.records.get(name)
+                if record is None or record.sha != sha or index.exempt(name, self.rules):
+                    continue
+                candidates.append((full_name, record))
+
+        """a record replaced by a push to the same sha may not have its commit date yet"""
+        due: Dict[str, Dict[str, BranchRecord]] = {}
+        for full_name, record in candidates:
+            if record.get_commit_date().timestamp() + self.max_idle <= now:
+                due.setdefault(full_name, {})[record.name] = record
+        return {full_name: list(records.values()) for full_name, records in due.items()}
+
+    def delete_due(self, now: Optional[float] = None) -> int:
+        """
+        Delete the branches that crossed the idle threshold, returning the number of branches deleted
+        (mocked on dry-run).  Handled branches leave the index until a push webhook adds them back;
+        failed deletes are retried after RETRY_SECONDS.
+
+        Parameter(s):
+        now: epoch seconds (clock when not given)
+        """
+        now = self.clock() if now is None else now
+        count = 0
+        for full_name, branches in self.due_branches(now).items():
+            index = self.repos[full_name]
+            outcomes: Dict[str, Optional[str]] = {}
+            print(f"\nRepository               : {full_name}")
+            print(f"Idle Branch(es) Due      : {len(branches)}")
+            print("-" * 90)
+            try:
+                deletes = iter_deletes(index.repo, branches, self.dry_run, self.concurrency, self.batch_size)
+                print_deletes(track_outcomes(deletes, outcomes), self.dry_run)
+            except Exception as e:
+                print(f"❌ Delete failed - {e}")
+
+            """branches without an outcome (delete interrupted) count as failed with the ones that errored"""
+            succeeded = sum(error is None for error in outcomes.values())
+            deleted, failed = 0 if self.dry_run else succeeded, len(branches) - succeeded
+            with self.lock:
+                index.deleted += deleted
+                index.failed += failed
+                for branch in branches:
+                    if branch.name in outcomes and outcomes[branch.name] is None:
+                        if index.records.get(branch.name) is branch:
+                            del index.records[branch.name]
+                        count += 1
+                    else:
+                        self.wheel.schedule(now + RETRY_SECONDS, (full_name, branch.name, branch.sha))
+        return count
+
+    def run(self, stop: threading.Event) -> None:
+        """
+        Apply queued webhook events and delete due branches until `stop` is set
+
+        Parameter(s):
+        stop: event ending the loop
+        """
+        while not stop.is_set():
+            try:
+                event, payload = self.events.get(timeout=min(self.wheel.seconds_to_next_tick(self.clock()), 1))
+                self.handle(event, payload)
+            except queue.Empty:
+                pass
+            except Exception as e:
+                print(f"Error: webhook event not applied ({e})")
+            self.delete_due()
+
+
+def verify_signature(secret: str, body: bytes, signature: Optional[str]) -> bool:
+    """
+    Check the X-Hub-Signature-256 header of a webhook delivery
+
+    Parameter(s):
+    secret   : webhook secret
+    body     : request body
+    signature: header value (sha256=<hex digest>)
+    """
+    expected = "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+    return hmac.compare_digest(expected, signature or "")
+
+
+class WebhookHandler(BaseHTTPRequestHandler):
+    """
+    Accept signed webhook deliveries and queue them for the daemon thread
+    """
+
+    server: "WebhookServer"
+
+    def do_POST(self) -> None:
+        body = self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if not verify_signature(self.server.secret, body, self.headers.get("X-Hub-Signature-256")):
+            self.send_response(401)
+            self.end_headers()
+            return
+        try:
+            payload = json.loads(body)
+        except ValueError:
+            self.send_response(400)
+            self.end_headers()
+            return
+        self.server.branch_daemon.events.put((self.headers.get("X-GitHub-Event", ""), payload))
+        self.send_response(202)
+        self.end_headers()
+
+    def log_message(self, format: str, *args: Any) -> None:
+        """deliveries are not logged per request"""
+
+
+class WebhookServer(ThreadingHTTPServer):
+    """
+    HTTP server queueing webhook deliveries for a daemon
+
+    Parameter(s):
+    address      : (host, port) to listen on (port 0 picks a free port)
+    branch_daemon: daemon the events are queued for
+    secret       : webhook secret deliveries are signed with
+    """
+
+    daemon_threads = True
+
+    def __init__(self, address: Tuple[str, int], branch_daemon: BranchDaemon, secret: str):
+        super().__init__(address, WebhookHandler)
+        self.branch_daemon = branch_daemon
+        self.secret = secret
+
+
+def serve(branch_daemon: BranchDaemon, host: str, port: int, secret: str, stop: Optional[threading.Event] = None) -> None:
+    """
+    Serve webhooks and run the daemon until `stop` is set (or the process is interrupted)
+
+    Parameter(s):
+    branch_daemon: daemon applying the events
+    host         : address to listen on
+    port         : port to listen on
+    secret       : webhook secret deliveries are signed with
+    stop         : event ending the service
+    """
+    stop = stop or threading.Event()
+    if threading.current_thread() is threading.main_thread():
+        """stop cleanly when a container or service manager terminates the process"""
+        signal.signal(signal.SIGTERM, lambda signum, frame: stop.set())
+    server = WebhookServer((host, port), branch_daemon, secret)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    print(f"Webhook Server           : http://{server.server_address[0]}:{server.server_address[1]}/")
+    try:
+        branch_daemon.run(stop)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.shutdown()
+        server.server_close()
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+
+"""
+Purpose: Delete branch refs through a bounded worker pool or in batches per round trip
+"""
+
+import contextvars
+import itertools
+import urllib.parse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from typing import (
+    Iterable,
+    Iterator,
+    Optional,
+    Tuple,
+)
+
+from github import Repository
+
+from delete_branches.graphql_api import delete_refs_graphql
+from delete_branches.inventory import BranchRecord
+from delete_branches.local_repo import push_delete
+
+
+def delete_ref(repo: Repository.Repository, branch: BranchRecord) -> None:
+    """
+    Delete the branch ref directly (one request, no branch or ref lookup before the delete)
+
+    Parameter(s):
+    repo  : github repository object
+    branch: branch record gathered during selection
+    """
+    ref_url = f"{repo.url}/git/refs/heads/{urllib.parse.quote(branch.name)}"
+    repo.requester.requestJsonAndCheck("DELETE", ref_url)
+
+
+def delete_refs(
+    repo: Repository.Repository, branches: Iterable[BranchRecord], concurrency: int = 1
+) -> Iterator[BranchRecord]:
+    """
+    Delete branch refs with up to `concurrency` requests in flight, yielding each branch
+    in input order once its delete has completed.  The first failure cancels pending deletes
+    and is raised to the caller.  Branches are consumed lazily, so a streamed selection is
+    deleted while later pages are still being listed.
+
+    Parameter(s):
+    repo       : github repository object
+    branches   : branch records to delete (list or iterator)
+    concurrency: maximum number of concurrent delete requests
+    """
+    if concurrency <= 1:
+        for branch in branches:
+            delete_ref(repo, branch)
+            yield branch
+        return
+
+    executor = ThreadPoolExecutor(max_workers=concurrency)
+    pending: deque = deque()
+    try:
+        """submit up to twice the pool size ahead so workers stay busy while the window stays bounded"""
+        for branch in branches:
+            pending.append((branch, executor.submit(contextvars.copy_context().run, delete_ref, repo, branch)))
+            if len(pending) >= concurrency * 2:
+                done, future = pending.popleft()
+                future.result()
+                yield done
+        while pending:
+            done, future = pending.popleft()
+            future.result()
+            yield done
+    finally:
+        executor.shutdown(wait=True, cancel_futures=True)
+
+
+def delete_refs_batched(
+    repo: Repository.Repository, branches: Iterable[BranchRecord], batch_size: int, local_repo: Optional[str] = None
+) -> Iterator[Tuple[BranchRecord, Optional[str]]]:
+    """
+    Delete `batch_size` branch refs per round trip, yielding (branch, error) in input order where
+    error is None once the branch is deleted.  A failed branch does not stop the other deletes.
+
+    Parameter(s):
+    repo      : github repository object
+    branches  : branch records to delete (list or iterator)
+    batch_size: number of branch refs deleted per round trip
+    local_repo: local clone path deleting with `git push --delete` (None deletes through GraphQL)
+    """
+    iterator = iter(branches)
+    while batch := list(itertools.islice(iterator, batch_size)):
+        if local_repo:
+            """leases make the push fail for branches whose head moved since they were listed"""
+            errors = push_delete(
+                local_repo, [branch.name for branch in batch], {branch.name: branch.sha for branch in batch}
+            )
+        else:
+            errors = delete_refs_graphql(repo, batch)
+        for branch in batch:
+            yield branch, errors.get(branch.name)
+
+
+def iter_deletes(
+    repo: Repository.Repository,
+    branches: Iterable[BranchRecord],
+    dry_run: bool,
+    concurrency: int = 1,
+    batch_size: int = 1,
+    local_repo: Optional[str] = None,
+) -> Iterator[Tuple[BranchRecord, Optional[str]]]:
+    """
+    Yield (branch, error) per branch to delete: mocked on dry-run, batched when `batch_size` is
+    above 1, otherwise one REST delete per branch (where the first failure is raised)
+
+    Parameter(s):
+    repo       : github repository object
+    branches   : branch records to delete (list or iterator)
+    dry_run    : mock delete when true
+    concurrency: maximum number of concurrent delete requests (one branch per request)
+    batch_size : number of branch refs deleted per round trip
+    local_repo : local clone path deleting with `git push --delete` when batched
+    """
+    if dry_run:
+        return ((branch, None) for branch in branches)
+    if batch_size > 1:
+        return delete_refs_batched(repo, branches, batch_size, local_repo)
+    return ((branch, None) for branch in delete_refs(repo, branches, concurrency))
+
+
+def print_deletes(deletes: Iterable[Tuple[BranchRecord, Optional[str]]], dry_run: bool) -> Tuple[int, int]:
+    """
+    Print one line per branch delete, returning the number of branches deleted and failed
+
+    Parameter(s):
+    deletes: (branch, error) per branch from iter_deletes()
+    dry_run: mock delete when true
+    """
+    dry_run_msg = "(MOCK) " if dry_run else "✅ "
+    deleted = failed = 0
+    for branch, error in deletes:
+        if error is None:
+            branch_last_commit_time = branch.get_commit_date().strftime("%Y-%m-%d %H:%M:%S")
+            print(f"{dry_run_msg}Delete branch - last update UTC {branch_last_commit_time}: {branch.name}")
+            deleted += 0 if dry_run else 1
+        else:
+            print(f"❌ Delete failed - {branch.name}: {error}")
+            failed += 1
+    return deleted, failed
@@ -0,0 +1,415 @@
+#!/usr/bin/env python
+
+"""
+Purpose: Bulk fetch of branch refs and pull requests through the GitHub GraphQL API
+"""
+
+from datetime import datetime
+from typing import (
+    Any,
+    Dict,
+    Iterator,
+    List,
+    Set,
+    Tuple,
+)
+
+from github import GithubException, Repository
+
+from delete_branches.inventory import BranchInventory, BranchRecord
+
+PAGE_SIZE = 100
+COMPARE_BATCH_SIZE = 50
+"""a ref updated to the null object id is deleted"""
+NULL_OID = "0" * 40
+
+QUERY_REFS = """
+query($owner: String!, $name: String!, $first: Int!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    refs(refPrefix: "refs/heads/", first: $first, after: $cursor) {
+      pageInfo { hasNextPage endCursor }
+      nodes {
+        id
+        name
+        target { oid ... on Commit { committedDate } }
+        branchProtectionRule { id }
+      }
+    }
+  }
+}
+"""
+
+"""
+refs from the last page backwards: cursors are offsets, so deleting listed refs shifts later refs
+toward the front, and only the pages still to be listed must keep their offsets
+"""
+QUERY_REFS_BACKWARDS = """
+query($owner: String!, $name: String!, $last: Int!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    refs(refPrefix: "refs/heads/", last: $last, before: $cursor) {
+      pageInfo { hasPreviousPage startCursor }
+      nodes {
+        id
+        name
+        target { oid ... on Commit { committedDate } }
+        branchProtectionRule { id }
+      }
+    }
+  }
+}
+"""
+
+QUERY_PULLS = """
+query($owner: String!, $name: String!, $first: Int!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    pullRequests(states: OPEN, first: $first, after: $cursor) {
+      pageInfo { hasNextPage endCursor }
+      nodes { baseRefName headRefName }
+    }
+  }
+}
+"""
+
+
+def iter_connection(
+    repo: Repository.Repository, query: str, connection: str, reverse: bool = False
+) -> Iterator[Dict[str, Any]]:
+    """
+    Page through a repository connection, PAGE_SIZE nodes per request
+
+    Parameter(s):
+    repo      : github repository object
+    query     : GraphQL query taking owner, name, first (last when reversed) and cursor variables
+    connection: name of the connection under repository in the response
+    reverse   : page from the last node backwards (nodes yielded last first)
+    """
+    owner, name = repo.full_name.split("/", 1)
+    variables: Dict[str, Any] = {"owner": owner, "name": name, "last" if reverse else "first": PAGE_SIZE, "cursor": None}
+    has_more, cursor = ("hasPreviousPage", "startCursor") if reverse else ("hasNextPage", "endCursor")
+    while True:
+        _, data = repo.requester.graphql_query(query, variables)
+        page = data["data"]["repository"][connection]
+        yield from reversed(page["nodes"]) if reverse else page["nodes"]
+        if not page["pageInfo"][has_more]:
+            break
+        variables["cursor"] = page["pageInfo"][cursor]
+
+
+def iter_branch_records_graphql(repo: Repository.Repository, reverse: bool = False) -> Iterator[BranchRecord]:
+    """
+    Yield a record with its commit date per branch as each page of refs arrives
+
+    Parameter(s):
+    repo   : github repository object
+    reverse: list from the last page backwards
+    """
+    query = QUERY_REFS_BACKWARDS if reverse else QUERY_REFS
+    for node in iter_connection(repo, query, "refs", reverse):
+        target = node["target"]
+        yield BranchRecord(
+            name=node["name"],
+            protected=node["branchProtectionRule"] is not None,
+            sha=target["oid"],
+            commit_date=datetime.fromisoformat(target["committedDate"]),
+            ref_id=node["id"],
+        )
+
+
+def iter_pulls_graphql(repo: Repository.Repository) -> Iterator[Tuple[str, str]]:
+    """
+    Yield (base, head) branch names of open pull requests
+
+    Parameter(s):
+    repo: github repository object
+    """
+    for node in iter_connection(repo, QUERY_PULLS, "pullRequests"):
+        yield node["baseRefName"], node["headRefName"]
+
+
+def build_inventory_graphql(repo: Repository.Repository) -> BranchInventory:
+    """
+    Build branch inventory with commit dates and open pull requests from GraphQL,
+    avoiding one commit request per branch
+
+    Parameter(s):
+    repo: github repository object
+    """
+    records = {record.name: record for record in iter_branch_records_graphql(repo)}
+    return BranchInventory(records, list(iter_pulls_graphql(repo)))
+
+
+def build_compare_query(count: int) -> str:
+    """
+    Build one query comparing `count` head refs ($h0, $h1, ...) against the $base ref
+
+    Parameter(s):
+    count: number of head refs compared by the query
+    """
+    heads = "".join(f", $h{i}: String!" for i in range(count))
+    fields = "\n".join(f"      b{i}: compare(headRef: $h{i}) {{ aheadBy }}" for i in range(count))
+    return (
+        f"query($owner: String!, $name: String!, $base: String!{heads}) {{\n"
+        + "  repository(owner: $owner, name: $name) {\n"
+        + "    ref(qualifiedName: $base) {\n"
+        + f"{fields}\n"
+        + "    }\n"
+        + "  }\n"
+        + "}\n"
+    )
+
+
+def get_merged_branches(repo: Repository.Repository, names: List[str], batch_size: int = COMPARE_BATCH_SIZE) -> Set[str]:
+    """
+    Return the branches fully merged into the default branch (no commits ahead of it),
+    comparing `batch_size` branches per GraphQL request instead of one compare call per branch
+
+    Parameter(s):
+    repo      : github repository object
+    names     : branch names to check
+    batch_size: number of branches compared per request
+    """
+    owner, name = repo.full_name.split("/", 1)
+    merged = set()
+    for start in range(0, len(names), batch_size):
+        end = start + batch_size
+        batch = names[start:end]
+        variables: Dict[str, Any] = {"owner": owner, "name": name, "base": f"refs/heads/{repo.default_branch}"}
+        variables.update({f"h{i}": f"refs/heads/{branch}" for i, branch in enumerate(batch)})
+        data = graphql_partial(repo, build_compare_query(len(batch)), variables)
+        comparisons = (data["data"]["repository"] or {}).get("ref") or {}
+
+        """a branch deleted since the inventory fails only its own comparison and is not reported as merged"""
+        for i, branch in enumerate(batch):
+            comparison = comparisons.get(f"b{i}")
+            if comparison is not None and comparison["aheadBy"] == 0:
+                merged.add(branch)
+
+    return merged
+
+
+"""
+selection of each branch attribute on a branch ref; the ref is compared as base with the default
+branch as head, so behindBy counts the commits of the branch missing from the default branch
+"""
+ATTRIBUTE_FIELDS = {
+    "author": "target { ... on Commit { author { name user { login } } } }",
+    "pull": "associatedPullRequests(first: 1, orderBy: {field: UPDATED_AT, direction: DESC}) { nodes { state } }",
+    "ahead": "compare(headRef: $base) { aheadBy behindBy }",
+    "behind": "compare(headRef: $base) { aheadBy behindBy }",
+}
+
+
+def build_attributes_query(count: int, columns: List[str]) -> str:
+    """
+    Build one query reading the attributes of `count` branch refs ($p0, $p1, ...)
+
+    Parameter(s):
+    count  : number of refs read by the query
+    columns: attributes read (keys of ATTRIBUTE_FIELDS)
+    """
+    selection = " ".join(dict.fromkeys(ATTRIBUTE_FIELDS[column] for column in columns))
+    base = ", $base: String!" if "$base" in selection else ""
+    names = "".join(f", $p{i}: String!" for i in range(count))
+    fields = "\n".join(f"    a{i}: ref(qualifiedName: $p{i}) {{ {selection} }}" for i in range(count))
+    return (
+        f"query($owner: String!, $name: String!{base}{names}) {{\n"
+        + "  repository(owner: $owner, name: $name) {\n"
+        + f"{fields}\n"
+        + "  }\n"
+        + "}\n"
+    )
+
+
+def parse_attributes(ref: Dict[str, Any], columns: List[str]) -> Dict[str, Any]:
+    """
+    Return the attributes of one branch ref (None when GitHub cannot tell, e.g. a commit author
+    without name or a comparison across unrelated histories)
+
+    Parameter(s):
+    ref    : ref object of the attributes query
+    columns: attributes read
+    """
+    attributes: Dict[str, Any] = {}
+    if "author" in columns:
+        author = (ref.get("target") or {}).get("author") or {}
+        attributes["author"] = (author.get("user") or {}).get("login") or author.get("name")
+    if "pull" in columns:
+        pulls = ref["associatedPullRequests"]["nodes"]
+        attributes["pull"] = pulls[0]["state"].lower() if pulls else "none"
+    if "ahead" in columns or "behind" in columns:
+        comparison = ref.get("compare") or {}
+        attributes["ahead"] = comparison.get("behindBy")
+        attributes["behind"] = comparison.get("aheadBy")
+    return attributes
+
+
+def get_branch_attributes(
+    repo: Repository.Repository, names: List[str], columns: List[str], batch_size: int = COMPARE_BATCH_SIZE
+) -> Dict[str, Dict[str, Any]]:
+    """
+    Read the attributes of branches, every attribute of `batch_size` branches per GraphQL request
+    instead of one request per attribute per branch; branches that no longer exist are left out
+
+    Parameter(s):
+    repo      : github repository object
+    names     : branch names
+    columns   : attributes read (keys of ATTRIBUTE_FIELDS)
+    batch_size: number of branches read per request
+    """
+    owner, name = repo.full_name.split("/", 1)
+    attributes = {}
+    for start in range(0, len(names), batch_size):
+        end = start + batch_size
+        batch = names[start:end]
+        query = build_attributes_query(len(batch), columns)
+        variables: Dict[str, Any] = {"owner": owner, "name": name}
+        if "$base" in query:
+            variables["base"] = f"refs/heads/{repo.default_branch}"
+        variables.update({f"p{i}": f"refs/heads/{branch}" for i, branch in enumerate(batch)})
+        refs = graphql_partial(repo, query, variables)["data"]["repository"] or {}
+        for i, branch in enumerate(batch):
+            ref = refs.get(f"a{i}")
+            if ref is not None:
+                attributes[branch] = parse_attributes(ref, columns)
+    return attributes
+
+
+def build_commit_dates_query(count: int) -> str:
+    """
+    Build one query reading the committer date of `count` commits ($o0, $o1, ...)
+
+    Parameter(s):
+    count: number of commits read by the query
+    """
+    oids = "".join(f", $o{i}: GitObjectID!" for i in range(count))
+    fields = "\n".join(f"    c{i}: object(oid: $o{i}) {{ ... on Commit {{ committedDate }} }}" for i in range(count))
+    return (
+        f"query($owner: String!, $name: String!{oids}) {{\n"
+        + "  repository(owner: $owner, name: $name) {\n"
+        + f"{fields}\n"
+        + "  }\n"
+        + "}\n"
+    )
+
+
+def resolve_commit_dates(repo: Repository.Repository, branches: List[BranchRecord], batch_size: int = PAGE_SIZE) -> None:
+    """
+    Set commit dates of branches known only by head sha, `batch_size` commits per GraphQL request
+
+    Parameter(s):
+    repo      : github repository object
+    branches  : branch records without commit date
+    batch_size: number of commits read per request
+    """
+    owner, name = repo.full_name.split("/", 1)
+    for start in range(0, len(branches), batch_size):
+        end = start + batch_size
+        batch = branches[start:end]
+        variables: Dict[str, Any] = {"owner": owner, "name": name}
+        variables.update({f"o{i}": branch.sha for i, branch in enumerate(batch)})
+        _, data = repo.requester.graphql_query(build_commit_dates_query(len(batch)), variables)
+        commits = data["data"]["repository"]
+        for i, branch in enumerate(batch):
+            branch.commit_date = datetime.fromisoformat(commits[f"c{i}"]["committedDate"])
+
+
+def build_ref_ids_query(count: int) -> str:
+    """
+    Build one query reading the node id and head commit of `count` refs ($q0, $q1, ...)
+
+    Parameter(s):
+    count: number of refs read by the query
+    """
+    names = "".join(f", $q{i}: String!" for i in range(count))
+    fields = "\n".join(f"    r{i}: ref(qualifiedName: $q{i}) {{ id target {{ oid }} }}" for i in range(count))
+    return (
+        f"query($owner: String!, $name: String!{names}) {{\n"
+        + "  repository(owner: $owner, name: $name) {\n"
+        + f"{fields}\n"
+        + "  }\n"
+        + "}\n"
+    )
+
+
+def get_ref_heads(repo: Repository.Repository, names: List[str]) -> Dict[str, Tuple[str, str]]:
+    """
+    Read the node id and head commit sha of branch refs, PAGE_SIZE refs per request; branches
+    that no longer exist are left out
+
+    Parameter(s):
+    repo : github repository object
+    names: branch names
+    """
+    owner, name = repo.full_name.split("/", 1)
+    heads = {}
+    for start in range(0, len(names), PAGE_SIZE):
+        end = start + PAGE_SIZE
+        batch = names[start:end]
+        variables: Dict[str, Any] = {"owner": owner, "name": name}
+        variables.update({f"q{i}": f"refs/heads/{branch}" for i, branch in enumerate(batch)})
+        refs = graphql_partial(repo, build_ref_ids_query(len(batch)), variables)["data"]["repository"] or {}
+        for i, branch in enumerate(batch):
+            ref = refs.get(f"r{i}")
+            if ref is not None:
+                heads[branch] = (ref["id"], ref["target"]["oid"])
+    return heads
+
+
+def build_delete_refs_mutation(count: int) -> str:
+    """
+    Build one mutation deleting `count` branch refs ($n0, $n1, ...) of repository $repo, each only
+    while it still points at its expected head ($b0, $b1, ...)
+
+    Parameter(s):
+    count: number of refs deleted by the mutation
+    """
+    refs = ", ".join(f"$n{i}: GitRefname!, $b{i}: GitObjectID!" for i in range(count))
+    fields = "\n".join(
+        f"  m{i}: updateRefs(input: {{repositoryId: $repo, refUpdates: "
+        f'[{{name: $n{i}, beforeOid: $b{i}, afterOid: "{NULL_OID}"}}]}}) {{ clientMutationId }}'
+        for i in range(count)
+    )
+    return f"mutation($repo: ID!, {refs}) {{\n{fields}\n}}\n"
+
+
+def graphql_partial(repo: Repository.Repository, query: str, variables: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Run a GraphQL request whose aliased fields may fail independently, returning the response
+    with both `data` and `errors` instead of raising on the first error
+
+    Parameter(s):
+    repo     : github repository object
+    query    : GraphQL query or mutation
+    variables: GraphQL variables
+    """
+    try:
+        _, data = repo.requester.graphql_query(query, variables)
+    except GithubException as e:
+        if not isinstance(e.data, dict) or not e.data.get("data"):
+            raise
+        data = e.data
+    return data
+
+
+def delete_refs_graphql(repo: Repository.Repository, branches: List[BranchRecord]) -> Dict[str, str]:
+    """
+    Delete a batch of branch refs with one GraphQL mutation, returning an error message per branch
+    that was not deleted; a ref is deleted only while its head is still the sha of its record, so a
+    branch pushed to since it was listed (or compared) is kept
+
+    Parameter(s):
+    repo    : github repository object
+    branches: branch records to delete in one round trip
+    """
+    errors: Dict[str, str] = {}
+    variables: Dict[str, Any] = {"repo": repo.node_id}
+    for i, branch in enumerate(branches):
+        variables.update({f"n{i}": f"refs/heads/{branch.name}", f"b{i}": branch.sha})
+    data = graphql_partial(repo, build_delete_refs_mutation(len(branches)), variables)
+
+    """each failed alias is reported under errors with the alias as first path element"""
+    messages = {error["path"][0]: error.get("message", "") for error in data.get("errors", []) if error.get("path")}
+    for i, branch in enumerate(branches):
+        if (data.get("data") or {}).get(f"m{i}") is None:
+            errors[branch.name] = messages.get(f"m{i}", "not deleted")
+    return errors
@@ -0,0 +1,215 @@
+#!/usr/bin/env python
+
+"""
+Purpose: Branch inventory built once per run
+"""
+
+import contextvars
+import re
+import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from typing import (
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from github import Repository
+
+PER_PAGE = 100
+PROTECTED = 1
+PULLS_CONCURRENCY = 4
+LAST_PAGE_LINK = re.compile(r'<([^>]+)>;\s*rel="last"')
+
+
+class BranchRecord:
+    """
+    Branch attributes needed by the exemption, idle-selection and deletion phases, kept in slots
+    (no instance dict and no PyGithub objects or raw JSON) so 100k-branch repositories and
+    multi-repository sweeps stay small in memory
+
+    Attribute(s):
+    name        : branch name
+    sha         : head commit sha
+    committed_at: head commit committer date in epoch seconds (None until resolved)
+    flags       : PROTECTED bit
+    ref_id      : GraphQL node id of the ref (when listed through GraphQL)
+    repo        : repository the commit date is resolved from on first use (REST listing)
+    """
+
+    __slots__ = ("name", "sha", "committed_at", "flags", "ref_id", "repo")
+
+    def __init__(
+        self,
+        name: str,
+        protected: bool,
+        sha: str,
+        commit_date: Optional[datetime] = None,
+        ref_id: Optional[str] = None,
+        repo: Optional[Repository.Repository] = None,
+    ):
+        self.name = name
+        self.sha = sha
+        self.committed_at: Optional[float] = None
+        self.flags = PROTECTED if protected else 0
+        self.ref_id = ref_id
+        self.repo = repo
+        self.commit_date = commit_date
+
+    def __repr__(self) -> str:
+        return f"BranchRecord(name={self.name!r}, sha={self.sha!r}, committed_at={self.committed_at}, flags={self.flags})"
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, BranchRecord):
+            return NotImplemented
+        return (self.name, self.sha, self.committed_at, self.flags, self.ref_id) == (
+            other.name,
+            other.sha,
+            other.committed_at,
+            other.flags,
+            other.ref_id,
+        )
+
+    __hash__ = None  # type: ignore[assignment]
+
+    @property
+    def protected(self) -> bool:
+        return bool(self.flags & PROTECTED)
+
+    @protected.setter
+    def protected(self, protected: bool) -> None:
+        self.flags = self.flags | PROTECTED if protected else self.flags & ~PROTECTED
+
+    @property
+    def commit_date(self) -> Optional[datetime]:
+        if self.committed_at is None:
+            return None
+        return datetime.fromtimestamp(self.committed_at, timezone.utc)
+
+    @commit_date.setter
+    def commit_date(self, commit_date: Optional[datetime]) -> None:
+        self.committed_at = None if commit_date is None else commit_date.timestamp()
+
+    def get_commit_date(self) -> datetime:
+        """
+        Return the head commit committer date, resolving it from the repository when not yet known
+        """
+        if self.committed_at is None:
+            self.commit_date = self.repo.get_commit(self.sha).commit.committer.date
+        return datetime.fromtimestamp(self.committed_at, timezone.utc)
+
+
+class BranchInventory:
+    """
+    Branches of a repository collected in a single pagination sweep
+
+    Parameter(s):
+    records : dictionary of branch name to BranchRecord
+    pulls   : open pull request (base, head) branch names when fetched with the branches
+    resolver: callable setting commit dates of many records at once (None resolves per branch)
+    """
+
+    def __init__(
+        self,
+        records: Dict[str, BranchRecord],
+        pulls: Optional[List[Tuple[str, str]]] = None,
+        resolver: Optional[Callable[[List[BranchRecord]], None]] = None,
+    ):
+        self.records = records
+        self.pulls = pulls
+        self.resolver = resolver
+
+    def __iter__(self) -> Iterator[BranchRecord]:
+        return iter(self.records.values())
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.records
+
+    @property
+    def names(self) -> Set[str]:
+        return set(self.records)
+
+    def protected(self) -> Iterator[BranchRecord]:
+        return (record for record in self.records.values() if record.protected)
+
+    def resolve_commit_dates(self, records: List[BranchRecord]) -> None:
+        """
+        Resolve missing commit dates of the records in one batch when the inventory has a resolver
+        """
+        unresolved = [record for record in records if record.commit_date is None]
+        if self.resolver is not None and unresolved:
+            self.resolver(unresolved)
+
+
+def iter_branch_records(repo: Repository.Repository, reverse: bool = False) -> Iterator[BranchRecord]:
+    """
+    Yield a record per branch as each page of branches arrives
+
+    Parameter(s):
+    repo   : github repository object
+    reverse: list from the last page backwards
+    """
+    branches = repo.get_branches()
+    for branch in branches.reversed if reverse else branches:
+        yield BranchRecord(name=branch.name, protected=branch.protected, sha=branch.commit.sha, repo=repo)
+
+
+def build_inventory(repo: Repository.Repository) -> BranchInventory:
+    """
+    List all branches of the repository once and keep the attributes used by later phases
+
+    Parameter(s):
+    repo: github repository object
+    """
+    return BranchInventory({record.name: record for record in iter_branch_records(repo)})
+
+
+def last_page(link: Optional[str]) -> int:
+    """
+    Return the last page number announced by a Link header (1 without one)
+
+    Parameter(s):
+    link: Link response header
+    """
+    match = LAST_PAGE_LINK.search(link or "")
+    if match is None:
+        return 1
+    query = urllib.parse.parse_qs(urllib.parse.urlsplit(match.group(1)).query)
+    return int(query.get("page", ["1"])[0])
+
+
+def list_pulls(repo: Repository.Repository, concurrency: int = PULLS_CONCURRENCY) -> List[Tuple[str, str]]:
+    """
+    List (base, head) branch names of open pull requests; the first page announces the last
+    page, so the remaining pages are fetched concurrently, and only the two ref names of each
+    pull request are kept instead of PullRequest objects
+
+    Parameter(s):
+    repo       : github repository object
+    concurrency: maximum number of page requests in flight
+    """
+    url = f"{repo.url}/pulls"
+
+    def get_page(page: int) -> List[Tuple[str, str]]:
+        _, pulls = repo.requester.requestJsonAndCheck("GET", url, {"per_page": PER_PAGE, "page": page})
+        return [(pull["base"]["ref"], pull["head"]["ref"]) for pull in pulls]
+
+    headers, first = repo.requester.requestJsonAndCheck("GET", url, {"per_page": PER_PAGE, "page": 1})
+    pulls = [(pull["base"]["ref"], pull["head"]["ref"]) for pull in first]
+    pages = range(2, last_page(headers.get("link")) + 1)
+    if not pages:
+        return pulls
+    """each page runs in a copy of the caller's context, so its requests count to the caller's phase"""
+    with ThreadPoolExecutor(max_workers=min(concurrency, len(pages))) as executor:
+        futures = [executor.submit(contextvars.copy_context().run, get_page, page) for page in pages]
+        for future in futures:
+            pulls.extend(future.result())
+    return pulls
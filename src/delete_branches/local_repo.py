@@ -0,0 +1,113 @@
+#!/usr/bin/env python
+
+"""
+Purpose: Branch inventory read from a local clone (no API request per branch or per commit)
+"""
+
+import subprocess
+from datetime import datetime, timezone
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+from github import Repository
+
+from delete_branches.inventory import BranchInventory, BranchRecord
+from delete_branches.ls_remote import get_protected_branches
+from delete_branches.protection import ProtectionRules
+
+FOR_EACH_REF_FORMAT = "%(refname)%00%(objectname)%00%(committerdate:unix)"
+REMOTE = "origin"
+
+
+def git(path: str, *args: str) -> str:
+    return subprocess.run(["git", "-C", path, *args], capture_output=True, check=True, text=True).stdout
+
+
+def read_local_heads(path: str) -> Dict[str, Tuple[str, datetime]]:
+    """
+    Read branch name -> (head sha, committer date) with one `git for-each-ref`; a bare or mirror
+    clone lists refs/heads, a working clone lists the remote-tracking refs of origin.
+    Commit dates come from the commit-graph when the clone has one.
+
+    Parameter(s):
+    path: local clone path
+    """
+    bare = git(path, "rev-parse", "--is-bare-repository").strip() == "true"
+    prefix = "refs/heads/" if bare else "refs/remotes/origin/"
+
+    heads = {}
+    for line in git(path, "for-each-ref", f"--format={FOR_EACH_REF_FORMAT}", prefix).splitlines():
+        ref, sha, timestamp = line.split("\0")
+        name = ref.removeprefix(prefix)
+        if name != "HEAD":
+            heads[name] = (sha, datetime.fromtimestamp(int(timestamp), timezone.utc))
+    return heads
+
+
+def build_inventory_local(
+    repo: Repository.Repository, path: str, protection: Optional[ProtectionRules] = None
+) -> BranchInventory:
+    """
+    Build branch inventory with commit dates from a local clone; the API is only asked for
+    protected branches when no protection rules are given (pull requests and deletes also stay on the API)
+
+    Parameter(s):
+    repo      : github repository object
+    path      : local clone path (fetch all branches, e.g. a mirror clone or fetch-depth: 0)
+    protection: protection rules fetched for the repository (None lists protected branches)
+    """
+    heads = read_local_heads(path)
+    protected = protection.filter(set(heads)) if protection is not None else get_protected_branches(repo)
+    records = {
+        name: BranchRecord(name=name, protected=name in protected, sha=sha, commit_date=commit_date)
+        for name, (sha, commit_date) in heads.items()
+    }
+    return BranchInventory(records)
+
+
+def parse_push_porcelain(output: str) -> Dict[str, str]:
+    """
+    Parse `git push --porcelain` output into an error message per rejected branch
+
+    Parameter(s):
+    output: lines of '<flag>\\t<from>:<to>\\t<summary> (<reason>)'
+    """
+    errors = {}
+    for line in output.splitlines():
+        flag, _, rest = line.partition("\t")
+        refspec, _, summary = rest.partition("\t")
+        """rejected deletes are reported as ':refs/heads/<name>' or '(delete):refs/heads/<name>'"""
+        refspec = refspec.removeprefix("(delete)")
+        if flag == "!" and refspec.startswith(":refs/heads/"):
+            errors[refspec.removeprefix(":refs/heads/")] = summary
+    return errors
+
+
+def push_delete(path: str, names: List[str], expected: Optional[Dict[str, str]] = None) -> Dict[str, str]:
+    """
+    Delete branches of the remote with one atomic `git push --delete` (all branches are deleted or
+    none), returning an error message per branch that was not deleted
+
+    Parameter(s):
+    path    : local clone path (push credentials come from the clone, e.g. actions/checkout)
+    names   : branch names to delete
+    expected: head sha per branch; the remote rejects the push when a branch moved (compare-and-delete)
+    """
+    refs = [f"refs/heads/{name}" for name in names]
+    leases = [f"--force-with-lease=refs/heads/{name}:{sha}" for name, sha in (expected or {}).items()]
+    push = subprocess.run(
+        ["git", "-C", path, "push", "--porcelain", "--atomic", *leases, REMOTE, "--delete", *refs],
+        capture_output=True,
+        text=True,
+    )
+    errors = parse_push_porcelain(push.stdout)
+    if push.returncode != 0:
+        """branches missing from the porcelain output were not pushed at all (e.g. authentication failure)"""
+        reported = {line.partition(":refs/heads/")[2].partition("\t")[0] for line in push.stdout.splitlines()}
+        message = push.stderr.strip().splitlines()[-1] if push.stderr.strip() else f"git push exited {push.returncode}"
+        errors.update({name: message for name in names if name not in reported})
+    return errors
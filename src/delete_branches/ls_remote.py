@@ -0,0 +1,115 @@
+#!/usr/bin/env python
+
+"""
+Purpose: Branch inventory from the git ref advertisement (every branch head in one request)
+"""
+
+import subprocess
+from functools import partial
+from typing import Dict, Optional, Set
+
+import requests
+from github import Branch, Repository
+from github.PaginatedList import PaginatedList
+
+from delete_branches.graphql_api import resolve_commit_dates
+from delete_branches.inventory import BranchInventory, BranchRecord
+from delete_branches.protection import ProtectionRules
+
+HEADS_PREFIX = "refs/heads/"
+TIMEOUT = 60
+
+
+def parse_advertisement(data: bytes) -> Dict[str, str]:
+    """
+    Parse branch heads from a smart-HTTP (pkt-line) git-upload-pack ref advertisement
+
+    Parameter(s):
+    data: response body of GET {url}/info/refs?service=git-upload-pack
+    """
+    heads = {}
+    pos = 0
+    while pos + 4 <= len(data):
+        start = pos + 4
+        length = int(data[pos:start], 16)
+        if length == 0:
+            """flush-pkt"""
+            pos = start
+            continue
+        end = pos + length
+        line = data[start:end].split(b"\0", 1)[0].rstrip(b"\n").decode()
+        pos = end
+        sha, _, ref = line.partition(" ")
+        if ref.startswith(HEADS_PREFIX):
+            heads[ref.removeprefix(HEADS_PREFIX)] = sha
+    return heads
+
+
+def parse_ls_remote(output: str) -> Dict[str, str]:
+    """
+    Parse branch heads from `git ls-remote --heads` output
+
+    Parameter(s):
+    output: lines of '<sha>\\t<ref>'
+    """
+    heads = {}
+    for line in output.splitlines():
+        sha, _, ref = line.partition("\t")
+        if ref.startswith(HEADS_PREFIX):
+            heads[ref.removeprefix(HEADS_PREFIX)] = sha
+    return heads
+
+
+def fetch_heads(url: str, token: Optional[str] = None) -> Dict[str, str]:
+    """
+    Return branch name -> head sha from one ref advertisement; http(s) urls are read directly,
+    other urls (local paths, file://, ssh) through `git ls-remote`
+
+    Parameter(s):
+    url  : git remote url
+    token: GitHub token used for http(s) basic authentication
+    """
+    if url.startswith(("https://", "http://")):
+        response = requests.get(
+            f"{url.rstrip('/')}/info/refs",
+            params={"service": "git-upload-pack"},
+            auth=("x-access-token", token) if token else None,
+            timeout=TIMEOUT,
+        )
+        response.raise_for_status()
+        return parse_advertisement(response.content)
+
+    output = subprocess.run(
+        ["git", "ls-remote", "--heads", url], capture_output=True, check=True, text=True, timeout=TIMEOUT
+    ).stdout
+    return parse_ls_remote(output)
+
+
+def get_protected_branches(repo: Repository.Repository) -> Set[str]:
+    """
+    List protected branch names (the ref advertisement carries no protection)
+
+    Parameter(s):
+    repo: github repository object
+    """
+    branches = PaginatedList(Branch.Branch, repo.requester, f"{repo.url}/branches", {"protected": "true"})
+    return {branch.name for branch in branches}
+
+
+def build_inventory_ls_remote(
+    repo: Repository.Repository, url: Optional[str] = None, protection: Optional[ProtectionRules] = None
+) -> BranchInventory:
+    """
+    Build branch inventory from one ref advertisement and the protection rules (or one protected-branch
+    listing); commit dates are resolved later in GraphQL batches, only for candidates not found in the cache
+
+    Parameter(s):
+    repo      : github repository object
+    url       : git remote url (default: repository clone url)
+    protection: protection rules fetched for the repository (None lists protected branches)
+    """
+    token = getattr(repo.requester.auth, "token", None)
+    heads = fetch_heads(url or repo.clone_url, token)
+    protected = protection.filter(set(heads)) if protection is not None else get_protected_branches(repo)
+    records = {name: BranchRecord(name=name, protected=name in protected, sha=sha) for name, sha in heads.items()}
+    return BranchInventory(records, resolver=partial(resolve_commit_dates, repo))
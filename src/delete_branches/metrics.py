@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+
+"""
+Purpose: Machine-readable run metrics (JSON file, GitHub Actions step outputs and job summary)
+"""
+
+import json
+import math
+import os
+from dataclasses import asdict
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+)
+
+from delete_branches import __version__
+from delete_branches.scheduler import PhaseUsage, RateLimitScheduler
+from delete_branches.sweep import RepoResult
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(values: List[float], q: int) -> float:
+    """
+    Nearest-rank percentile (0.0 for no values)
+
+    Parameter(s):
+    values: sample values
+    q     : percentile between 0 and 100
+    """
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    return ordered[max(math.ceil(q / 100 * len(ordered)) - 1, 0)]
+
+
+def phase_metrics(usage: PhaseUsage) -> Dict[str, Any]:
+    metrics: Dict[str, Any] = {key: value for key, value in asdict(usage).items() if key != "latencies"}
+    metrics["waited"] = round(usage.waited, 3)
+    metrics["elapsed"] = round(usage.elapsed, 3)
+    metrics["latency_ms"] = {f"p{q}": round(percentile(usage.latencies, q) * 1000, 1) for q in PERCENTILES}
+    metrics["latency_ms"]["max"] = round(max(usage.latencies, default=0.0) * 1000, 1)
+    return metrics
+
+
+def build_metrics(
+    scheduler: RateLimitScheduler, results: List[RepoResult], tokens: Optional[Dict[str, Dict[str, Any]]] = None
+) -> Dict[str, Any]:
+    """
+    Collect per-phase API usage and per-repository results of the run
+
+    Parameter(s):
+    scheduler: rate-limit scheduler holding usage per phase
+    results  : per-repository results
+    tokens   : usage per token of the token pool (omitted with a single token)
+    """
+    phases = {name: phase_metrics(usage) for name, usage in scheduler.phases.items()}
+    metrics: Dict[str, Any] = {
+        "version": __version__,
+        "phases": phases,
+        "totals": {
+            "requests": sum(phase["requests"] for phase in phases.values()),
+            "bytes": sum(phase["bytes"] for phase in phases.values()),
+            "cache_hits": sum(phase["cache_hits"] for phase in phases.values()),
+            "branches": sum(result.total for result in results),
+            "idle": sum(result.idle for result in results),
+            "deleted": sum(result.deleted for result in results),
+            "failed": sum(1 for result in results if result.error),
+        },
+        "rate_limit_remaining": dict(scheduler.remaining),
+        "repositories": [asdict(result) for result in results],
+    }
+    if tokens is not None:
+        metrics["tokens"] = tokens
+    return metrics
+
+
+def write_metrics_file(path: str, metrics: Dict[str, Any]) -> None:
+    """
+    Write metrics as JSON
+
+    Parameter(s):
+    path   : output file path
+    metrics: metrics from build_metrics()
+    """
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(metrics, f, indent=2)
+
+
+def write_github_outputs(metrics: Dict[str, Any]) -> None:
+    """
+    Append metrics to the GitHub Actions step outputs (GITHUB_OUTPUT) and job summary
+    (GITHUB_STEP_SUMMARY) when running in a workflow
+
+    Parameter(s):
+    metrics: metrics from build_metrics()
+    """
+    if os.environ.get("GITHUB_OUTPUT"):
+        with open(os.environ["GITHUB_OUTPUT"], "a", encoding="utf-8") as f:
+            for key, value in metrics["totals"].items():
+                f.write(f"{key}={value}\n")
+            f.write(f"metrics={json.dumps(metrics, separators=(',', ':'))}\n")
+
+    if os.environ.get("GITHUB_STEP_SUMMARY"):
+        lines = [
+            "### delete-branches",
+            "",
+            "| Phase | Requests | Bytes | Cache Hits | Retries | Wait (s) | Elapsed (s) | p50 (ms) | p90 (ms) | p99 (ms) |",
+            "|-------|---------:|------:|-----------:|--------:|---------:|------------:|---------:|---------:|---------:|",
+        ]
+        for name, phase in metrics["phases"].items():
+            latency = phase["latency_ms"]
+            lines.append(
+                f"| {name} | {phase['requests']} | {phase['bytes']} | {phase['cache_hits']} | {phase['retries']} | "
+                + f"{phase['waited']} | {phase['elapsed']} | {latency['p50']} | {latency['p90']} | {latency['p99']} |"
+            )
+        totals = metrics["totals"]
+        lines.append("")
+        lines.append(
+            f"Branches: {totals['branches']}, idle: {totals['idle']}, deleted: {totals['deleted']}, "
+            + f"failed repositories: {totals['failed']}"
+        )
+        with open(os.environ["GITHUB_STEP_SUMMARY"], "a", encoding="utf-8") as f:
+            f.write("\n".join(lines) + "\n")
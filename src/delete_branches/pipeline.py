@@ -0,0 +1,294 @@
+#!/usr/bin/env python
+
+"""
+Purpose: Streaming pipeline deleting branches page by page as they are listed
+"""
+
+import itertools
+from dataclasses import dataclass
+from datetime import datetime
+from typing import (
+    Callable,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    TypeVar,
+)
+
+from github import Repository
+
+from delete_branches.async_api import build_inventory_async, list_pulls_async
+from delete_branches.cache import BranchCache
+from delete_branches.deletion import iter_deletes, print_deletes
+from delete_branches.graphql_api import (
+    PAGE_SIZE,
+    get_merged_branches,
+    iter_branch_records_graphql,
+    iter_pulls_graphql,
+)
+from delete_branches.inventory import BranchRecord, iter_branch_records, list_pulls
+from delete_branches.local_repo import build_inventory_local
+from delete_branches.ls_remote import build_inventory_ls_remote
+from delete_branches.plan import RepoPlan
+from delete_branches.policy import BranchPolicy
+from delete_branches.protection import ProtectionRules, get_protection_rules
+from delete_branches.rules import BranchRules
+from delete_branches.state import RepoState
+
+T = TypeVar("T")
+
+
+@dataclass
+class PipelineCounts:
+    """
+    Counts accumulated while branches flow through the pipeline
+
+    Attribute(s):
+    total     : number of branches listed
+    exempt    : number of listed branches exempt from delete
+    not_exempt: number of listed branches not exempt from delete
+    idle      : number of branches selected for delete
+    deleted   : number of branches deleted (0 on dry-run)
+    failed    : number of branches whose batched delete failed
+    """
+
+    total: int = 0
+    exempt: int = 0
+    not_exempt: int = 0
+    idle: int = 0
+    deleted: int = 0
+    failed: int = 0
+
+
+def iter_pages(items: Iterable[T], size: int = PAGE_SIZE) -> Iterator[List[T]]:
+    """
+    Group items into lists of up to `size` items
+
+    Parameter(s):
+    items: items to group
+    size : maximum number of items per list
+    """
+    iterator = iter(items)
+    while page := list(itertools.islice(iterator, size)):
+        yield page
+
+
+def get_stream_exempt_branches(repo: Repository.Repository, set_exclude_branches: Set[str], api: str) -> Set[str]:
+    """
+    Build exempt branch names known before listing: user excludes, default branch and pull
+    request branches (protected branches are exempted per record as they arrive)
+
+    Parameter(s):
+    repo                : github repository object
+    set_exclude_branches: set of branch(es) excluded from delete via user inputs
+    api                 : API used to list pull requests
+    """
+    set_exempt_branches = set(set_exclude_branches)
+    set_exempt_branches.add(repo.default_branch)
+    print(f"Default Branch           : {repo.default_branch}")
+
+    if api == "graphql":
+        pulls: Iterable = iter_pulls_graphql(repo)
+    elif api == "rest-async":
+        pulls = list_pulls_async(repo)
+    else:
+        pulls = list_pulls(repo)
+    for base_branch, head_branch in pulls:
+        set_exempt_branches.add(base_branch)
+        set_exempt_branches.add(head_branch)
+        print(f"Pull Request Head Branch : {head_branch}")
+
+    return set_exempt_branches
+
+
+def refine_page_selection(
+    repo: Repository.Repository,
+    idle: List[BranchRecord],
+    active: List[BranchRecord],
+    merged: bool = False,
+    policy: Optional[BranchPolicy] = None,
+) -> List[BranchRecord]:
+    """
+    Return the selected branches of a page: idle branches, plus active branches merged into the
+    default branch, narrowed by the policy
+
+    Parameter(s):
+    repo  : github repository object
+    idle  : idle not-exempt branches of the page
+    active: other not-exempt branches of the page
+    merged: also select branches merged into the default branch regardless of idle days
+    policy: policy the selected branches must also match
+    """
+    selected = list(idle)
+    if merged and active:
+        set_merged_branches = get_merged_branches(repo, [branch.name for branch in active])
+        selected.extend(branch for branch in active if branch.name in set_merged_branches)
+    return policy.select(repo, selected) if policy is not None else selected
+
+
+def stream_branches_to_delete(
+    repo: Repository.Repository,
+    branches: Iterable[BranchRecord],
+    set_exempt_branches: Set[str],
+    branch_max_idle: datetime,
+    counts: PipelineCounts,
+    merged: bool = False,
+    cache: Optional[BranchCache] = None,
+    resolver: Optional[Callable[[List[BranchRecord]], None]] = None,
+    rules: Optional[BranchRules] = None,
+    protection: Optional[ProtectionRules] = None,
+    state: Optional[RepoState] = None,
+    policy: Optional[BranchPolicy] = None,
+) -> Iterator[BranchRecord]:
+    """
+    Yield to-be-deleted branches one page at a time, so deletes start after the first page
+
+    Parameter(s):
+    repo               : github repository object
+    branches           : branch records in listing order
+    set_exempt_branches: set of exempt branches excluded from delete
+    branch_max_idle    : datetime on maximum number of days that the branch has been idle
+    counts             : counts updated as branches pass through
+    merged             : also select branches merged into the default branch regardless of idle days
+    cache              : cache of commit dates by head sha
+    resolver           : callable setting commit dates of a page of branches at once
+    rules              : exclude and include patterns matched per listed branch
+    protection         : protection rules and rulesets matched per listed branch
+    state              : branch heads of the previous run (unchanged branches reuse their commit date)
+    policy             : policy the selected branches of each page must also match
+    """
+    if rules is None:
+        rules = BranchRules()
+    for page in iter_pages(branches):
+        if protection is not None:
+            protection.mark(page)
+        set_page_exempt = {branch.name for branch in page if branch.name in set_exempt_branches or rules.exempt(branch.name)}
+        if state is not None:
+            state.fill_commit_dates(page)
+        if cache is not None:
+            cache.fill_commit_dates(repo.full_name, page)
+        if resolver is not None:
+            candidates = [branch for branch in page if not branch.protected and branch.name not in set_page_exempt]
+            unresolved = [branch for branch in candidates if branch.commit_date is None]
+            if unresolved:
+                resolver(unresolved)
+
+        list_branches_to_delete = []
+        list_active_branches = []
+        for branch in page:
+            counts.total += 1
+            if branch.protected and branch.name not in set_page_exempt:
+                print(f"Protected Branch         : {branch.name}")
+            if branch.protected or branch.name in set_page_exempt:
+                counts.exempt += 1
+                continue
+            counts.not_exempt += 1
+            if branch_max_idle > branch.get_commit_date():
+                list_branches_to_delete.append(branch)
+            else:
+                list_active_branches.append(branch)
+
+        list_branches_to_delete = refine_page_selection(repo, list_branches_to_delete, list_active_branches, merged, policy)
+
+        if cache is not None:
+            cache.store_commit_dates(repo.full_name, page)
+        if state is not None:
+            state.record(page)
+
+        counts.idle += len(list_branches_to_delete)
+        yield from list_branches_to_delete
+
+
+def run_pipeline(
+    repo: Repository.Repository,
+    api: str,
+    set_exclude_branches: Set[str],
+    branch_max_idle: datetime,
+    dry_run: bool,
+    concurrency: int = 1,
+    merged: bool = False,
+    cache: Optional[BranchCache] = None,
+    local_repo: Optional[str] = None,
+    delete_batch_size: int = 1,
+    rules: Optional[BranchRules] = None,
+    state: Optional[RepoState] = None,
+    plan: Optional[RepoPlan] = None,
+    policy: Optional[BranchPolicy] = None,
+) -> PipelineCounts:
+    """
+    List, select and delete branches in one pass with memory bounded by the page size
+
+    Parameter(s):
+    repo                : github repository object
+    api                 : API used to list branches and pull requests
+    set_exclude_branches: set of branch(es) excluded from delete via user inputs
+    branch_max_idle     : datetime on maximum number of days that the branch has been idle
+    dry_run             : mock delete when true
+    concurrency         : maximum number of concurrent delete requests
+    merged              : also delete branches merged into the default branch
+    cache               : cache of commit dates by head sha
+    local_repo          : local clone path branches and commit dates are read from (and deleted through when batched)
+    delete_batch_size   : number of branch refs deleted per round trip (1 deletes one branch per REST request)
+    rules               : exclude and include patterns (built from set_exclude_branches when not given)
+    state               : branch heads of the previous run (unchanged branches reuse their commit date)
+    plan                : deletion plan the selected branches are added to
+    policy              : policy the selected branches must also match
+    """
+    if rules is None:
+        rules = BranchRules(set_exclude_branches)
+    counts = PipelineCounts()
+    set_exempt_branches = get_stream_exempt_branches(repo, set_exclude_branches, api)
+    protection = get_protection_rules(repo)
+
+    resolver = None
+    if local_repo:
+        branches: Iterable[BranchRecord] = build_inventory_local(repo, local_repo, protection)
+    elif api == "ls-remote":
+        """the ref advertisement is a single response; commit dates are resolved page by page"""
+        inventory = build_inventory_ls_remote(repo, protection=protection)
+        branches = inventory
+        resolver = inventory.resolver
+    elif api == "rest-async":
+        """all pages are listed concurrently before any delete, so offsets cannot shift"""
+        inventory = build_inventory_async(repo)
+        branches = inventory
+        resolver = inventory.resolver
+    else:
+        """
+        REST pages and GraphQL cursors are offsets into the branch list, so a delete would shift
+        branches of later pages into pages already listed; pages are listed from the last backwards instead
+        """
+        list_branches = iter_branch_records_graphql if api == "graphql" else iter_branch_records
+        branches = list_branches(repo, reverse=True)
+    selected = stream_branches_to_delete(
+        repo,
+        branches,
+        set_exempt_branches,
+        branch_max_idle,
+        counts,
+        merged,
+        cache,
+        resolver,
+        rules,
+        protection,
+        state,
+        policy,
+    )
+
+    if plan is not None:
+        selected = plan.track(selected)
+
+    print("-" * 90)
+    deletes = iter_deletes(repo, selected, dry_run, concurrency, delete_batch_size, local_repo)
+    counts.deleted, counts.failed = print_deletes(deletes, dry_run)
+    if counts.idle == 0:
+        print("There is no branch to delete")
+
+    print(f"\nTotal Number of Branches                         : {counts.total}")
+    print(f"Total Number of Branches (Exempt-From-Delete)    : {counts.exempt}")
+    print(f"Total Number of Branches (Not-Exempt-From-Delete): {counts.not_exempt}")
+    print(f"Total Number of Branches (Selected-For-Delete)   : {counts.idle}")
+
+    return counts
@@ -0,0 +1,173 @@
+#!/usr/bin/env python
+
+"""
+Purpose: Deletion plan written by a reviewed dry run and applied later without listing or selection
+"""
+
+import json
+import os
+import threading
+from dataclasses import asdict, dataclass, field
+from datetime import datetime
+from typing import (
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+from github import Repository
+
+from delete_branches.graphql_api import get_ref_heads
+from delete_branches.inventory import BranchRecord
+
+PLAN_VERSION = 1
+
+
+@dataclass
+class PlanEntry:
+    """
+    One branch selected for delete
+
+    Attribute(s):
+    branch          : branch name
+    sha             : head commit sha when selected (deleted only while the branch still points at it)
+    last_commit_date: head commit committer date (ISO 8601)
+    reason          : idle or merged
+    """
+
+    branch: str
+    sha: str
+    last_commit_date: str
+    reason: str
+
+    def record(self) -> BranchRecord:
+        return BranchRecord(self.branch, False, self.sha, datetime.fromisoformat(self.last_commit_date))
+
+
+@dataclass
+class RepoPlan:
+    """
+    Branches of one repository selected for delete
+
+    Attribute(s):
+    branch_max_idle: idle threshold of the run (branches committed later were selected as merged)
+    entries        : selected branches
+    """
+
+    branch_max_idle: Optional[datetime] = None
+    entries: List[PlanEntry] = field(default_factory=list)
+
+    def add(self, branches: Iterable[BranchRecord]) -> None:
+        """
+        Add selected branches (commit dates resolved during selection)
+
+        Parameter(s):
+        branches: branch records selected for delete
+        """
+        for branch in branches:
+            commit_date = branch.get_commit_date()
+            idle = self.branch_max_idle is None or commit_date < self.branch_max_idle
+            self.entries.append(PlanEntry(branch.name, branch.sha, commit_date.isoformat(), "idle" if idle else "merged"))
+
+    def track(self, branches: Iterable[BranchRecord]) -> Iterator[BranchRecord]:
+        """
+        Add streamed branches as they are selected, passing them on
+
+        Parameter(s):
+        branches: branch records selected for delete
+        """
+        for branch in branches:
+            self.add([branch])
+            yield branch
+
+
+class DeletionPlan:
+    """
+    JSON deletion plan of every repository of a run
+
+    Parameter(s):
+    branch_max_idle: idle threshold of the run writing the plan (None when the plan is loaded)
+    """
+
+    def __init__(self, branch_max_idle: Optional[datetime] = None):
+        self.branch_max_idle = branch_max_idle
+        self.lock = threading.Lock()
+        self.repos: Dict[str, RepoPlan] = {}
+
+    def repo(self, full_name: str) -> RepoPlan:
+        """
+        Return the plan of a repository
+
+        Parameter(s):
+        full_name: repository full name
+        """
+        with self.lock:
+            if full_name not in self.repos:
+                self.repos[full_name] = RepoPlan(self.branch_max_idle)
+            return self.repos[full_name]
+
+    def save(self, path: str, created: datetime) -> None:
+        """
+        Write the plan
+
+        Parameter(s):
+        path   : plan file path
+        created: time of the run writing the plan
+        """
+        with self.lock:
+            data = {
+                "version": PLAN_VERSION,
+                "created": created.isoformat(),
+                "branch_max_idle": self.branch_max_idle.isoformat() if self.branch_max_idle else None,
+                "repositories": {name: [asdict(entry) for entry in plan.entries] for name, plan in self.repos.items()},
+            }
+        directory = os.path.dirname(os.path.abspath(path))
+        os.makedirs(directory, exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2)
+
+    @classmethod
+    def load(cls, path: str) -> "DeletionPlan":
+        """
+        Read a plan written by save()
+
+        Parameter(s):
+        path: plan file path
+        """
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != PLAN_VERSION:
+            raise ValueError(f"{path} is not a deletion plan (version {PLAN_VERSION})")
+        plan = cls(datetime.fromisoformat(data["branch_max_idle"]) if data.get("branch_max_idle") else None)
+        for full_name, entries in data["repositories"].items():
+            plan.repo(full_name).entries.extend(PlanEntry(**entry) for entry in entries)
+        return plan
+
+
+def compare_heads(repo: Repository.Repository, entries: List[PlanEntry]) -> Tuple[List[BranchRecord], Dict[str, str]]:
+    """
+    Compare planned branches with their current heads (one GraphQL request per 100 branches),
+    returning records of the branches still at their planned sha and a reason per skipped branch;
+    the records are deleted conditionally on that sha, as a branch may still move before its delete
+
+    Parameter(s):
+    repo   : github repository object
+    entries: planned branches
+    """
+    heads = get_ref_heads(repo, [entry.branch for entry in entries])
+    matched = []
+    skipped = {}
+    for entry in entries:
+        head = heads.get(entry.branch)
+        if head is None:
+            skipped[entry.branch] = "branch no longer exists"
+        elif head[1] != entry.sha:
+            skipped[entry.branch] = f"head moved ({entry.sha[:7]} -> {head[1][:7]})"
+        else:
+            record = entry.record()
+            record.ref_id = head[0]
+            matched.append(record)
+    return matched, skipped
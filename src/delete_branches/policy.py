@@ -0,0 +1,281 @@
+#!/usr/bin/env python
+
+"""
+Purpose: Branch selection policy, a boolean expression over branch attributes evaluated column by
+column over one table of the candidate branches of a repository
+"""
+
+import ast
+import operator
+import time
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    Iterator,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from github import Repository
+
+from delete_branches.graphql_api import ATTRIBUTE_FIELDS, get_branch_attributes
+from delete_branches.inventory import BranchRecord
+from delete_branches.rules import BranchMatcher
+
+DAY = 86400
+NUMERIC_COLUMNS = {"idle_days", "ahead", "behind"}
+TEXT_COLUMNS = {"name", "author", "pull"}
+PULL_STATES = {"open", "closed", "merged", "none"}
+OPERATORS: Dict[type, Tuple[str, Callable[[Any, Any], bool]]] = {
+    ast.Eq: ("==", operator.eq),
+    ast.NotEq: ("!=", operator.ne),
+    ast.Lt: ("<", operator.lt),
+    ast.LtE: ("<=", operator.le),
+    ast.Gt: (">", operator.gt),
+    ast.GtE: (">=", operator.ge),
+    ast.In: ("in", lambda value, values: value in values),
+    ast.NotIn: ("not in", lambda value, values: value not in values),
+}
+"""a comparison written constant first (e.g. 30 < idle_days) is turned around"""
+MIRRORED = {
+    ast.Lt: ast.Gt(),
+    ast.LtE: ast.GtE(),
+    ast.Gt: ast.Lt(),
+    ast.GtE: ast.LtE(),
+    ast.Eq: ast.Eq(),
+    ast.NotEq: ast.NotEq(),
+}
+
+
+def to_mask(values: Iterable[bool]) -> int:
+    """
+    Pack one boolean per row into an integer (bit i for row i), so and / or / not of whole
+    columns run a machine word at a time
+
+    Parameter(s):
+    values: boolean per row
+    """
+    bits = "".join(["1" if value else "0" for value in values])
+    return int(bits[::-1], 2) if bits else 0
+
+
+def iter_rows(mask: int) -> Iterator[int]:
+    """
+    Yield the rows set in the mask in ascending order
+
+    Parameter(s):
+    mask: rows packed by to_mask()
+    """
+    bits = bin(mask)[:1:-1]
+    row = bits.find("1")
+    while row != -1:
+        yield row
+        row = bits.find("1", row + 1)
+
+
+class BranchTable:
+    """
+    Attributes of the candidate branches of a repository, one list per column (row i of every
+    column is branch i); a value GitHub could not tell is None
+
+    Parameter(s):
+    columns: column name to values
+    """
+
+    def __init__(self, columns: Dict[str, List[Any]]):
+        self.columns = columns
+        self.rows = len(columns["name"])
+        self.all = (1 << self.rows) - 1
+        self.known_masks: Dict[str, int] = {}
+
+    def __len__(self) -> int:
+        return self.rows
+
+    def known(self, column: str) -> int:
+        """
+        Return the mask of the rows whose value of the column is known (not None)
+
+        Parameter(s):
+        column: column name
+        """
+        if column not in self.known_masks:
+            self.known_masks[column] = to_mask(value is not None for value in self.columns[column])
+        return self.known_masks[column]
+
+
+def build_branch_table(
+    repo: Optional[Repository.Repository], branches: List[BranchRecord], columns: Set[str], now: float
+) -> BranchTable:
+    """
+    Build the table of the columns used by a policy: name and idle days from the branch records,
+    other attributes of every branch in one batched GraphQL fetch
+
+    Parameter(s):
+    repo    : github repository object
+    branches: candidate branch records (commit dates resolved)
+    columns : columns used by the policy
+    now     : epoch seconds idle days are counted to
+    """
+    table: Dict[str, List[Any]] = {
+        "name": [branch.name for branch in branches],
+        "idle_days": [None if branch.committed_at is None else (now - branch.committed_at) / DAY for branch in branches],
+    }
+    fetched = [column for column in ATTRIBUTE_FIELDS if column in columns]
+    if fetched:
+        attributes = get_branch_attributes(repo, table["name"], fetched)
+        for column in fetched:
+            table[column] = [attributes.get(name, {}).get(column) for name in table["name"]]
+    return BranchTable(table)
+
+
+class BranchPolicy:
+    """
+    Boolean expression selecting branches among the idle (and merged) branches of a repository, e.g.
+    (matches(name, "renovate/*") or idle_days > 90) and author not in ["release-bot"] and pull != "open"
+
+    * columns: name, author (commit author login or name), idle_days, ahead and behind (commits
+      ahead of and behind the default branch), pull (state of the latest pull request from the
+      branch: open, closed, merged or none)
+    * comparisons ==, !=, <, <=, >, >=, in, not in between a column and a constant
+    * matches(column, pattern, ...) with branch names, globs or regexes as in --exclude-branches
+    * and, or, not and parentheses
+
+    A branch whose attribute is unknown matches no comparison of that attribute, negated or not.
+
+    Parameter(s):
+    expression: policy expression
+    """
+
+    def __init__(self, expression: str):
+        self.expression = expression
+        self.columns: Set[str] = set()
+        try:
+            tree = ast.parse(expression.strip(), mode="eval")
+        except SyntaxError as e:
+            raise ValueError(f"invalid policy '{expression}' ({e.msg})")
+        self.tree = self.compile(tree.body)
+
+    def error(self, message: str) -> ValueError:
+        return ValueError(f"invalid policy '{self.expression}' ({message})")
+
+    def column(self, node: ast.expr) -> str:
+        if not isinstance(node, ast.Name) or node.id not in NUMERIC_COLUMNS | TEXT_COLUMNS:
+            raise self.error(f"unknown column '{ast.unparse(node)}'")
+        self.columns.add(node.id)
+        return node.id
+
+    def constant(self, node: ast.expr) -> Any:
+        try:
+            return ast.literal_eval(node)
+        except ValueError:
+            raise self.error(f"'{ast.unparse(node)}' is not a constant")
+
+    def compile(self, node: ast.expr) -> Tuple[Any, ...]:
+        """
+        Check the expression and compile it into nested tuples: (and | or, children),
+        (not, child), (compare, column, operator, constant), (matches, column, matcher), (constant, bool)
+        """
+        if isinstance(node, ast.BoolOp):
+            return ("and" if isinstance(node.op, ast.And) else "or", [self.compile(value) for value in node.values])
+        if isinstance(node, ast.UnaryOp) and isinstance(node.op, ast.Not):
+            return ("not", self.compile(node.operand))
+        if isinstance(node, ast.Compare):
+            """a chained comparison (e.g. 7 < idle_days <= 30) is the and of its pairs"""
+            lefts = [node.left] + node.comparators[:-1]
+            pairs = [self.compile_compare(left, op, right) for left, op, right in zip(lefts, node.ops, node.comparators)]
+            return pairs[0] if len(pairs) == 1 else ("and", pairs)
+        if isinstance(node, ast.Call) and isinstance(node.func, ast.Name) and node.func.id == "matches":
+            if len(node.args) < 2 or node.keywords:
+                raise self.error("matches() takes a column and one or more patterns")
+            patterns = [self.constant(arg) for arg in node.args[1:]]
+            if not all(isinstance(pattern, str) for pattern in patterns):
+                raise self.error("matches() patterns are strings")
+            return ("matches", self.column(node.args[0]), BranchMatcher(patterns))
+        if isinstance(node, ast.Constant) and isinstance(node.value, bool):
+            return ("constant", node.value)
+        raise self.error(f"unsupported expression '{ast.unparse(node)}'")
+
+    def compile_compare(self, left: ast.expr, op: ast.cmpop, right: ast.expr) -> Tuple[Any, ...]:
+        if not isinstance(left, ast.Name) and isinstance(right, ast.Name) and type(op) in MIRRORED:
+            left, op, right = right, MIRRORED[type(op)], left
+        if type(op) not in OPERATORS:
+            raise self.error("'is' and 'is not' are not supported")
+        column = self.column(left)
+        value = self.constant(right)
+        values = value if isinstance(op, (ast.In, ast.NotIn)) else [value]
+        if isinstance(op, (ast.In, ast.NotIn)):
+            if not isinstance(value, (list, tuple, set)):
+                raise self.error(f"'{OPERATORS[type(op)][0]}' takes a list")
+            value = frozenset(value)
+        expected = (int, float) if column in NUMERIC_COLUMNS else str
+        if not all(isinstance(item, expected) and not isinstance(item, bool) for item in values):
+            raise self.error(f"{column} is compared with {'numbers' if column in NUMERIC_COLUMNS else 'strings'}")
+        if column == "pull" and not set(values) <= PULL_STATES:
+            raise self.error(f"pull is one of {', '.join(sorted(PULL_STATES))}")
+        return ("compare", column, type(op), value)
+
+    def evaluate(self, node: Tuple[Any, ...], table: BranchTable) -> int:
+        """
+        Return the mask of the rows matching the node
+        """
+        return self.masks(node, table)[0]
+
+    def masks(self, node: Tuple[Any, ...], table: BranchTable) -> Tuple[int, int]:
+        """
+        Return the masks of the rows the node is true for and false for, one pass over a column
+        per comparison; a comparison of an unknown value is neither, so `not` (which swaps the
+        masks) does not select a branch whose attribute is unknown
+        """
+        kind = node[0]
+        if kind == "and":
+            true, false = table.all, 0
+            for child in node[1]:
+                child_true, child_false = self.masks(child, table)
+                true &= child_true
+                false |= child_false
+                if false == table.all:
+                    break
+            return true, false
+        if kind == "or":
+            true, false = 0, table.all
+            for child in node[1]:
+                child_true, child_false = self.masks(child, table)
+                true |= child_true
+                false &= child_false
+                if true == table.all:
+                    break
+            return true, false
+        if kind == "not":
+            true, false = self.masks(node[1], table)
+            return false, true
+        if kind == "constant":
+            return (table.all, 0) if node[1] else (0, table.all)
+        values = table.columns[node[1]]
+        if kind == "matches":
+            matcher = node[2]
+            true = to_mask(value is not None and value in matcher for value in values)
+        else:
+            compare = OPERATORS[node[2]][1]
+            constant = node[3]
+            true = to_mask(value is not None and compare(value, constant) for value in values)
+        return true, table.known(node[1]) ^ true
+
+    def select(
+        self, repo: Optional[Repository.Repository], branches: List[BranchRecord], now: Optional[float] = None
+    ) -> List[BranchRecord]:
+        """
+        Return the branches matching the policy, in their given order
+
+        Parameter(s):
+        repo    : github repository object
+        branches: candidate branch records (commit dates resolved)
+        now     : epoch seconds idle days are counted to (current time when not given)
+        """
+        if not branches:
+            return []
+        table = build_branch_table(repo, branches, self.columns, time.time() if now is None else now)
+        return [branches[row] for row in iter_rows(self.evaluate(self.tree, table))]
@@ -0,0 +1,147 @@
+#!/usr/bin/env python
+
+"""
+Purpose: Branch protection rule patterns and rulesets fetched once per repository and matched in memory
+"""
+
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+from github import GithubException, Repository
+
+from delete_branches.graphql_api import iter_connection
+from delete_branches.inventory import BranchRecord
+from delete_branches.rules import BranchMatcher
+
+QUERY_PROTECTION_RULES = """
+query($owner: String!, $name: String!, $first: Int!, $cursor: String) {
+  repository(owner: $owner, name: $name) {
+    branchProtectionRules(first: $first, after: $cursor) {
+      pageInfo { hasNextPage endCursor }
+      nodes { pattern }
+    }
+  }
+}
+"""
+
+HEADS_PREFIX = "refs/heads/"
+
+
+class ProtectionRules:
+    """
+    Branch protection rule patterns and the include/exclude ref patterns of active rulesets
+    restricting deletion, each compiled into a BranchMatcher
+
+    Parameter(s):
+    patterns: branch protection rule patterns (e.g. main, release/*)
+    rulesets: (include, exclude) branch patterns per ruleset
+    """
+
+    def __init__(self, patterns: Iterable[str] = (), rulesets: Iterable[Tuple[List[str], List[str]]] = ()):
+        self.patterns = BranchMatcher(patterns)
+        self.rulesets = [(BranchMatcher(include), BranchMatcher(exclude)) for include, exclude in rulesets]
+
+    def __contains__(self, name: object) -> bool:
+        return name in self.patterns or any(name in include and name not in exclude for include, exclude in self.rulesets)
+
+    def filter(self, names: Set[str]) -> Set[str]:
+        """
+        Return the protected names
+
+        Parameter(s):
+        names: branch names
+        """
+        protected = self.patterns.filter(names)
+        for include, exclude in self.rulesets:
+            matched = include.filter(names)
+            protected |= matched - exclude.filter(matched)
+        return protected
+
+    def mark(self, records: Iterable[BranchRecord]) -> None:
+        """
+        Flag records of protected branches as protected, so later phases exempt them like listed protected branches
+
+        Parameter(s):
+        records: branch records
+        """
+        for record in records:
+            if not record.protected and record.name in self:
+                record.protected = True
+
+
+def ruleset_branch_patterns(ref_names: List[str], default_branch: str) -> List[str]:
+    """
+    Turn ruleset ref name conditions into branch patterns
+
+    Parameter(s):
+    ref_names     : e.g. ~DEFAULT_BRANCH, ~ALL, refs/heads/release/**
+    default_branch: repository default branch
+    """
+    patterns = []
+    for ref_name in ref_names:
+        if ref_name == "~DEFAULT_BRANCH":
+            patterns.append(default_branch)
+        elif ref_name == "~ALL":
+            patterns.append("*")
+        else:
+            """`**` and `*` both match across `/` once compiled, which only widens the exemption"""
+            patterns.append(ref_name.removeprefix(HEADS_PREFIX).replace("**", "*"))
+    return patterns
+
+
+def get_protection_patterns(repo: Repository.Repository) -> List[str]:
+    """
+    List branch protection rule patterns (GraphQL, 100 rules per request)
+
+    Parameter(s):
+    repo: github repository object
+    """
+    return [node["pattern"] for node in iter_connection(repo, QUERY_PROTECTION_RULES, "branchProtectionRules")]
+
+
+def get_deletion_rulesets(repo: Repository.Repository) -> List[Tuple[List[str], List[str]]]:
+    """
+    List (include, exclude) branch patterns of active branch rulesets (including rulesets of the
+    organization) with a deletion rule; one request for the list and one per branch ruleset
+
+    Parameter(s):
+    repo: github repository object
+    """
+    _, summaries = repo.requester.requestJsonAndCheck("GET", f"{repo.url}/rulesets", {"includes_parents": "true"})
+    rulesets = []
+    for summary in summaries or []:
+        if summary.get("target", "branch") != "branch" or summary.get("enforcement") != "active":
+            continue
+        _, ruleset = repo.requester.requestJsonAndCheck("GET", f"{repo.url}/rulesets/{summary['id']}")
+        if not any(rule.get("type") == "deletion" for rule in ruleset.get("rules", [])):
+            continue
+        ref_name: Dict[str, Any] = (ruleset.get("conditions") or {}).get("ref_name") or {}
+        rulesets.append(
+            (
+                ruleset_branch_patterns(ref_name.get("include", []), repo.default_branch),
+                ruleset_branch_patterns(ref_name.get("exclude", []), repo.default_branch),
+            )
+        )
+    return rulesets
+
+
+def get_protection_rules(repo: Repository.Repository) -> Optional[ProtectionRules]:
+    """
+    Fetch branch protection rule patterns and deletion rulesets once; None when the token cannot
+    read them (exemption then relies on the protected flag of listed branches)
+
+    Parameter(s):
+    repo: github repository object
+    """
+    try:
+        return ProtectionRules(get_protection_patterns(repo), get_deletion_rulesets(repo))
+    except GithubException as e:
+        print(f"Protection Rules         : not readable ({e.status})")
+        return None
@@ -0,0 +1,118 @@
+#!/usr/bin/env python
+
+"""
+Purpose: Branch exclude and include rules compiled into one matcher per rule set
+"""
+
+import fnmatch
+import re
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    Optional,
+    Set,
+)
+
+GLOB_CHARS = "*?["
+TRIE_END = ""
+
+
+class BranchMatcher:
+    """
+    Branch name patterns compiled into one matcher, so each branch name is checked once
+    whatever the number of patterns:
+    * exact names in a set
+    * globs whose only wildcard is a trailing `*` (e.g. release/*) in a prefix trie
+    * other globs (e.g. *-wip) and regexes (starting with ^, e.g. ^renovate/.*) in one alternation regex
+
+    Parameter(s):
+    patterns: branch names, globs or regexes
+    """
+
+    def __init__(self, patterns: Iterable[str]):
+        self.names: Set[str] = set()
+        self.trie: Dict[str, Any] = {}
+        alternatives = []
+        for pattern in patterns:
+            if pattern.startswith("^"):
+                try:
+                    re.compile(pattern)
+                except re.error as e:
+                    raise ValueError(f"invalid branch pattern '{pattern}' ({e})")
+                alternatives.append(pattern)
+            elif pattern.endswith("*") and not any(char in pattern[:-1] for char in GLOB_CHARS):
+                self.add_prefix(pattern[:-1])
+            elif any(char in pattern for char in GLOB_CHARS):
+                alternatives.append(fnmatch.translate(pattern))
+            elif pattern:
+                self.names.add(pattern)
+        self.regex: Optional[re.Pattern] = (
+            re.compile("|".join(f"(?:{alternative})" for alternative in alternatives)) if alternatives else None
+        )
+
+    def add_prefix(self, prefix: str) -> None:
+        node = self.trie
+        for char in prefix:
+            node = node.setdefault(char, {})
+        node[TRIE_END] = True
+
+    def match_prefix(self, name: str) -> bool:
+        node = self.trie
+        for char in name:
+            if TRIE_END in node:
+                return True
+            node = node.get(char)
+            if node is None:
+                return False
+        return TRIE_END in node
+
+    def __contains__(self, name: object) -> bool:
+        if not isinstance(name, str):
+            return False
+        return (
+            name in self.names or self.match_prefix(name) or (self.regex is not None and self.regex.match(name) is not None)
+        )
+
+    def __bool__(self) -> bool:
+        return bool(self.names or self.trie or self.regex)
+
+    def filter(self, names: Set[str]) -> Set[str]:
+        """
+        Return the names matching any pattern (a set intersection when all patterns are exact names)
+
+        Parameter(s):
+        names: branch names
+        """
+        if not self.trie and self.regex is None:
+            return names & self.names
+        return {name for name in names if name in self}
+
+
+class BranchRules:
+    """
+    Exclude and include patterns applied to the branches of every repository of the run
+
+    Parameter(s):
+    exclude: branch names, globs or regexes never deleted
+    include: branch names, globs or regexes restricting delete to matching branches (empty allows all)
+    """
+
+    def __init__(self, exclude: Iterable[str] = (), include: Iterable[str] = ()):
+        self.exclude = BranchMatcher(exclude)
+        self.include = BranchMatcher(include)
+
+    def exempt(self, name: str) -> bool:
+        """
+        Return True when the branch is excluded or not included
+        """
+        return name in self.exclude or (bool(self.include) and name not in self.include)
+
+    def not_included(self, names: Set[str]) -> Set[str]:
+        """
+        Return the names outside the include patterns (none without include patterns)
+
+        Parameter(s):
+        names: branch names
+        """
+        return names - self.include.filter(names) if self.include else set()
@@ -0,0 +1,340 @@
+#!/usr/bin/env python
+
+"""
+Purpose: Rate-limit-aware scheduling of GitHub API requests
+"""
+
+from __future__ import annotations
+
+import contextvars
+import json
+import random
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Awaitable,
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+if TYPE_CHECKING:
+    import requests
+
+    from delete_branches.token_pool import TokenPool
+
+"""GitHub secondary rate limit: 900 points per minute, 1 point per read and 5 points per write, GraphQL mutations included"""
+DEFAULT_POINTS_PER_MINUTE = 900
+WRITE_POINTS = 5
+RETRY_STATUSES = {500, 502, 503, 504}
+
+
+@dataclass
+class PhaseUsage:
+    """
+    API budget consumed by one phase of the run
+
+    Attribute(s):
+    requests: number of HTTP requests sent (retries included)
+    used    : number of responses counted against the primary rate limit
+    points  : secondary rate-limit points spent
+    retries   : number of retried requests
+    waited    : seconds spent waiting on rate limits and backoff
+    bytes     : response body bytes received
+    cache_hits: number of 304 responses to conditional requests
+    elapsed   : seconds spent inside the phase (summed across repositories)
+    latencies : seconds per HTTP request
+    """
+
+    requests: int = 0
+    used: int = 0
+    points: int = 0
+    retries: int = 0
+    waited: float = 0.0
+    bytes: int = 0
+    cache_hits: int = 0
+    elapsed: float = 0.0
+    latencies: List[float] = field(default_factory=list, repr=False)
+
+
+class RateLimitScheduler:
+    """
+    Paces requests to stay inside GitHub primary and secondary rate limits, retries
+    rate-limited and failed requests with jittered backoff, and records usage per phase
+
+    Parameter(s):
+    points_per_minute: secondary rate-limit points the run may spend per minute
+    reserve          : primary rate-limit requests to leave untouched before waiting for reset
+    max_retries      : maximum number of retries per request
+    backoff_base     : first backoff ceiling in seconds (doubled on every retry)
+    backoff_cap      : maximum backoff ceiling in seconds
+    """
+
+    def __init__(
+        self,
+        points_per_minute: int = DEFAULT_POINTS_PER_MINUTE,
+        reserve: int = 0,
+        max_retries: int = 5,
+        backoff_base: float = 1.0,
+        backoff_cap: float = 60.0,
+        sleep: Callable[[float], None] = time.sleep,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.points_per_minute = points_per_minute
+        self.reserve = reserve
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_cap = backoff_cap
+        self.sleep = sleep
+        self.clock = clock
+
+        self.lock = threading.Lock()
+        self.tokens = float(points_per_minute)
+        self.refilled_at = clock()
+        self.remaining: Dict[str, int] = {}
+        self.reset: Dict[str, float] = {}
+        """set by transport.install() when requests are spread over a token pool"""
+        self.pool: Optional[TokenPool] = None
+        self.current_phase: contextvars.ContextVar[str] = contextvars.ContextVar("phase", default="other")
+        self.phases: Dict[str, PhaseUsage] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[PhaseUsage]:
+        """
+        Attribute requests sent inside the block (and worker threads started with a copy of
+        its context) to the named phase
+        """
+        token = self.current_phase.set(name)
+        usage = self.usage(name)
+        started = self.clock()
+        try:
+            yield usage
+        finally:
+            self.current_phase.reset(token)
+            with self.lock:
+                usage.elapsed += self.clock() - started
+
+    def usage(self, name: Optional[str] = None) -> PhaseUsage:
+        name = name or self.current_phase.get()
+        with self.lock:
+            return self.phases.setdefault(name, PhaseUsage())
+
+    @staticmethod
+    def resource(url: str) -> str:
+        return "graphql" if url.split("?", 1)[0].endswith("/graphql") else "core"
+
+    @staticmethod
+    def is_mutation(body: Any) -> bool:
+        """
+        Return True when a GraphQL request body holds a mutation
+        """
+        try:
+            query = json.loads(body or "{}").get("query") or ""
+        except (TypeError, ValueError, AttributeError):
+            return False
+        return query.lstrip().startswith("mutation")
+
+    @staticmethod
+    def points(verb: str, url: str, body: Any = None) -> int:
+        if RateLimitScheduler.resource(url) == "graphql":
+            return WRITE_POINTS if RateLimitScheduler.is_mutation(body) else 1
+        return 1 if verb in ("GET", "HEAD") else WRITE_POINTS
+
+    def send(self, verb: str, url: str, request: Callable[[], requests.Response], body: Any = None) -> requests.Response:
+        """
+        Send one request through the scheduler
+
+        Parameter(s):
+        verb   : HTTP method
+        url    : request url
+        request: callable performing the HTTP request
+        body   : request body (a GraphQL mutation costs the points of a write)
+        """
+        import requests
+
+        usage = self.usage()
+        for attempt in range(self.max_retries + 1):
+            self.acquire(verb, url, usage, body)
+            started = self.clock()
+            try:
+                response = request()
+            except (requests.ConnectionError, requests.Timeout):
+                if attempt == self.max_retries:
+                    raise
+                self.wait(self.backoff(attempt), usage, retry=True)
+                continue
+
+            with self.lock:
+                usage.latencies.append(self.clock() - started)
+                usage.bytes += len(response.content)
+            self.observe(response, usage)
+            delay = self.retry_delay(response, attempt)
+            if delay is None or attempt == self.max_retries:
+                return response
+            self.wait(delay, usage, retry=True)
+
+        raise AssertionError("unreachable")  # pragma: no cover
+
+    async def send_async(
+        self, verb: str, url: str, request: Callable[[], Awaitable[Any]], retry_on: Tuple[type, ...] = ()
+    ) -> Any:
+        """
+        Send one request of an asyncio client through the scheduler; waits run in worker threads
+        so other requests of the event loop keep going
+
+        Parameter(s):
+        verb    : HTTP method
+        url     : request url
+        request : coroutine function performing the HTTP request (response with status_code, headers, content)
+        retry_on: connection exceptions of the client retried with backoff
+        """
+        import asyncio
+
+        usage = self.usage()
+        for attempt in range(self.max_retries + 1):
+            await asyncio.to_thread(self.acquire, verb, url, usage)
+            started = self.clock()
+            try:
+                response = await request()
+            except retry_on:
+                if attempt == self.max_retries:
+                    raise
+                await asyncio.to_thread(self.wait, self.backoff(attempt), usage, True)
+                continue
+
+            with self.lock:
+                usage.latencies.append(self.clock() - started)
+                usage.bytes += len(response.content)
+            self.observe(response, usage)
+            delay = self.retry_delay(response, attempt)
+            if delay is None or attempt == self.max_retries:
+                return response
+            await asyncio.to_thread(self.wait, delay, usage, True)
+
+        raise AssertionError("unreachable")  # pragma: no cover
+
+    def acquire(self, verb: str, url: str, usage: PhaseUsage, body: Any = None) -> None:
+        """
+        Wait until the request fits the primary reserve and the secondary points budget
+        """
+        resource = self.resource(url)
+        remaining: Optional[int]
+        if self.pool is not None:
+            """rate limits are per token: only a pool without a token above the reserve waits"""
+            remaining, reset = self.pool.budget(resource)
+        else:
+            with self.lock:
+                remaining = self.remaining.get(resource)
+                reset = self.reset.get(resource, 0.0)
+        if remaining is not None and remaining <= self.reserve and reset > self.clock():
+            self.wait(reset - self.clock() + 1, usage)
+            with self.lock:
+                self.remaining.pop(resource, None)
+
+        points = self.points(verb, url, body)
+        with self.lock:
+            now = self.clock()
+            self.tokens = min(
+                float(self.points_per_minute), self.tokens + (now - self.refilled_at) * self.points_per_minute / 60
+            )
+            self.refilled_at = now
+            self.tokens -= points
+            deficit = -self.tokens
+            usage.requests += 1
+            usage.points += points
+        if deficit > 0:
+            self.wait(deficit * 60 / self.points_per_minute, usage)
+
+    def observe(self, response: requests.Response, usage: PhaseUsage) -> None:
+        """
+        Record X-RateLimit-* headers of the response
+        """
+        headers = response.headers
+        if response.status_code == 304:
+            with self.lock:
+                usage.cache_hits += 1
+        if "X-RateLimit-Remaining" not in headers:
+            return
+        resource = headers.get("X-RateLimit-Resource", self.resource(str(response.url or "")))
+        with self.lock:
+            self.remaining[resource] = int(float(headers["X-RateLimit-Remaining"]))
+            if "X-RateLimit-Reset" in headers:
+                self.reset[resource] = float(headers["X-RateLimit-Reset"])
+            if response.status_code != 304:
+                usage.used += 1
+
+    def retry_delay(self, response: requests.Response, attempt: int) -> Optional[float]:
+        """
+        Seconds to wait before retrying the response, None when it must not be retried
+        """
+        status = response.status_code
+        headers = response.headers
+        if status in (403, 429):
+            if "Retry-After" in headers:
+                return float(headers["Retry-After"])
+            if headers.get("X-RateLimit-Remaining") == "0" and "X-RateLimit-Reset" in headers:
+                resource = headers.get("X-RateLimit-Resource", self.resource(str(response.url or "")))
+                if self.pool is not None and self.pool.budget(resource)[0] > self.reserve:
+                    """the token is exhausted, not the pool: the retry goes to another token"""
+                    return 0.0
+                return max(float(headers["X-RateLimit-Reset"]) - self.clock(), 0) + 1
+            if status == 429 or "secondary rate limit" in response.text.lower():
+                return max(60.0, self.backoff(attempt))
+            return None
+        if status in RETRY_STATUSES:
+            return self.backoff(attempt)
+        return None
+
+    def backoff(self, attempt: int) -> float:
+        """full jitter exponential backoff"""
+        return random.uniform(0, min(self.backoff_cap, self.backoff_base * 2**attempt))
+
+    def wait(self, seconds: float, usage: PhaseUsage, retry: bool = False) -> None:
+        with self.lock:
+            usage.waited += seconds
+            usage.retries += 1 if retry else 0
+        self.sleep(seconds)
+
+    def merge(self, phases: Dict[str, PhaseUsage], remaining: Dict[str, int], reset: Dict[str, float]) -> None:
+        """
+        Add the usage recorded by the scheduler of another process (the lowest remaining rate
+        limit per resource is kept)
+
+        Parameter(s):
+        phases   : usage per phase
+        remaining: primary rate-limit requests remaining per resource
+        reset    : rate-limit reset time per resource
+        """
+        with self.lock:
+            for name, other in phases.items():
+                usage = self.phases.setdefault(name, PhaseUsage())
+                usage.requests += other.requests
+                usage.used += other.used
+                usage.points += other.points
+                usage.retries += other.retries
+                usage.waited += other.waited
+                usage.bytes += other.bytes
+                usage.cache_hits += other.cache_hits
+                usage.elapsed += other.elapsed
+                usage.latencies.extend(other.latencies)
+            for resource, value in remaining.items():
+                self.remaining[resource] = min(self.remaining.get(resource, value), value)
+            for resource, value in reset.items():
+                self.reset[resource] = max(self.reset.get(resource, value), value)
+
+    def print_summary(self) -> None:
+        """
+        Print API budget consumed per phase
+        """
+        print(f"\n{'API Budget by Phase':<25}: requests / rate-limit used / points / retries / wait (s)")
+        for name, usage in self.phases.items():
+            print(f"{name:<25}: {usage.requests} / {usage.used} / {usage.points} / {usage.retries} / {usage.waited:.1f}")
+        for resource, remaining in sorted(self.remaining.items()):
+            print(f"Rate Limit Remaining ({resource}): {remaining}")
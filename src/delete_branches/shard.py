@@ -0,0 +1,250 @@
+#!/usr/bin/env python
+
+"""
+Purpose: Shard organization-scale sweeps across worker processes, so JSON decoding and object
+construction of branch listings use more than one CPU
+"""
+
+import math
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field, replace
+from typing import (
+    Any,
+    Dict,
+    List,
+    Optional,
+    Tuple,
+)
+
+from delete_branches.plan import DeletionPlan, RepoPlan
+from delete_branches.scheduler import PhaseUsage, RateLimitScheduler
+from delete_branches.state import RepoState, RunState
+from delete_branches.sweep import RepoResult, iter_buffered
+from delete_branches.token_pool import TokenPool, TokenUsage
+
+
+@dataclass
+class ShardConfig:
+    """
+    Settings a worker process rebuilds its session, scheduler, cache and options from
+
+    Attribute(s):
+    options           : options applied to every repository (cache, state and plan are rebuilt per worker)
+    points_per_minute : share of the secondary rate-limit budget of one worker
+    reserve           : primary rate-limit requests left unused before waiting for reset
+    repo_concurrency  : maximum number of repositories processed concurrently by one worker
+    pool_size         : connection pool size of one worker
+    cache_dir         : directory of the branch cache (None disables caching)
+    cache_max_age_days: evict cache entries unused for more days
+    cache_max_size_mb : evict least recently used cache pages above this size
+    state_file        : run state file read by workers (written once by the parent)
+    plan              : collect the branches selected for delete
+    tokens            : primed usage of the pool tokens of the worker by label (None without a token pool)
+    """
+
+    options: Any
+    points_per_minute: int
+    reserve: int
+    repo_concurrency: int
+    pool_size: int
+    cache_dir: Optional[str] = None
+    cache_max_age_days: int = 30
+    cache_max_size_mb: int = 200
+    state_file: Optional[str] = None
+    plan: bool = False
+    tokens: Optional[Dict[str, TokenUsage]] = None
+
+
+@dataclass
+class ShardResult:
+    """
+    Outcome of one worker process
+
+    Attribute(s):
+    results   : (target index, result, printed output) per repository
+    phases    : API usage per phase
+    remaining : primary rate-limit requests remaining per resource
+    reset     : rate-limit reset time per resource
+    cache_hits: number of 304 responses to conditional requests
+    states    : run state recorded per repository
+    plans     : branches selected for delete per repository
+    tokens    : usage per token label of the token pool
+    """
+
+    results: List[Tuple[int, RepoResult, str]] = field(default_factory=list)
+    phases: Dict[str, PhaseUsage] = field(default_factory=dict)
+    remaining: Dict[str, int] = field(default_factory=dict)
+    reset: Dict[str, float] = field(default_factory=dict)
+    cache_hits: int = 0
+    states: Dict[str, RepoState] = field(default_factory=dict)
+    plans: Dict[str, RepoPlan] = field(default_factory=dict)
+    tokens: Dict[str, TokenUsage] = field(default_factory=dict)
+
+
+def partition(count: int, shards: int) -> List[List[int]]:
+    """
+    Deal target indexes round-robin into up to `shards` non-empty shards, so repositories listed
+    together (often of similar size in an organization listing) land in different workers
+
+    Parameter(s):
+    count : number of targets
+    shards: number of shards
+    """
+    return [list(range(shard, count, shards)) for shard in range(min(shards, count))]
+
+
+def token_slices(pool: Optional[TokenPool], shards: int) -> List[Optional[Dict[str, TokenUsage]]]:
+    """
+    Deal the tokens of the primed pool of the parent round-robin into disjoint slices, one per
+    worker, so workers neither prime the pool again nor all route to the same token (with fewer
+    tokens than workers, each worker gets one token)
+
+    Parameter(s):
+    pool  : token pool of the parent (None with a single token)
+    shards: number of workers
+    """
+    if pool is None:
+        return [None] * shards
+    usage = pool.usage()
+    labels = list(usage)
+    if len(labels) < shards:
+        return [{labels[shard % len(labels)]: usage[labels[shard % len(labels)]]} for shard in range(shards)]
+    return [{label: usage[label] for label in labels[shard::shards]} for shard in range(shards)]
+
+
+def run_shard(config: ShardConfig, targets: List[Tuple[int, str]]) -> ShardResult:
+    """
+    Process the repositories of one shard in a worker process over its own session
+
+    Parameter(s):
+    config : settings of the worker
+    targets: (target index, repository url) per repository of the shard
+    """
+    from delete_branches import transport
+    from delete_branches.cache import BranchCache
+    from delete_branches.cli import get_auth, process_repo
+
+    scheduler = RateLimitScheduler(points_per_minute=config.points_per_minute, reserve=config.reserve)
+    cache = BranchCache(config.cache_dir, config.cache_max_age_days, config.cache_max_size_mb) if config.cache_dir else None
+    options = replace(
+        config.options,
+        cache=cache,
+        state=RunState(config.state_file) if config.state_file else None,
+        plan=DeletionPlan(config.options.branch_max_idle) if config.plan else None,
+    )
+    try:
+        with scheduler.phase("auth"):
+            gh = get_auth(config.pool_size, scheduler, cache, config.tokens)
+        urls = [url for _, url in targets]
+        buffered = iter_buffered(urls, lambda target: process_repo(gh, target, options, scheduler), config.repo_concurrency)
+        shard = ShardResult([(index, result, output) for (index, _), (result, output) in zip(targets, buffered)])
+    finally:
+        if cache is not None:
+            cache.close()
+
+    shard.phases = scheduler.phases
+    shard.remaining = scheduler.remaining
+    shard.reset = scheduler.reset
+    shard.cache_hits = cache.hits if cache is not None else 0
+    shard.states = options.state.updated if options.state is not None else {}
+    shard.plans = options.plan.repos if options.plan is not None else {}
+    pool = transport.HTTPSPooledConnection.pool
+    shard.tokens = pool.usage() if pool is not None else {}
+    return shard
+
+
+def sweep_processes(
+    targets: List[Any],
+    config: ShardConfig,
+    processes: int,
+    scheduler: RateLimitScheduler,
+    options: Any,
+) -> List[RepoResult]:
+    """
+    Process targets across up to `processes` worker processes, print the output of each repository
+    as one block in target order, and merge API usage, cache hits, run state and plan of the
+    workers (and their token pool accounting) into those of the parent, returning the results in target order
+
+    Parameter(s):
+    targets  : repositories (url or repository object) to process
+    config   : settings of every worker
+    processes: number of worker processes
+    scheduler: scheduler of the parent the usage of the workers is added to
+    options  : options of the parent (cache, state and plan the workers' are added to)
+    """
+    from delete_branches import transport
+
+    shards = partition(len(targets), processes)
+    """repository objects listed by the parent are looked up again by url in the worker"""
+    urls = [target if isinstance(target, str) else f"https://github.com/{target.full_name}" for target in targets]
+    """spawned workers start without the threads and sessions of the parent"""
+    context = multiprocessing.get_context("spawn")
+    pool = transport.HTTPSPooledConnection.pool
+    slices = token_slices(pool, len(shards))
+    with ProcessPoolExecutor(max_workers=max(len(shards), 1), mp_context=context) as executor:
+        futures = [
+            executor.submit(run_shard, replace(config, tokens=tokens), [(index, urls[index]) for index in shard])
+            for shard, tokens in zip(shards, slices)
+        ]
+        shard_results = [future.result() for future in futures]
+
+    ordered = sorted((item for shard in shard_results for item in shard.results), key=lambda item: item[0])
+    for _, _, output in ordered:
+        print(output, end="")
+    for shard in shard_results:
+        scheduler.merge(shard.phases, shard.remaining, shard.reset)
+        if pool is not None:
+            pool.merge(shard.tokens)
+        if options.cache is not None:
+            options.cache.hits += shard.cache_hits
+        if options.state is not None:
+            options.state.updated.update(shard.states)
+        if options.plan is not None:
+            options.plan.repos.update(shard.plans)
+    return [result for _, result, _ in ordered]
+
+
+def shard_config(
+    options: Any,
+    processes: int,
+    rate_budget: int,
+    reserve: int,
+    repo_concurrency: int,
+    cache_dir: Optional[str] = None,
+    cache_max_age_days: int = 30,
+    cache_max_size_mb: int = 200,
+    state_file: Optional[str] = None,
+    plan: bool = False,
+) -> ShardConfig:
+    """
+    Split the rate budget and the repository concurrency of the run across worker processes
+    (tokens of a token pool are dealt to the workers by sweep_processes)
+
+    Parameter(s):
+    options           : options applied to every repository
+    processes         : number of worker processes
+    rate_budget       : secondary rate-limit points per minute of the run
+    reserve           : primary rate-limit requests left unused before waiting for reset
+    repo_concurrency  : maximum number of repositories processed concurrently by the run
+    cache_dir         : directory of the branch cache (None disables caching)
+    cache_max_age_days: evict cache entries unused for more days
+    cache_max_size_mb : evict least recently used cache pages above this size
+    state_file        : run state file read by workers
+    plan              : collect the branches selected for delete
+    """
+    from delete_branches.inventory import PULLS_CONCURRENCY
+
+    worker_concurrency = math.ceil(repo_concurrency / processes)
+    return ShardConfig(
+        options=replace(options, cache=None, state=None, plan=None),
+        points_per_minute=max(rate_budget // processes, 1),
+        reserve=reserve,
+        repo_concurrency=worker_concurrency,
+        pool_size=max(options.concurrency, PULLS_CONCURRENCY) * worker_concurrency,
+        cache_dir=cache_dir,
+        cache_max_age_days=cache_max_age_days,
+        cache_max_size_mb=cache_max_size_mb,
+        state_file=state_file,
+        plan=plan,
+    )
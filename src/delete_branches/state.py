@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+
+"""
+Purpose: Run state file recording branch heads per repository for incremental runs
+"""
+
+import json
+import os
+import threading
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+
+from delete_branches.inventory import BranchRecord
+
+STATE_VERSION = 1
+
+
+@dataclass
+class RepoState:
+    """
+    Branch heads of one repository from the previous run and those recorded in this run
+
+    Attribute(s):
+    last_run       : time of the previous run (None on the first run)
+    branch_max_idle: idle threshold of the previous run
+    previous       : branch name -> (head sha, commit date) of the previous run
+    current        : branch name -> (head sha, commit date) recorded in this run
+    """
+
+    last_run: Optional[datetime] = None
+    branch_max_idle: Optional[datetime] = None
+    previous: Dict[str, Tuple[str, datetime]] = field(default_factory=dict, repr=False)
+    current: Dict[str, Tuple[str, datetime]] = field(default_factory=dict, repr=False)
+
+    def fill_commit_dates(self, branches: Iterable[BranchRecord]) -> List[BranchRecord]:
+        """
+        Set commit dates of branches whose head is unchanged since the previous run, returning the
+        branches that changed or are new (only these need their commit date resolved)
+
+        Parameter(s):
+        branches: branch records
+        """
+        changed = []
+        for branch in branches:
+            previous = self.previous.get(branch.name)
+            if previous is not None and previous[0] == branch.sha:
+                if branch.commit_date is None:
+                    branch.commit_date = previous[1]
+            else:
+                changed.append(branch)
+        return changed
+
+    def crossed(self, branches: Iterable[BranchRecord], branch_max_idle: datetime) -> List[BranchRecord]:
+        """
+        Return unchanged branches that were active at the previous run and crossed the idle
+        threshold since
+
+        Parameter(s):
+        branches       : branch records with commit dates
+        branch_max_idle: idle threshold of this run
+        """
+        if self.branch_max_idle is None:
+            return []
+        return [
+            branch
+            for branch in branches
+            if branch.name in self.previous
+            and self.previous[branch.name][0] == branch.sha
+            and self.branch_max_idle <= self.previous[branch.name][1] < branch_max_idle
+        ]
+
+    def record(self, branches: Iterable[BranchRecord]) -> None:
+        """
+        Record head sha and commit date of branches whose commit date is known
+
+        Parameter(s):
+        branches: branch records
+        """
+        for branch in branches:
+            if branch.commit_date is not None:
+                self.current[branch.name] = (branch.sha, branch.commit_date)
+
+
+class RunState:
+    """
+    JSON state file of the last run per repository (restorable with actions/cache)
+
+    Parameter(s):
+    path: state file path (created on save)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.lock = threading.Lock()
+        self.repos: Dict[str, Dict[str, Any]] = {}
+        self.updated: Dict[str, RepoState] = {}
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == STATE_VERSION:
+                self.repos = data.get("repositories", {})
+
+    def repo(self, full_name: str) -> RepoState:
+        """
+        Return the state of a repository for this run
+
+        Parameter(s):
+        full_name: repository full name
+        """
+        with self.lock:
+            if full_name not in self.updated:
+                stored = self.repos.get(full_name)
+                state = RepoState()
+                if stored:
+                    state.last_run = datetime.fromisoformat(stored["last_run"])
+                    state.branch_max_idle = datetime.fromisoformat(stored["branch_max_idle"])
+                    state.previous = {
+                        name: (sha, datetime.fromisoformat(date)) for name, (sha, date) in stored["branches"].items()
+                    }
+                self.updated[full_name] = state
+            return self.updated[full_name]
+
+    def save(self, run_time: datetime, branch_max_idle: datetime) -> None:
+        """
+        Write the branches recorded in this run (repositories not processed keep their stored state)
+
+        Parameter(s):
+        run_time       : time of this run
+        branch_max_idle: idle threshold of this run
+        """
+        with self.lock:
+            for full_name, state in self.updated.items():
+                if not state.current:
+                    continue
+                self.repos[full_name] = {
+                    "last_run": run_time.isoformat(),
+                    "branch_max_idle": branch_max_idle.isoformat(),
+                    "branches": {name: [sha, date.isoformat()] for name, (sha, date) in state.current.items()},
+                }
+            """write a temporary file first so an interrupted run keeps the previous state"""
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            temporary = f"{self.path}.tmp"
+            with open(temporary, "w", encoding="utf-8") as f:
+                json.dump({"version": STATE_VERSION, "repositories": self.repos}, f, separators=(",", ":"))
+            os.replace(temporary, self.path)
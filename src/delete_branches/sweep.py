@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+
+"""
+Purpose: Process many repositories concurrently over one authenticated session
+"""
+
+import contextvars
+import io
+import sys
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import (
+    Any,
+    Callable,
+    Iterator,
+    List,
+    Optional,
+    TextIO,
+    Tuple,
+)
+
+_output: contextvars.ContextVar[Optional[io.StringIO]] = contextvars.ContextVar("output", default=None)
+
+
+@dataclass
+class RepoResult:
+    """
+    Outcome of processing one repository
+
+    Attribute(s):
+    repo      : repository full name (or url when the lookup failed)
+    total     : total number of branches
+    exempt    : number of branches exempt from delete
+    not_exempt: number of branches not exempt from delete
+    idle      : number of idle branches selected for delete
+    deleted   : number of branches deleted (0 on dry-run)
+    error     : error message when processing failed
+    """
+
+    repo: str
+    total: int = 0
+    exempt: int = 0
+    not_exempt: int = 0
+    idle: int = 0
+    deleted: int = 0
+    error: Optional[str] = None
+
+
+class _ContextOutput(io.TextIOBase):
+    """
+    stdout proxy writing to the buffer of the current context when one is set,
+    so repositories processed concurrently do not interleave their output
+    """
+
+    def __init__(self, stream: TextIO):
+        self.stream = stream
+
+    def write(self, text: str) -> int:
+        buffer = _output.get()
+        return (buffer if buffer is not None else self.stream).write(text)
+
+    def flush(self) -> None:
+        self.stream.flush()
+
+
+def _buffered(process: Callable[[Any], RepoResult], target: Any) -> tuple:
+    buffer = io.StringIO()
+    _output.set(buffer)
+    result = process(target)
+    return result, buffer.getvalue()
+
+
+def iter_buffered(
+    targets: List[Any], process: Callable[[Any], RepoResult], repo_concurrency: int = 1
+) -> Iterator[Tuple[RepoResult, str]]:
+    """
+    Process targets with up to `repo_concurrency` repositories in flight, yielding (result, output)
+    per repository in target order where output is everything the repository printed
+
+    Parameter(s):
+    targets         : repositories (url or repository object) to process
+    process         : callable processing one target
+    repo_concurrency: maximum number of repositories processed concurrently
+    """
+    stdout = sys.stdout
+    sys.stdout = _ContextOutput(stdout)
+    try:
+        with ThreadPoolExecutor(max_workers=max(repo_concurrency, 1)) as executor:
+            futures = [executor.submit(contextvars.copy_context().run, _buffered, process, target) for target in targets]
+            for future in futures:
+                yield future.result()
+    finally:
+        sys.stdout = stdout
+
+
+def sweep(targets: List[Any], process: Callable[[Any], RepoResult], repo_concurrency: int = 1) -> List[RepoResult]:
+    """
+    Process targets with up to `repo_concurrency` repositories in flight; the output of
+    each repository is printed as one block in target order
+
+    Parameter(s):
+    targets         : repositories (url or repository object) to process
+    process         : callable processing one target
+    repo_concurrency: maximum number of repositories processed concurrently
+    """
+    if repo_concurrency <= 1 or len(targets) <= 1:
+        return [process(target) for target in targets]
+
+    results = []
+    stdout = sys.stdout
+    for result, output in iter_buffered(targets, process, repo_concurrency):
+        stdout.write(output)
+        results.append(result)
+
+    return results
+
+
+def read_repo_list(path: str) -> List[str]:
+    """
+    Read repository urls from a file, one per line ('#' starts a comment)
+
+    Parameter(s):
+    path: file path
+    """
+    with open(path, encoding="utf-8") as f:
+        lines = (line.split("#", 1)[0].strip() for line in f)
+        return [line for line in lines if line]
+
+
+def print_summary_table(results: List[RepoResult]) -> None:
+    """
+    Print one row per repository and the aggregate total
+
+    Parameter(s):
+    results: per-repository results
+    """
+    total_label = f"Total ({len(results)} repositories)"
+    width = max([len(result.repo) for result in results] + [len("Repository"), len(total_label)])
+    header = f"{'Repository':<{width}} | Branches | Exempt | Not-Exempt | Idle | Deleted | Status"
+    print(f"\n{header}")
+    print("-" * len(header))
+    for result in results:
+        status = f"Error: {result.error}" if result.error else "OK"
+        print(
+            f"{result.repo:<{width}} | {result.total:>8} | {result.exempt:>6} | {result.not_exempt:>10} | "
+            + f"{result.idle:>4} | {result.deleted:>7} | {status}"
+        )
+    print("-" * len(header))
+    failed = sum(1 for result in results if result.error)
+    print(
+        f"{total_label:<{width}} | {sum(r.total for r in results):>8} | "
+        + f"{sum(r.exempt for r in results):>6} | {sum(r.not_exempt for r in results):>10} | "
+        + f"{sum(r.idle for r in results):>4} | {sum(r.deleted for r in results):>7} | {failed} failed"
+    )
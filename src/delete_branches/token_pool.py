@@ -0,0 +1,370 @@
+#!/usr/bin/env python
+
+"""
+Purpose: Pool of GitHub tokens (personal access tokens and GitHub App installation tokens) routing
+each request to the token with the most rate-limit budget left, with per-token accounting
+"""
+
+import threading
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import (
+    TYPE_CHECKING,
+    Any,
+    Callable,
+    Dict,
+    List,
+    Mapping,
+    Optional,
+    Tuple,
+)
+
+from github import Auth, GithubIntegration
+from github.GithubException import BadCredentialsException
+
+if TYPE_CHECKING:
+    from github.Requester import Requester
+
+"""tokens are ranked by their scarcest resource; a resource not yet reported is assumed at the default limit"""
+RESOURCES = ("core", "graphql")
+DEFAULT_LIMIT = 5000
+"""installation tokens live one hour and are refreshed this long before they expire"""
+REFRESH_MARGIN = timedelta(minutes=5)
+
+
+@dataclass
+class TokenUsage:
+    """
+    Rate-limit accounting of one token
+
+    Attribute(s):
+    requests : number of HTTP responses received with the token
+    limit    : requests allowed per rate-limit window and resource (installation tokens may get more)
+    remaining: requests remaining per resource (last X-RateLimit-Remaining)
+    reset    : epoch seconds the rate limit of each resource resets at
+    """
+
+    requests: int = 0
+    limit: Dict[str, int] = field(default_factory=dict)
+    remaining: Dict[str, int] = field(default_factory=dict)
+    reset: Dict[str, float] = field(default_factory=dict)
+
+
+class PoolToken:
+    """
+    A token of the pool: a fixed token, or a GitHub App installation token refreshed REFRESH_MARGIN
+    before it expires
+
+    Parameter(s):
+    label          : name printed in the summary (never the token itself)
+    value          : token (None for installation tokens)
+    integration    : GitHub App integration issuing installation tokens
+    installation_id: installation the token is issued for
+    """
+
+    def __init__(
+        self,
+        label: str,
+        value: Optional[str] = None,
+        integration: Optional[GithubIntegration] = None,
+        installation_id: Optional[int] = None,
+    ):
+        self.label = label
+        self._value = value
+        self.integration = integration
+        self.installation_id = installation_id
+        self.expires_at: Optional[datetime] = None
+        self.refreshes = 0
+        self.usage = TokenUsage()
+        self.lock = threading.Lock()
+
+    @property
+    def value(self) -> str:
+        with self.lock:
+            if self.integration is not None and (
+                self._value is None
+                or self.expires_at is None
+                or self.expires_at - REFRESH_MARGIN <= datetime.now(timezone.utc)
+            ):
+                authorization = self.integration.get_access_token(self.installation_id)
+                self._value = authorization.token
+                self.expires_at = authorization.expires_at
+                self.refreshes += 1
+            return self._value
+
+    def remaining(self, resource: str, now: float) -> int:
+        """
+        Return the requests remaining for the resource (the whole limit once its reset time passed)
+
+        Parameter(s):
+        resource: core or graphql
+        now     : epoch seconds
+        """
+        limit = self.usage.limit.get(resource, DEFAULT_LIMIT)
+        if resource in self.usage.reset and self.usage.reset[resource] <= now:
+            return limit
+        return self.usage.remaining.get(resource, limit)
+
+
+class TokenPool:
+    """
+    Tokens sharing the requests of a run.  A request goes to the token whose scarcest resource has
+    the most budget left, so REST and GraphQL heavy runs both spread across tokens; responses are
+    accounted to the token that sent them.
+
+    Parameter(s):
+    tokens: pool tokens
+    clock : callable returning epoch seconds
+    """
+
+    def __init__(self, tokens: List[PoolToken], clock: Callable[[], float] = time.time):
+        self.tokens = tokens
+        self.clock = clock
+        self.lock = threading.Lock()
+        self.owners: Dict[str, PoolToken] = {}
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    def acquire(self, resource: Optional[str] = None) -> PoolToken:
+        """
+        Return the token with the most budget left (for the resource when given, ties going to
+        the token whose scarcest resource has the most left)
+
+        Parameter(s):
+        resource: core or graphql
+        """
+        now = self.clock()
+
+        def rank(token: PoolToken) -> Tuple[int, int]:
+            scarcest = min(token.remaining(name, now) for name in RESOURCES)
+            return (token.remaining(resource, now) if resource else scarcest, scarcest)
+
+        with self.lock:
+            return max(self.tokens, key=rank)
+
+    def budget(self, resource: str) -> Tuple[int, float]:
+        """
+        Return the requests remaining for the resource on the token with the most left, and the
+        earliest reset of the resource across the pool (when an exhausted pool gets budget back)
+
+        Parameter(s):
+        resource: core or graphql
+        """
+        now = self.clock()
+        with self.lock:
+            remaining = max(token.remaining(resource, now) for token in self.tokens)
+            reset = min(token.usage.reset.get(resource, 0.0) for token in self.tokens)
+        return remaining, reset
+
+    def authorization(self, token: PoolToken) -> str:
+        """
+        Return the Authorization header value of the token, remembering which token sent it
+
+        Parameter(s):
+        token: pool token
+        """
+        value = token.value
+        with self.lock:
+            self.owners[value] = token
+        return value
+
+    def route(self, headers: Dict[str, str], url: str) -> Dict[str, str]:
+        """
+        Return the request headers with the Authorization of the token with the most budget left
+        for the resource of the url, picked anew for every attempt of a request; headers not
+        carrying a pool token and rate-limit reads of one token are returned unchanged
+
+        Parameter(s):
+        headers: request headers
+        url    : request url
+        """
+        authorization = headers.get("Authorization")
+        path = url.split("?", 1)[0]
+        if not authorization or authorization.split(" ", 1)[-1] not in self.owners or path.endswith("/rate_limit"):
+            return headers
+        resource = "graphql" if path.endswith("/graphql") else "core"
+        return {**headers, "Authorization": f"token {self.authorization(self.acquire(resource))}"}
+
+    def observe(self, authorization: Optional[str], headers: Mapping[str, str]) -> None:
+        """
+        Account a response to the token that sent the request (requests not sent with a pool token,
+        e.g. installation token requests signed with the App JWT, are not accounted)
+
+        Parameter(s):
+        authorization: Authorization header of the request
+        headers      : response headers
+        """
+        if not authorization:
+            return
+        token = self.owners.get(authorization.split(" ", 1)[-1])
+        if token is None:
+            return
+        with self.lock:
+            token.usage.requests += 1
+            if "X-RateLimit-Remaining" in headers:
+                resource = headers.get("X-RateLimit-Resource", "core")
+                token.usage.remaining[resource] = int(float(headers["X-RateLimit-Remaining"]))
+                if "X-RateLimit-Limit" in headers:
+                    token.usage.limit[resource] = int(float(headers["X-RateLimit-Limit"]))
+                if "X-RateLimit-Reset" in headers:
+                    token.usage.reset[resource] = float(headers["X-RateLimit-Reset"])
+
+    def prime(self, requester: "Requester") -> None:
+        """
+        Read the rate limit of every token, so budget already spent by other jobs sharing a token
+        is known before the first request is routed
+
+        Parameter(s):
+        requester: requester of the authenticated Github instance
+        """
+        for token in self.tokens:
+            try:
+                _, data = requester.withAuth(Auth.Token(self.authorization(token))).requestJsonAndCheck("GET", "/rate_limit")
+            except BadCredentialsException:
+                raise PermissionError(f"Invalid GitHub Token ({token.label})")
+            with self.lock:
+                for resource in RESOURCES:
+                    rate = data["resources"].get(resource)
+                    if rate is not None:
+                        token.usage.limit[resource] = int(rate["limit"])
+                        token.usage.remaining[resource] = int(rate["remaining"])
+                        token.usage.reset[resource] = float(rate["reset"])
+
+    def usage(self) -> Dict[str, TokenUsage]:
+        """
+        Return the accounting per token label (sent back by shard worker processes)
+        """
+        with self.lock:
+            return {token.label: token.usage for token in self.tokens}
+
+    def subset(self, usage: Dict[str, TokenUsage]) -> "TokenPool":
+        """
+        Return a pool of the tokens labelled in usage, starting from that (primed) rate-limit
+        accounting with no requests counted yet, e.g. the slice of the pool of the parent a
+        shard worker uses
+
+        Parameter(s):
+        usage: token label to usage
+        """
+        tokens = [token for token in self.tokens if token.label in usage]
+        for token in tokens:
+            other = usage[token.label]
+            token.usage = TokenUsage(0, dict(other.limit), dict(other.remaining), dict(other.reset))
+        return TokenPool(tokens, self.clock)
+
+    def merge(self, usage: Dict[str, TokenUsage]) -> None:
+        """
+        Add the accounting of the pool of another process, by token label (the lowest remaining
+        budget is kept)
+
+        Parameter(s):
+        usage: token label to usage
+        """
+        with self.lock:
+            for token in self.tokens:
+                other = usage.get(token.label)
+                if other is None:
+                    continue
+                token.usage.requests += other.requests
+                token.usage.limit.update(other.limit)
+                for resource, remaining in other.remaining.items():
+                    token.usage.remaining[resource] = min(token.usage.remaining.get(resource, remaining), remaining)
+                for resource, reset in other.reset.items():
+                    token.usage.reset[resource] = max(token.usage.reset.get(resource, reset), reset)
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Return the accounting per token label
+        """
+        with self.lock:
+            return {
+                token.label: {
+                    "requests": token.usage.requests,
+                    "remaining": dict(token.usage.remaining),
+                    "refreshes": token.refreshes,
+                }
+                for token in self.tokens
+            }
+
+    def print_summary(self) -> None:
+        """
+        Print requests and remaining rate limit per token
+        """
+        print(f"\n{'Token Pool':<25}: requests / core remaining / graphql remaining")
+        for label, metrics in self.metrics().items():
+            remaining = metrics["remaining"]
+            print(f"{label:<25}: {metrics['requests']} / {remaining.get('core', '-')} / {remaining.get('graphql', '-')}")
+
+
+class PooledAuth(Auth.Auth):
+    """
+    PyGithub authentication picking a token of the pool for every request
+
+    Parameter(s):
+    pool: token pool
+    """
+
+    def __init__(self, pool: TokenPool):
+        self.pool = pool
+
+    @property
+    def token_type(self) -> str:
+        return "token"
+
+    @property
+    def token(self) -> str:
+        return self.pool.authorization(self.pool.acquire())
+
+    @property
+    def _masked_token(self) -> str:
+        return "token (pooled token removed)"
+
+
+def read_private_key(value: str) -> str:
+    """
+    Return a PEM private key given inline or as a file path
+
+    Parameter(s):
+    value: GH_APP_PRIVATE_KEY value
+    """
+    if value.lstrip().startswith("-----BEGIN"):
+        return value
+    with open(value, encoding="utf-8") as f:
+        return f.read()
+
+
+def load_token_pool(environ: Mapping[str, str], base_url: str) -> Optional[TokenPool]:
+    """
+    Build the token pool from the environment, None when GH_TOKEN is the only token:
+    GH_TOKEN, GH_TOKENS (comma separated tokens) and GitHub App installations
+    (GH_APP_ID, GH_APP_PRIVATE_KEY inline or as a file path, GH_APP_INSTALLATION_IDS comma separated)
+
+    Parameter(s):
+    environ : environment variables
+    base_url: GitHub API url
+    """
+    tokens = []
+    if environ.get("GH_TOKEN"):
+        tokens.append(PoolToken("GH_TOKEN", environ["GH_TOKEN"]))
+    extra = [token.strip() for token in environ.get("GH_TOKENS", "").split(",") if token.strip()]
+    tokens.extend(PoolToken(f"GH_TOKENS[{i}]", token) for i, token in enumerate(extra))
+
+    installation_ids = [value.strip() for value in environ.get("GH_APP_INSTALLATION_IDS", "").split(",") if value.strip()]
+    if installation_ids:
+        try:
+            app_auth = Auth.AppAuth(int(environ["GH_APP_ID"]), read_private_key(environ["GH_APP_PRIVATE_KEY"]))
+        except KeyError as e:
+            raise KeyError(f"{e.args[0]} (environment variable) not found for GH_APP_INSTALLATION_IDS")
+        integration = GithubIntegration(auth=app_auth, base_url=base_url)
+        tokens.extend(
+            PoolToken(f"installation {installation_id}", integration=integration, installation_id=int(installation_id))
+            for installation_id in installation_ids
+        )
+
+    if len(tokens) == 1 and tokens[0].integration is None:
+        return None
+    if not tokens:
+        raise KeyError("GH_TOKEN (environment variable) not found")
+    return TokenPool(tokens)
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+
+"""
+Purpose: Thread-safe pooled HTTP transport for PyGithub requesters
+"""
+
+import threading
+from typing import (
+    Any,
+    Dict,
+    Optional,
+    Tuple,
+)
+
+import requests
+from github.Requester import Requester, RequestsResponse
+
+from delete_branches.cache import BranchCache
+from delete_branches.scheduler import RateLimitScheduler
+from delete_branches.token_pool import TokenPool
+
+_sessions: Dict[Tuple[str, str, int], requests.Session] = {}
+_sessions_lock = threading.Lock()
+
+
+def get_session(protocol: str, host: str, port: int, retry: Any = None, pool_size: Optional[int] = None) -> requests.Session:
+    """
+    Return the keep-alive session shared by every connection to the same host
+
+    Parameter(s):
+    protocol : http or https
+    host     : server hostname
+    port     : server port
+    retry    : urllib3 retry (int or Retry object) used by the session adapter
+    pool_size: maximum number of pooled connections to the host
+    """
+    key = (protocol, host, port)
+    with _sessions_lock:
+        if key not in _sessions:
+            session = requests.Session()
+            session.auth = Requester.noopAuth
+            adapter = requests.adapters.HTTPAdapter(
+                max_retries=requests.adapters.DEFAULT_RETRIES if retry is None else retry,
+                pool_connections=pool_size or requests.adapters.DEFAULT_POOLSIZE,
+                pool_maxsize=pool_size or requests.adapters.DEFAULT_POOLSIZE,
+            )
+            session.mount(f"{protocol}://", adapter)
+            _sessions[key] = session
+        return _sessions[key]
+
+
+class HTTPSPooledConnection:
+    """
+    httplib-like connection used by PyGithub Requester for a single request
+
+    PyGithub's own connection keeps the pending request on one shared object, so concurrent
+    threads overwrite each other's request. A new instance is created per request instead,
+    and keep-alive connections live in the shared session pool.
+    """
+
+    protocol = "https"
+    default_port = 443
+    scheduler: Optional[RateLimitScheduler] = None
+    cache: Optional[BranchCache] = None
+    pool: Optional[TokenPool] = None
+
+    def __init__(
+        self,
+        host: str,
+        port: Optional[int] = None,
+        strict: bool = False,
+        timeout: Optional[int] = None,
+        retry: Any = None,
+        pool_size: Optional[int] = None,
+        **kwargs: Any,
+    ):
+        self.host = host
+        self.port = port if port else self.default_port
+        self.timeout = timeout
+        self.verify = kwargs.get("verify", True)
+        self.session = get_session(self.protocol, host, self.port, retry, pool_size)
+
+    def request(self, verb: str, url: str, input: Any, headers: Dict[str, str], stream: bool = False) -> None:
+        self.verb = verb
+        self.url = url
+        self.input = input
+        self.headers = headers
+
+    def getresponse(self) -> RequestsResponse:
+        url = f"{self.protocol}://{self.host}:{self.port}{self.url}"
+
+        def send(headers: Dict[str, str]) -> requests.Response:
+            pool = HTTPSPooledConnection.pool
+            if pool is not None:
+                """every attempt, retries included, goes to the token with the most budget left"""
+                headers = pool.route(headers, url)
+            response = self.session.request(
+                self.verb,
+                url,
+                headers=headers,
+                data=self.input,
+                timeout=self.timeout,
+                verify=self.verify,
+                allow_redirects=False,
+            )
+            if pool is not None:
+                pool.observe(headers.get("Authorization"), response.headers)
+            return response
+
+        def schedule(headers: Dict[str, str]) -> requests.Response:
+            scheduler = HTTPSPooledConnection.scheduler
+            if scheduler is None:
+                return send(headers)
+            return scheduler.send(self.verb, url, lambda: send(headers), self.input)
+
+        cache = HTTPSPooledConnection.cache
+        response = cache.send(self.verb, url, self.headers, schedule) if cache is not None else schedule(self.headers)
+        return RequestsResponse(response)
+
+    def close(self) -> None:
+        """sessions are shared across connections and closed by close_sessions()"""
+
+
+class HTTPPooledConnection(HTTPSPooledConnection):
+    protocol = "http"
+    default_port = 80
+
+
+def install(
+    scheduler: Optional[RateLimitScheduler] = None, cache: Optional[BranchCache] = None, pool: Optional[TokenPool] = None
+) -> None:
+    """
+    Make requesters created from now on use the pooled thread-safe connections
+
+    Parameter(s):
+    scheduler: rate-limit scheduler every request is sent through (None sends directly)
+    cache    : cache making listing requests conditional (None disables conditional requests)
+    pool     : token pool routing every request attempt and accounting its response (None with a single token)
+    """
+    HTTPSPooledConnection.scheduler = scheduler
+    HTTPSPooledConnection.cache = cache
+    HTTPSPooledConnection.pool = pool
+    if scheduler is not None:
+        scheduler.pool = pool
+    Requester.injectConnectionClasses(HTTPPooledConnection, HTTPSPooledConnection)  # type: ignore
+
+
+def close_sessions() -> None:
+    """
+    Close all shared sessions
+    """
+    with _sessions_lock:
+        while _sessions:
+            _sessions.popitem()[1].close()
@@ -0,0 +1,110 @@
+#!/usr/bin/env python
+
+"""
+Purpose: cold-start benchmark of the CLI entry point (delete_branches.cli:main) with `python -X importtime`
+
+e.g. python tests/bench_importtime.py --runs 5
+"""
+
+import os
+import subprocess
+import sys
+from dataclasses import dataclass
+from typing import (
+    Dict,
+    List,
+    Tuple,
+)
+
+import click
+
+ENTRY_POINT = "delete_branches.cli"
+HEAVY_PACKAGES = ("github", "requests", "urllib3", "jwt", "cryptography", "asyncio", "httpx")
+"""packages loaded only when API work begins"""
+SCRIPT = "from delete_branches.cli import main\ntry:\n    main({args!r})\nexcept SystemExit:\n    pass\n"
+
+
+@dataclass
+class ImportResult:
+    """
+    Modules imported by one CLI invocation
+
+    Attribute(s):
+    args      : CLI arguments
+    cumulative: microseconds importing the entry point module (with its imports)
+    modules   : microseconds (self) per imported module
+    """
+
+    args: List[str]
+    cumulative: int
+    modules: Dict[str, int]
+
+    @property
+    def heavy(self) -> List[str]:
+        return sorted(name for name in self.modules if name.split(".")[0] in HEAVY_PACKAGES)
+
+
+def parse_importtime(stderr: str) -> Dict[str, Tuple[int, int]]:
+    """
+    Parse `-X importtime` lines into module -> (self, cumulative) microseconds
+
+    Parameter(s):
+    stderr: stderr of the interpreter
+    """
+    modules = {}
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "self [us]" in line:
+            continue
+        own, cumulative, name = line.removeprefix("import time:").split("|")
+        modules[name.strip()] = (int(own), int(cumulative))
+    return modules
+
+
+def run_python(*args: str) -> subprocess.CompletedProcess:
+    """
+    Run a fresh interpreter with the package source on its path
+
+    Parameter(s):
+    args: interpreter arguments
+    """
+    src = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "src")
+    env = {**os.environ, "PYTHONPATH": os.pathsep.join(filter(None, [src, os.environ.get("PYTHONPATH")]))}
+    return subprocess.run([sys.executable, *args], capture_output=True, text=True, env=env, check=True)
+
+
+def measure(args: List[str]) -> ImportResult:
+    """
+    Run the entry point with `args` in a fresh interpreter
+
+    Parameter(s):
+    args: CLI arguments
+    """
+    process = run_python("-X", "importtime", "-c", SCRIPT.format(args=args))
+    modules = parse_importtime(process.stderr)
+    return ImportResult(args, modules[ENTRY_POINT][1], {name: own for name, (own, _) in modules.items()})
+
+
+def imported_packages() -> List[str]:
+    """
+    Return the top-level packages in sys.modules after importing the entry point module
+    in a fresh interpreter
+    """
+    script = f"import sys\nimport {ENTRY_POINT}\nprint(' '.join(sorted({{name.split('.')[0] for name in sys.modules}})))"
+    return run_python("-c", script).stdout.split()
+
+
+@click.command()
+@click.option("--runs", type=click.IntRange(min=1), default=5, help="Runs per invocation (best is reported), default: 5")
+@click.option("--top", type=click.IntRange(min=0), default=10, help="Slowest modules listed, default: 10")
+def main(runs: int, top: int):
+    for args in (["--version"], ["--help"]):
+        results = [measure(args) for _ in range(runs)]
+        best = min(results, key=lambda result: result.cumulative)
+        print(f"\ndelete-branches {' '.join(args)}: {best.cumulative / 1000:.1f} ms importing {ENTRY_POINT}")
+        print(f"heavy packages loaded: {', '.join(best.heavy) or 'none'}")
+        for name, own in sorted(best.modules.items(), key=lambda item: -item[1])[:top]:
+            print(f"  {own / 1000:>8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
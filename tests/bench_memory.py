@@ -0,0 +1,137 @@
+#!/usr/bin/env python
+
+"""
+Purpose: offline benchmark of memory retained per branch by PyGithub Branch objects (as kept before
+branch records) and by branch records
+
+e.g. python tests/bench_memory.py --branches 10000 --branches 100000
+"""
+
+import gc
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timedelta, timezone
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    List,
+    Tuple,
+)
+from unittest.mock import Mock
+
+import click
+from github.Branch import Branch
+from github.Commit import Commit
+
+from delete_branches.inventory import BranchRecord
+
+API_URL = "https://api.github.com/repos/owner/repo"
+NOW = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+
+@dataclass
+class MemoryResult:
+    """
+    Memory retained by one branch representation
+
+    Attribute(s):
+    representation: representation name
+    branches      : number of branches held
+    bytes         : bytes retained by all branches
+    """
+
+    representation: str
+    branches: int
+    bytes: int
+
+    @property
+    def per_branch(self) -> float:
+        return self.bytes / self.branches
+
+
+def branch_payloads(count: int) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """
+    Build (listed branch, commit) REST payloads of `count` branches
+    """
+    payloads = []
+    for i in range(count):
+        sha = f"{i:040x}"
+        date = (NOW - timedelta(days=i % 60)).strftime("%Y-%m-%dT%H:%M:%SZ")
+        branch = {
+            "name": f"feature/branch-{i:06}",
+            "commit": {"sha": sha, "url": f"{API_URL}/commits/{sha}"},
+            "protected": False,
+        }
+        commit = {
+            "sha": sha,
+            "url": f"{API_URL}/commits/{sha}",
+            "commit": {"committer": {"name": "dev", "date": date}, "author": {"name": "dev", "date": date}},
+        }
+        payloads.append((branch, commit))
+    return payloads
+
+
+def build_pygithub(payloads: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> List[Any]:
+    """
+    Hold a Branch per branch with its commit completed, as the listed branch kept the commit date
+    """
+    requester = Mock()
+    branches = []
+    for branch_data, commit_data in payloads:
+        branch = Branch(requester, {}, branch_data)
+        commit = Commit(requester, {}, commit_data, completed=True)
+        branches.append((branch, commit, commit.commit.committer.date))
+    return branches
+
+
+def build_records(payloads: List[Tuple[Dict[str, Any], Dict[str, Any]]]) -> List[Any]:
+    """
+    Hold a branch record per branch with its commit date resolved
+    """
+    records = []
+    for branch_data, commit_data in payloads:
+        record = BranchRecord(branch_data["name"], branch_data["protected"], branch_data["commit"]["sha"])
+        record.commit_date = datetime.fromisoformat(commit_data["commit"]["committer"]["date"])
+        records.append(record)
+    return records
+
+
+def measure(
+    representation: str, build: Callable[[List[Tuple[Dict[str, Any], Dict[str, Any]]]], List[Any]], count: int
+) -> MemoryResult:
+    """
+    Measure memory retained by the objects built from freshly decoded payloads (payload dicts
+    and strings only count where the representation keeps them)
+    """
+    gc.collect()
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        payloads = branch_payloads(count)
+        held = build(payloads)
+        del payloads
+        gc.collect()
+        retained = tracemalloc.get_traced_memory()[0] - before
+    finally:
+        tracemalloc.stop()
+    del held
+    return MemoryResult(representation, count, retained)
+
+
+def run_benchmark(count: int) -> List[MemoryResult]:
+    return [measure("pygithub", build_pygithub, count), measure("record", build_records, count)]
+
+
+@click.command()
+@click.option("--branches", "list_branches", multiple=True, type=int, default=[10000, 100000], help="default: 10000, 100000")
+def main(list_branches: Tuple[int, ...]):
+    print(f"{'branches':>8} | {'representation':<14} | {'MiB':>8} | {'bytes/branch':>12}")
+    print("-" * 52)
+    for count in list_branches:
+        for result in run_benchmark(count):
+            print(f"{count:>8} | {result.representation:<14} | {result.bytes / 2**20:>8.1f} | {result.per_branch:>12.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,263 @@
+#!/usr/bin/env python
+
+"""
+Purpose: offline benchmark of requests, wall time and peak memory per phase against the fake GitHub API
+
+e.g. python tests/bench_phases.py --branches 1000 --branches 10000 --pulls 1000 --latency-ms 5
+"""
+
+import contextlib
+import io
+import json
+import multiprocessing
+import os
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from datetime import datetime, timedelta, timezone
+from typing import (
+    Dict,
+    Iterator,
+    List,
+    Optional,
+    Tuple,
+)
+
+import click
+from fake_github import FakeGitHub, FakeRepo
+
+from delete_branches import transport
+from delete_branches.cli import (
+    INVENTORY_BACKENDS,
+    delete_branches,
+    get_auth,
+    get_branches_to_delete,
+    get_exempt_branches,
+)
+from delete_branches.ls_remote import build_inventory_ls_remote
+from delete_branches.pipeline import run_pipeline
+from delete_branches.protection import get_protection_rules
+from delete_branches.scheduler import RateLimitScheduler
+
+REQUEST_KINDS = ("GET", "POST", "DELETE")
+
+
+@dataclass
+class Scenario:
+    """
+    Synthesized repository and API conditions of one benchmark run
+
+    Attribute(s):
+    branches         : number of branches besides the default branch
+    pulls            : number of open pull requests (heads are the first branches)
+    api              : API used to list branches and pull requests
+    idle_percent     : percent of branches idle for 30 days (others committed today)
+    latency          : seconds added to every response
+    rate_limit       : requests allowed per rate-limit window and resource (None is unlimited)
+    rate_limit_window: seconds until an exhausted rate limit resets
+    concurrency      : maximum number of concurrent delete requests
+    stream           : run the streaming pipeline instead of the phases
+    """
+
+    branches: int
+    pulls: int = 0
+    api: str = "rest"
+    idle_percent: int = 50
+    latency: float = 0.0
+    rate_limit: Optional[int] = None
+    rate_limit_window: float = 60.0
+    concurrency: int = 1
+    stream: bool = False
+
+
+@dataclass
+class PhaseResult:
+    """
+    Measurements of one phase
+
+    Attribute(s):
+    phase   : phase name
+    requests: HTTP requests received by the fake API during the phase
+    wall    : wall time in seconds
+    peak_mb : peak traced memory of the client in MiB
+    """
+
+    phase: str
+    requests: int
+    wall: float
+    peak_mb: float
+
+
+def populate(repo: FakeRepo, scenario: Scenario) -> None:
+    repo.add_branch(repo.default_branch, protected=True)
+    for i in range(scenario.branches):
+        repo.add_branch(f"feature-{i:06}", days_ago=30 if i % 100 < scenario.idle_percent else 0)
+    for i in range(min(scenario.pulls, scenario.branches)):
+        repo.add_pull(repo.default_branch, f"feature-{i:06}")
+
+
+def serve(scenario: Scenario, conn) -> None:
+    """
+    Serve the synthesized repository from a separate process so that server allocations
+    do not count towards the peak memory of the client
+    """
+    fake = FakeGitHub(latency=scenario.latency, rate_limit=scenario.rate_limit, rate_limit_window=scenario.rate_limit_window)
+    populate(fake.primary, scenario)
+    fake.start()
+    conn.send(fake.base_url)
+    while conn.recv() != "stop":
+        with fake.lock:
+            conn.send(dict(fake.requests))
+    fake.stop()
+
+
+class Recorder:
+    """
+    Measure phases of a run against the server process
+
+    Parameter(s):
+    conn: pipe to the server process
+    """
+
+    def __init__(self, conn):
+        self.conn = conn
+        self.results: List[PhaseResult] = []
+        self.counts: Dict[str, int] = {}
+
+    def requests(self) -> int:
+        self.conn.send("counts")
+        self.counts = self.conn.recv()
+        return sum(self.counts.get(kind, 0) for kind in REQUEST_KINDS)
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        requests = self.requests()
+        tracemalloc.reset_peak()
+        start = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+        wall = time.perf_counter() - start
+        peak = tracemalloc.get_traced_memory()[1]
+        self.results.append(PhaseResult(name, self.requests() - requests, wall, peak / 1024 / 1024))
+
+
+@contextlib.contextmanager
+def environment(**variables: str) -> Iterator[None]:
+    saved = {key: os.environ.get(key) for key in variables}
+    os.environ.update(variables)
+    try:
+        yield
+    finally:
+        for key, value in saved.items():
+            if value is None:
+                os.environ.pop(key, None)
+            else:
+                os.environ[key] = value
+
+
+def run_scenario(scenario: Scenario) -> Tuple[List[PhaseResult], Dict[str, int]]:
+    """
+    Run every phase against a synthesized repository, returning per-phase results and the
+    request counters of the fake API by kind
+
+    Parameter(s):
+    scenario: repository and API conditions
+    """
+    context = multiprocessing.get_context("spawn")
+    conn, child_conn = context.Pipe()
+    server = context.Process(target=serve, args=(scenario, child_conn), daemon=True)
+    server.start()
+    base_url = conn.recv()
+
+    recorder = Recorder(conn)
+    branch_max_idle = datetime.now(timezone.utc) - timedelta(days=7)
+    scheduler = RateLimitScheduler(points_per_minute=10**9)
+    tracemalloc.start()
+    try:
+        with environment(GH_TOKEN="token", GITHUB_API_URL=base_url):
+            with recorder.phase("auth"):
+                gh = get_auth(scenario.concurrency, scheduler)
+        with recorder.phase("repo"):
+            repo = gh.get_repo("owner/repo")
+
+        if scenario.stream:
+            with recorder.phase("pipeline"):
+                run_pipeline(repo, scenario.api, set(), branch_max_idle, False, scenario.concurrency)
+        else:
+            with recorder.phase("inventory"):
+                protection = get_protection_rules(repo)
+                if scenario.api == "ls-remote":
+                    inventory = build_inventory_ls_remote(repo, protection=protection)
+                else:
+                    inventory = INVENTORY_BACKENDS[scenario.api](repo)
+            with recorder.phase("exemption"):
+                set_exempt_branches = get_exempt_branches(repo, set(), inventory, protection=protection)
+            with recorder.phase("selection"):
+                branches, count_not_exempt = get_branches_to_delete(repo, set_exempt_branches, branch_max_idle, inventory)
+            with recorder.phase("deletion"):
+                delete_branches(repo, False, 7, branches, count_not_exempt, scenario.concurrency)
+        recorder.requests()
+    finally:
+        tracemalloc.stop()
+        transport.close_sessions()
+        conn.send("stop")
+        server.join()
+
+    return recorder.results, recorder.counts
+
+
+def print_results(scenario: Scenario, results: List[PhaseResult]) -> None:
+    label = f"{scenario.branches} branches, {scenario.pulls} pulls, api: {scenario.api}"
+    label += ", stream" if scenario.stream else ""
+    print(f"\n{label}")
+    print(f"{'phase':<12} | {'requests':>8} | {'wall (s)':>8} | {'peak (MiB)':>10}")
+    print("-" * 48)
+    for result in results:
+        print(f"{result.phase:<12} | {result.requests:>8} | {result.wall:>8.2f} | {result.peak_mb:>10.1f}")
+    print("-" * 48)
+    print(
+        f"{'total':<12} | {sum(r.requests for r in results):>8} | {sum(r.wall for r in results):>8.2f} | "
+        + f"{max(r.peak_mb for r in results):>10.1f}"
+    )
+
+
+@click.command()
+@click.option("--branches", "list_branches", multiple=True, type=int, default=[1000, 10000], help="default: 1000, 10000")
+@click.option("--pulls", type=int, default=1000, help="Open pull requests per repository, default: 1000")
+@click.option("--api", "list_api", multiple=True, type=click.Choice(list(INVENTORY_BACKENDS)), default=["rest", "graphql"])
+@click.option("--idle-percent", type=click.IntRange(0, 100), default=50, help="default: 50")
+@click.option("--latency-ms", type=float, default=0.0, help="Latency added to every response, default: 0")
+@click.option("--rate-limit", type=int, default=None, help="Requests per rate-limit window, default: unlimited")
+@click.option("--rate-limit-window", type=float, default=60.0, help="Seconds per rate-limit window, default: 60")
+@click.option("--concurrency", type=click.IntRange(min=1), default=1, help="default: 1")
+@click.option("--stream", type=bool, default=False, help="default: false")
+@click.option("--json-file", type=click.Path(dir_okay=False), help="Write results as JSON")
+def main(
+    list_branches: Tuple[int, ...],
+    pulls: int,
+    list_api: Tuple[str, ...],
+    idle_percent: int,
+    latency_ms: float,
+    rate_limit: Optional[int],
+    rate_limit_window: float,
+    concurrency: int,
+    stream: bool,
+    json_file: Optional[str],
+):
+    report = []
+    for branches in list_branches:
+        for api in list_api:
+            scenario = Scenario(
+                branches, pulls, api, idle_percent, latency_ms / 1000, rate_limit, rate_limit_window, concurrency, stream
+            )
+            results, counts = run_scenario(scenario)
+            print_results(scenario, results)
+            report.append({"scenario": asdict(scenario), "phases": [asdict(r) for r in results], "requests": counts})
+
+    if json_file:
+        with open(json_file, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,52 @@
+#!/usr/bin/env python
+
+"""
+Purpose: shared test fixtures
+"""
+
+from datetime import datetime, timedelta, timezone
+from unittest.mock import Mock
+
+import pytest
+from fake_github import FakeGitHub
+from github import Repository
+
+
+@pytest.fixture
+def mock_repo():
+    repo = Mock(spec=Repository.Repository)
+    repo.default_branch = "main"
+    return repo
+
+
+@pytest.fixture
+def mock_branch(mock_repo):
+    # head commits are looked up by sha through the repository, like the commits endpoint
+    commits = {}
+    mock_repo.get_commit.side_effect = lambda sha: commits[sha]
+
+    def _create_branch(name, protected=False, last_commit_days_ago=0):
+        branch = Mock()
+        branch.name = name
+        branch.protected = protected
+        commit_date = datetime.now(timezone.utc) - timedelta(days=last_commit_days_ago)
+        branch.commit.commit.committer.date = commit_date
+        commits[branch.commit.sha] = branch.commit
+        return branch
+
+    return _create_branch
+
+
+@pytest.fixture
+def mock_pull():
+    def _create_pull(base_ref, head_ref):
+        return {"base": {"ref": base_ref}, "head": {"ref": head_ref}}
+
+    return _create_pull
+
+
+@pytest.fixture
+def fake_github():
+    fake = FakeGitHub().start()
+    yield fake
+    fake.stop()
@@ -0,0 +1,628 @@
+#!/usr/bin/env python
+
+"""
+Purpose: local fake GitHub API server for offline tests
+"""
+
+import base64
+import bisect
+import hashlib
+import itertools
+import json
+import re
+import threading
+import time
+import urllib.parse
+from collections import Counter
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import (
+    Dict,
+    List,
+    Optional,
+    Set,
+    Tuple,
+)
+
+_shas = itertools.count(1)
+
+
+@dataclass
+class FakeBranch:
+    name: str
+    sha: str
+    committed_date: datetime
+    protected: bool = False
+    merged: bool = False
+    author: str = "dev"
+    behind: int = 0
+
+
+@dataclass
+class FakeRepo:
+    """
+    Branches are indexed by name (insertion order, served by REST), by sha and in name order
+    (served by GraphQL), so repositories with 100k branches stay fast to page and delete from
+    """
+
+    owner: str
+    name: str
+    default_branch: str = "main"
+    archived: bool = False
+    pulls: List[Tuple[str, str]] = field(default_factory=list)
+    closed_pulls: Dict[str, str] = field(default_factory=dict)
+    by_name: Dict[str, FakeBranch] = field(default_factory=dict)
+    by_sha: Dict[str, FakeBranch] = field(default_factory=dict)
+    sorted_names: List[str] = field(default_factory=list)
+    protection_patterns: List[str] = field(default_factory=list)
+    rulesets: List[dict] = field(default_factory=list)
+
+    @property
+    def full_name(self) -> str:
+        return f"{self.owner}/{self.name}"
+
+    @property
+    def branches(self) -> List[FakeBranch]:
+        return list(self.by_name.values())
+
+    def add_branch(
+        self,
+        name: str,
+        days_ago: int = 0,
+        protected: bool = False,
+        merged: bool = False,
+        author: str = "dev",
+        behind: int = 0,
+    ) -> FakeBranch:
+        sha = f"{next(_shas):040x}"
+        committed_date = datetime.now(timezone.utc).replace(microsecond=0) - timedelta(days=days_ago)
+        branch = FakeBranch(name, sha, committed_date, protected, merged, author, behind)
+        self.by_name[name] = branch
+        self.by_sha[sha] = branch
+        bisect.insort(self.sorted_names, name)
+        return branch
+
+    def remove_branch(self, name: str) -> None:
+        branch = self.by_name.pop(name)
+        del self.by_sha[branch.sha]
+        del self.sorted_names[bisect.bisect_left(self.sorted_names, name)]
+
+    def add_pull(self, base: str, head: str) -> None:
+        self.pulls.append((base, head))
+
+    def close_pull(self, head: str, merged: bool = False) -> None:
+        """record a closed (or merged) pull request from the head branch"""
+        self.closed_pulls[head] = "MERGED" if merged else "CLOSED"
+
+    def add_ruleset(
+        self, include: List[str], exclude: Optional[List[str]] = None, rules: Tuple[str, ...] = ("deletion",), active=True
+    ) -> None:
+        self.rulesets.append(
+            {
+                "id": len(self.rulesets) + 1,
+                "name": f"ruleset-{len(self.rulesets) + 1}",
+                "target": "branch",
+                "enforcement": "active" if active else "disabled",
+                "conditions": {"ref_name": {"include": include, "exclude": exclude or []}},
+                "rules": [{"type": rule} for rule in rules],
+            }
+        )
+
+    def get_branch(self, name: str) -> Optional[FakeBranch]:
+        return self.by_name.get(name)
+
+
+class FakeGitHub:
+    """
+    In-memory repositories served over REST and GraphQL on 127.0.0.1; branch and pull
+    helpers act on the primary repository
+
+    Parameter(s):
+    owner            : primary repository owner
+    repo             : primary repository name
+    default_branch   : default branch name of the primary repository
+    latency          : seconds added to every response
+    rate_limit       : requests allowed per rate-limit window and resource (None is unlimited)
+    rate_limit_window: seconds until an exhausted rate limit resets
+    """
+
+    def __init__(
+        self,
+        owner: str = "owner",
+        repo: str = "repo",
+        default_branch: str = "main",
+        latency: float = 0.0,
+        rate_limit: Optional[int] = None,
+        rate_limit_window: float = 60.0,
+    ):
+        self.repos: Dict[str, FakeRepo] = {}
+        self.primary = self.add_repo(owner, repo, default_branch)
+        self.latency = latency
+        self.rate_limit = rate_limit
+        self.rate_limit_window = rate_limit_window
+        self.rate_remaining: Dict[str, int] = {}
+        self.rate_reset: Dict[str, float] = {}
+        """tokens whose own rate limit is exhausted, and the token of every request"""
+        self.exhausted_tokens: Set[str] = set()
+        self.authorizations: List[str] = []
+        self.requests: Counter = Counter()
+        self.lock = threading.Lock()
+        self.server: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def base_url(self) -> str:
+        assert self.server is not None
+        return f"http://127.0.0.1:{self.server.server_address[1]}"
+
+    @property
+    def full_name(self) -> str:
+        return self.primary.full_name
+
+    @property
+    def branches(self) -> List[FakeBranch]:
+        return self.primary.branches
+
+    @property
+    def pulls(self) -> List[Tuple[str, str]]:
+        return self.primary.pulls
+
+    def add_repo(self, owner: str, name: str, default_branch: str = "main", archived: bool = False) -> FakeRepo:
+        repo = FakeRepo(owner, name, default_branch, archived)
+        self.repos[repo.full_name] = repo
+        return repo
+
+    def add_branch(
+        self,
+        name: str,
+        days_ago: int = 0,
+        protected: bool = False,
+        merged: bool = False,
+        author: str = "dev",
+        behind: int = 0,
+    ) -> FakeBranch:
+        return self.primary.add_branch(name, days_ago, protected, merged, author, behind)
+
+    def add_pull(self, base: str, head: str) -> None:
+        self.primary.add_pull(base, head)
+
+    def close_pull(self, head: str, merged: bool = False) -> None:
+        self.primary.close_pull(head, merged)
+
+    def get_branch(self, name: str) -> Optional[FakeBranch]:
+        return self.primary.get_branch(name)
+
+    def remove_branch(self, name: str) -> None:
+        self.primary.remove_branch(name)
+
+    def start(self) -> "FakeGitHub":
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), _handler(self))
+        threading.Thread(target=self.server.serve_forever, kwargs={"poll_interval": 0.05}, daemon=True).start()
+        return self
+
+    def stop(self) -> None:
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+    def count(self, kind: str) -> int:
+        return self.requests[kind]
+
+    def rate_limit_headers(self, resource: str, token: Optional[str] = None) -> Tuple[bool, dict]:
+        """
+        Spend one request of the resource, returning whether it is rate limited and the
+        X-RateLimit-* headers of the response (always limited for an exhausted token)
+        """
+        if token in self.exhausted_tokens:
+            return True, {
+                "X-RateLimit-Remaining": "0",
+                "X-RateLimit-Reset": str(int(time.time() + self.rate_limit_window)),
+                "X-RateLimit-Resource": resource,
+            }
+        if self.rate_limit is None:
+            return False, {}
+        now = time.time()
+        if now >= self.rate_reset.get(resource, 0.0):
+            self.rate_reset[resource] = now + self.rate_limit_window
+            self.rate_remaining[resource] = self.rate_limit
+        limited = self.rate_remaining[resource] == 0
+        self.rate_remaining[resource] = max(self.rate_remaining[resource] - 1, 0)
+        if limited:
+            self.requests["rate_limited"] += 1
+        return limited, {
+            "X-RateLimit-Limit": str(self.rate_limit),
+            "X-RateLimit-Remaining": str(self.rate_remaining[resource]),
+            "X-RateLimit-Reset": str(int(self.rate_reset[resource]) + 1),
+            "X-RateLimit-Resource": resource,
+        }
+
+    """REST"""
+
+    def rest_repo(self, repo: FakeRepo) -> dict:
+        return {
+            "id": 1,
+            "node_id": f"repo:{repo.full_name}",
+            "name": repo.name,
+            "full_name": repo.full_name,
+            "owner": {"login": repo.owner},
+            "default_branch": repo.default_branch,
+            "archived": repo.archived,
+            "url": f"{self.base_url}/repos/{repo.full_name}",
+            "clone_url": f"{self.base_url}/{repo.full_name}.git",
+        }
+
+    def rest_branch(self, repo: FakeRepo, branch: FakeBranch, full: bool = False) -> dict:
+        commit = {"sha": branch.sha, "url": f"{self.base_url}/repos/{repo.full_name}/commits/{branch.sha}"}
+        if full:
+            commit.update(self.rest_commit(repo, branch))
+        return {"name": branch.name, "commit": commit, "protected": branch.protected}
+
+    def rest_commit(self, repo: FakeRepo, branch: FakeBranch) -> dict:
+        date = branch.committed_date.strftime("%Y-%m-%dT%H:%M:%SZ")
+        return {
+            "sha": branch.sha,
+            "url": f"{self.base_url}/repos/{repo.full_name}/commits/{branch.sha}",
+            "commit": {"committer": {"name": "dev", "date": date}, "author": {"name": "dev", "date": date}},
+        }
+
+    def rest_ref(self, repo: FakeRepo, branch: FakeBranch) -> dict:
+        return {
+            "ref": f"refs/heads/{branch.name}",
+            "url": f"{self.base_url}/repos/{repo.full_name}/git/refs/heads/{branch.name}",
+            "object": {"sha": branch.sha, "type": "commit"},
+        }
+
+    def rest_pull(self, number: int, pull: Tuple[str, str]) -> dict:
+        return {"number": number, "base": {"ref": pull[0]}, "head": {"ref": pull[1]}}
+
+    def rest_rate_limit(self) -> dict:
+        rate = {"limit": 5000, "remaining": 5000, "reset": 0, "used": 0}
+        return {"resources": {"core": rate, "search": rate, "graphql": rate}, "rate": rate}
+
+    def rest_page(self, path: str, query: dict, items: list) -> Tuple[list, dict]:
+        per_page = int(query.get("per_page", ["30"])[0])
+        page = int(query.get("page", ["1"])[0])
+        last = max((len(items) + per_page - 1) // per_page, 1)
+        links = []
+        if page < last:
+            links.append(f'<{self.base_url}{path}?per_page={per_page}&page={page + 1}>; rel="next"')
+            links.append(f'<{self.base_url}{path}?per_page={per_page}&page={last}>; rel="last"')
+        if page > 1:
+            links.append(f'<{self.base_url}{path}?per_page={per_page}&page={page - 1}>; rel="prev"')
+            links.append(f'<{self.base_url}{path}?per_page={per_page}&page=1>; rel="first"')
+        headers = {"Link": ", ".join(links)} if links else {}
+        start = (page - 1) * per_page
+        return items[start:][:per_page], headers
+
+    def rest_get(self, path: str, query: dict) -> Tuple[int, object, dict]:
+        if path == "/rate_limit":
+            self.requests["rest:rate_limit"] += 1
+            return 200, self.rest_rate_limit(), {}
+        match = re.fullmatch(r"/orgs/([^/]+)/repos", path)
+        if match:
+            self.requests["rest:org_repos"] += 1
+            org_repos = [repo for repo in self.repos.values() if repo.owner == match.group(1)]
+            page, headers = self.rest_page(path, query, org_repos)
+            return 200, [self.rest_repo(repo) for repo in page], headers
+        match = re.fullmatch(r"/orgs/([^/]+)", path)
+        if match:
+            return 200, {"login": match.group(1), "url": f"{self.base_url}/orgs/{match.group(1)}"}, {}
+        match = re.fullmatch(r"/repos/([^/]+/[^/]+?)(/.*)?", path)
+        if match is None or match.group(1) not in self.repos:
+            return 404, {"message": "Not Found"}, {}
+        return self.rest_get_repo(self.repos[match.group(1)], path, query, match.group(2) or "")
+
+    def rest_get_conditional(self, path: str, query: dict, if_none_match: Optional[str]) -> Tuple[int, object, dict]:
+        """listings carry an ETag and answer 304 when it matches If-None-Match"""
+        status, body, headers = self.rest_get(path, query)
+        if status == 200 and isinstance(body, list):
+            headers["ETag"] = f'"{hashlib.sha1(json.dumps(body).encode()).hexdigest()}"'
+            if if_none_match == headers["ETag"]:
+                self.requests["rest:not_modified"] += 1
+                return 304, None, headers
+        return status, body, headers
+
+    def rest_get_repo(self, repo: FakeRepo, path: str, query: dict, subpath: str) -> Tuple[int, object, dict]:
+        if subpath in ("", "/"):
+            return 200, self.rest_repo(repo), {}
+        if subpath == "/branches":
+            self.requests["rest:branches"] += 1
+            branches = repo.branches
+            if query.get("protected") == ["true"]:
+                branches = [branch for branch in branches if branch.protected]
+            page, headers = self.rest_page(path, query, branches)
+            return 200, [self.rest_branch(repo, branch) for branch in page], headers
+        if subpath == "/pulls":
+            self.requests["rest:pulls"] += 1
+            page, headers = self.rest_page(path, query, list(enumerate(repo.pulls, 1)))
+            return 200, [self.rest_pull(number, pull) for number, pull in page], headers
+        if subpath == "/rulesets":
+            self.requests["rest:rulesets"] += 1
+            return (
+                200,
+                [{key: ruleset[key] for key in ("id", "name", "target", "enforcement")} for ruleset in repo.rulesets],
+                {},
+            )
+        if subpath.startswith("/rulesets/"):
+            self.requests["rest:ruleset"] += 1
+            rulesets = {str(ruleset["id"]): ruleset for ruleset in repo.rulesets}
+            ruleset = rulesets.get(subpath.removeprefix("/rulesets/"))
+            return (200, ruleset, {}) if ruleset else (404, {"message": "Not Found"}, {})
+        if subpath.startswith("/branches/"):
+            self.requests["rest:branch"] += 1
+            branch = repo.get_branch(urllib.parse.unquote(subpath.removeprefix("/branches/")))
+            if branch is None:
+                return 404, {"message": "Branch not found"}, {}
+            return 200, self.rest_branch(repo, branch, full=True), {}
+        if subpath.startswith("/commits/"):
+            self.requests["rest:commit"] += 1
+            sha = subpath.removeprefix("/commits/")
+            branch = repo.by_sha.get(sha)
+            return (200, self.rest_commit(repo, branch), {}) if branch else (404, {"message": "No commit found"}, {})
+        if subpath.startswith("/git/ref/heads/"):
+            self.requests["rest:ref"] += 1
+            branch = repo.get_branch(urllib.parse.unquote(subpath.removeprefix("/git/ref/heads/")))
+            return (200, self.rest_ref(repo, branch), {}) if branch else (404, {"message": "Not Found"}, {})
+        return 404, {"message": "Not Found"}, {}
+
+    def advertisement(self, path: str) -> Optional[bytes]:
+        """smart-HTTP git-upload-pack ref advertisement of /{owner}/{repo}.git/info/refs"""
+        repo = self.repos.get(path.removeprefix("/").removesuffix(".git/info/refs"))
+        if repo is None:
+            return None
+        self.requests["git:info_refs"] += 1
+
+        def pkt_line(line: bytes) -> bytes:
+            return f"{len(line) + 4:04x}".encode() + line
+
+        lines = [pkt_line(b"# service=git-upload-pack\n"), b"0000"]
+        for i, branch in enumerate(repo.branches):
+            capabilities = b"\0multi_ack side-band-64k" if i == 0 else b""
+            lines.append(pkt_line(f"{branch.sha} refs/heads/{branch.name}".encode() + capabilities + b"\n"))
+        lines.append(b"0000")
+        return b"".join(lines)
+
+    def rest_delete(self, path: str) -> Tuple[int, object, dict]:
+        match = re.fullmatch(r"/repos/([^/]+/[^/]+?)/git/refs/heads/(.+)", path)
+        if match is None or match.group(1) not in self.repos:
+            return 404, {"message": "Not Found"}, {}
+        self.requests["rest:delete"] += 1
+        repo = self.repos[match.group(1)]
+        branch = repo.get_branch(urllib.parse.unquote(match.group(2)))
+        if branch is None:
+            return 422, {"message": "Reference does not exist"}, {}
+        repo.remove_branch(branch.name)
+        return 204, None, {}
+
+    """GraphQL"""
+
+    def graphql(self, query: str, variables: dict) -> dict:
+        if query.startswith("mutation"):
+            self.requests["graphql:delete_refs"] += 1
+            return self._delete_refs(variables)
+        repo = self.repos.get(f"{variables.get('owner')}/{variables.get('name')}")
+        if repo is None:
+            return {"data": {"repository": None}, "errors": [{"type": "NOT_FOUND", "message": "Could not resolve"}]}
+        if "object(oid:" in query:
+            self.requests["graphql:commits"] += 1
+            return {"data": {"repository": self._commit_dates(repo, variables)}}
+        if "ref(qualifiedName: $q" in query:
+            self.requests["graphql:ref_ids"] += 1
+            return {"data": {"repository": self._ref_ids(repo, variables)}}
+        if "ref(qualifiedName: $p" in query:
+            self.requests["graphql:attributes"] += 1
+            return {"data": {"repository": self._attributes(repo, variables)}}
+        if "compare(" in query:
+            self.requests["graphql:compare"] += 1
+            comparisons, errors = self._comparisons(repo, variables)
+            data = {"data": {"repository": {"ref": comparisons}}}
+            return {**data, "errors": errors} if errors else data
+        if "refs(" in query:
+            self.requests["graphql:refs"] += 1
+            refs = self._ref_connection(repo, variables)
+            return {"data": {"repository": {"refs": refs}}}
+        if "branchProtectionRules(" in query:
+            self.requests["graphql:protection"] += 1
+            patterns = repo.protection_patterns + [branch.name for branch in repo.branches if branch.protected]
+            rules = self._connection(patterns, variables, lambda pattern: {"pattern": pattern})
+            return {"data": {"repository": {"branchProtectionRules": rules}}}
+        if "pullRequests(" in query:
+            self.requests["graphql:pulls"] += 1
+            return {"data": {"repository": {"pullRequests": self._connection(repo.pulls, variables, self._pull_node)}}}
+        return {"errors": [{"message": "unsupported query"}]}
+
+    def _connection(self, items: list, variables: dict, to_node) -> dict:
+        start = int(variables.get("cursor") or 0)
+        end = start + int(variables.get("first") or 100)
+        return {
+            "pageInfo": {"hasNextPage": end < len(items), "endCursor": str(end)},
+            "nodes": [to_node(item) for item in items[start:end]],
+        }
+
+    def _comparisons(self, repo: FakeRepo, variables: dict) -> Tuple[dict, list]:
+        """merged branches (and the default branch) are not ahead of the default branch; a missing head fails its alias"""
+        comparisons: Dict[str, Optional[dict]] = {}
+        errors = []
+        for key, ref in variables.items():
+            if re.fullmatch(r"h\d+", key):
+                branch = repo.get_branch(ref.removeprefix("refs/heads/"))
+                ahead_by = 0 if branch and (branch.merged or branch.name == repo.default_branch) else 1
+                comparisons[f"b{key[1:]}"] = {"aheadBy": ahead_by} if branch else None
+                if branch is None:
+                    path = ["repository", "ref", f"b{key[1:]}"]
+                    errors.append(
+                        {"type": "NOT_FOUND", "path": path, "message": f"Could not resolve to a Ref named '{ref}'"}
+                    )
+        return comparisons, errors
+
+    def _attributes(self, repo: FakeRepo, variables: dict) -> dict:
+        """every attribute of each branch; ahead and behind as compared against the default branch as head"""
+        refs: Dict[str, Optional[dict]] = {}
+        open_heads = {head for _, head in repo.pulls}
+        for key, ref in variables.items():
+            if re.fullmatch(r"p\d+", key):
+                branch = repo.get_branch(ref.removeprefix("refs/heads/"))
+                if branch is None:
+                    refs[f"a{key[1:]}"] = None
+                    continue
+                state = "OPEN" if branch.name in open_heads else repo.closed_pulls.get(branch.name)
+                refs[f"a{key[1:]}"] = {
+                    "target": {"author": {"name": branch.author, "user": None}},
+                    "associatedPullRequests": {"nodes": [{"state": state}] if state else []},
+                    "compare": {"aheadBy": branch.behind, "behindBy": 0 if branch.merged else 1},
+                }
+        return refs
+
+    def _commit_dates(self, repo: FakeRepo, variables: dict) -> dict:
+        commits = {}
+        for key, oid in variables.items():
+            if re.fullmatch(r"o\d+", key):
+                branch = repo.by_sha.get(oid)
+                date = branch.committed_date.strftime("%Y-%m-%dT%H:%M:%SZ") if branch else None
+                commits[f"c{key[1:]}"] = {"committedDate": date} if branch else None
+        return commits
+
+    def _ref_ids(self, repo: FakeRepo, variables: dict) -> dict:
+        refs = {}
+        for key, ref in variables.items():
+            if re.fullmatch(r"q\d+", key):
+                branch = repo.get_branch(ref.removeprefix("refs/heads/"))
+                refs[f"r{key[1:]}"] = {"id": self._ref_id(repo, branch), "target": {"oid": branch.sha}} if branch else None
+        return refs
+
+    def _ref_id(self, repo: FakeRepo, branch: FakeBranch) -> str:
+        return f"ref:{repo.full_name}:{branch.name}"
+
+    def _delete_refs(self, variables: dict) -> dict:
+        """updateRefs per aliased ref; protected, missing or moved refs fail with an error pointing at their alias"""
+        data: Dict[str, Optional[dict]] = {}
+        errors = []
+        repo = self.repos.get(variables["repo"].split(":", 1)[1])
+        for key, ref in variables.items():
+            if not key.startswith("n"):
+                continue
+            alias = f"m{key[1:]}"
+            name = ref.removeprefix("refs/heads/")
+            branch = repo.get_branch(name) if repo else None
+            message = None
+            if branch is None:
+                message = "Reference does not exist"
+            elif branch.protected:
+                message = "Cannot delete protected branch"
+            elif branch.sha != variables[f"b{key[1:]}"]:
+                message = f"Reference {ref} is at {branch.sha} but expected {variables[f'b{key[1:]}']}"
+            if message:
+                data[alias] = None
+                errors.append({"path": [alias], "message": message})
+                continue
+            repo.remove_branch(name)
+            data[alias] = {"clientMutationId": None}
+        return {"data": data, "errors": errors} if errors else {"data": data}
+
+    def _ref_connection(self, repo: FakeRepo, variables: dict) -> dict:
+        """
+        refs ordered by name with offset cursors like GitHub's, paged forwards (first, after) or
+        backwards (last, before); deleting listed refs shifts later refs toward the front
+        """
+        names = repo.sorted_names
+        cursor = variables.get("cursor")
+        position = int(base64.b64decode(cursor)) if cursor else None
+        if variables.get("last"):
+            end = len(names) if position is None else min(position, len(names))
+            start = max(end - int(variables["last"]), 0)
+        else:
+            start = 0 if position is None else position + 1
+            end = min(start + int(variables.get("first") or 100), len(names))
+        return {
+            "pageInfo": {
+                "hasNextPage": end < len(names),
+                "endCursor": base64.b64encode(str(end - 1).encode()).decode() if end > start else cursor,
+                "hasPreviousPage": start > 0,
+                "startCursor": base64.b64encode(str(start).encode()).decode() if end > start else cursor,
+            },
+            "nodes": [self._ref_node(repo, repo.by_name[name]) for name in names[start:end]],
+        }
+
+    def _ref_node(self, repo: FakeRepo, branch: FakeBranch) -> dict:
+        return {
+            "id": self._ref_id(repo, branch),
+            "name": branch.name,
+            "target": {"oid": branch.sha, "committedDate": branch.committed_date.strftime("%Y-%m-%dT%H:%M:%SZ")},
+            "branchProtectionRule": {"id": "rule"} if branch.protected else None,
+        }
+
+    def _pull_node(self, pull: Tuple[str, str]) -> dict:
+        return {"baseRefName": pull[0], "headRefName": pull[1]}
+
+
+def _handler(fake: FakeGitHub):
+    class Handler(BaseHTTPRequestHandler):
+        def log_message(self, format, *args):
+            pass
+
+        def _send(self, status: int, body, headers: Optional[dict] = None) -> None:
+            payload = json.dumps(body).encode() if body is not None else b""
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(payload)))
+            for key, value in (headers or {}).items():
+                self.send_header(key, value)
+            self.end_headers()
+            self.wfile.write(payload)
+
+        def _send_advertisement(self, path: str) -> None:
+            with fake.lock:
+                payload = fake.advertisement(path)
+            self.send_response(200 if payload is not None else 404)
+            self.send_header("Content-Type", "application/x-git-upload-pack-advertisement")
+            self.send_header("Content-Length", str(len(payload or b"")))
+            self.end_headers()
+            self.wfile.write(payload or b"")
+
+        def _serve(self, resource: str, handle) -> None:
+            """apply injected latency and rate limit, then send the response of handle()"""
+            time.sleep(fake.latency)
+            token = self.headers.get("Authorization", "").split(" ", 1)[-1]
+            with fake.lock:
+                fake.authorizations.append(token)
+                """reading the rate limit does not count against it"""
+                limited, rate_headers = fake.rate_limit_headers(resource, token if self.path != "/rate_limit" else None)
+                if limited:
+                    status, body, headers = 403, {"message": "API rate limit exceeded"}, {}
+                else:
+                    status, body, headers = handle()
+            return self._send(status, body, {**headers, **rate_headers})
+
+        def do_GET(self):
+            url = urllib.parse.urlsplit(self.path)
+            if url.path.endswith(".git/info/refs"):
+                return self._send_advertisement(url.path)
+
+            def handle():
+                fake.requests["GET"] += 1
+                return fake.rest_get_conditional(
+                    url.path, urllib.parse.parse_qs(url.query), self.headers.get("If-None-Match")
+                )
+
+            return self._serve("core", handle)
+
+        def do_DELETE(self):
+            def handle():
+                fake.requests["DELETE"] += 1
+                return fake.rest_delete(urllib.parse.urlsplit(self.path).path)
+
+            return self._serve("core", handle)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length", 0))
+            body = json.loads(self.rfile.read(length) or b"{}")
+            if self.path != "/graphql":
+                return self._send(404, {"message": "Not Found"})
+
+            def handle():
+                fake.requests["POST"] += 1
+                return 200, fake.graphql(body.get("query", ""), body.get("variables") or {}), {}
+
+            return self._serve("graphql", handle)
+
+    return Handler
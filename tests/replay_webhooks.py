@@ -0,0 +1,129 @@
+#!/usr/bin/env python
+
+"""
+Purpose: local webhook replayer posting signed push / pull_request / delete deliveries to a
+delete-branches webhook server (--webhook-port)
+
+e.g. WEBHOOK_SECRET=secret python tests/replay_webhooks.py --url http://127.0.0.1:8080/ --events deliveries.jsonl
+
+Each line of the events file is a delivery: {"event": "push", "payload": {...}}
+"""
+
+import hashlib
+import hmac
+import json
+import os
+import urllib.error
+import urllib.request
+from datetime import datetime
+from typing import (
+    Any,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+
+import click
+
+Delivery = Tuple[str, Dict[str, Any]]
+
+
+def push_event(
+    full_name: str, branch: str, sha: str, timestamp: Optional[datetime] = None, deleted: bool = False
+) -> Delivery:
+    """
+    Build a push delivery (fields read by the daemon only)
+
+    Parameter(s):
+    full_name: repository full name
+    branch   : branch name
+    sha      : new head sha (ignored when deleted)
+    timestamp: head commit timestamp (None leaves the commit date to be resolved from the repository)
+    deleted  : branch deleted by the push
+    """
+    head_commit = None if deleted else {"id": sha, "timestamp": timestamp.isoformat() if timestamp else None}
+    return "push", {
+        "ref": f"refs/heads/{branch}",
+        "after": "0" * 40 if deleted else sha,
+        "deleted": deleted,
+        "created": False,
+        "head_commit": head_commit,
+        "repository": {"full_name": full_name},
+    }
+
+
+def pull_request_event(full_name: str, action: str, number: int, base: str, head: str) -> Delivery:
+    """
+    Build a pull_request delivery
+
+    Parameter(s):
+    full_name: repository full name
+    action   : opened, reopened, edited or closed
+    number   : pull request number
+    base     : base branch name
+    head     : head branch name
+    """
+    pull = {"number": number, "base": {"ref": base}, "head": {"ref": head}}
+    return "pull_request", {"action": action, "number": number, "pull_request": pull, "repository": {"full_name": full_name}}
+
+
+def delete_event(full_name: str, branch: str) -> Delivery:
+    """
+    Build a delete delivery of a branch
+
+    Parameter(s):
+    full_name: repository full name
+    branch   : branch name
+    """
+    return "delete", {"ref": branch, "ref_type": "branch", "repository": {"full_name": full_name}}
+
+
+def replay(url: str, deliveries: Iterable[Delivery], secret: str) -> List[int]:
+    """
+    Post deliveries in order, signed like GitHub (X-Hub-Signature-256), returning the response statuses
+
+    Parameter(s):
+    url       : webhook server url
+    deliveries: (event, payload) per delivery
+    secret    : webhook secret
+    """
+    statuses = []
+    for event, payload in deliveries:
+        body = json.dumps(payload).encode()
+        signature = "sha256=" + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+        headers = {"Content-Type": "application/json", "X-GitHub-Event": event, "X-Hub-Signature-256": signature}
+        request = urllib.request.Request(url, data=body, headers=headers, method="POST")
+        try:
+            with urllib.request.urlopen(request, timeout=10) as response:
+                statuses.append(response.status)
+        except urllib.error.HTTPError as e:
+            statuses.append(e.code)
+    return statuses
+
+
+def read_deliveries(path: str) -> List[Delivery]:
+    """
+    Read one {"event": ..., "payload": ...} delivery per line
+    """
+    deliveries = []
+    with open(path, encoding="utf-8") as f:
+        for line in filter(str.strip, f):
+            delivery = json.loads(line)
+            deliveries.append((delivery["event"], delivery["payload"]))
+    return deliveries
+
+
+@click.command()
+@click.option("--url", required=True, help="Webhook server url, e.g. http://127.0.0.1:8080/")
+@click.option("--events", required=True, type=click.Path(exists=True, dir_okay=False), help="JSON lines of deliveries")
+def main(url: str, events: str):
+    deliveries = read_deliveries(events)
+    statuses = replay(url, deliveries, os.environ["WEBHOOK_SECRET"])
+    for status, (event, payload) in zip(statuses, deliveries):
+        print(f"{status} {event:<12} {payload['repository']['full_name']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python
+
+"""
+Purpose: tests
+"""
+
+import pytest
+from click.testing import CliRunner
+from github import Auth, Github
+
+from delete_branches import transport
+from delete_branches.async_api import build_inventory_async
+from delete_branches.cli import main
+from delete_branches.scheduler import RateLimitScheduler
+from delete_branches.token_pool import PoolToken, TokenPool
+
+pytest.importorskip("httpx")
+
+
+@pytest.fixture
+def fake_repo(fake_github):
+    gh = Github(auth=Auth.Token("token"), base_url=fake_github.base_url, seconds_between_requests=0)
+    return gh.get_repo(fake_github.full_name)
+
+
+class TestBuildInventoryAsync:
+    def test_pages_and_commit_dates(self, fake_github, fake_repo):
+        fake_github.add_branch("main", protected=True)
+        for i in range(349):
+            fake_github.add_branch(f"feature-{i:03}", days_ago=i % 20)
+        fake_github.add_pull("main", "feature-000")
+
+        inventory = build_inventory_async(fake_repo)
+
+        assert inventory.names == {branch.name for branch in fake_github.branches}
+        assert inventory.pulls == [("main", "feature-000")]
+        assert [record.name for record in inventory.protected()] == ["main"]
+        assert fake_github.count("rest:branches") == 4
+        assert fake_github.count("rest:pulls") == 1
+
+        records = [inventory.records["feature-001"], inventory.records["feature-002"]]
+        inventory.resolve_commit_dates(records)
+
+        assert [record.commit_date for record in records] == [
+            fake_github.get_branch("feature-001").committed_date,
+            fake_github.get_branch("feature-002").committed_date,
+        ]
+        assert fake_github.count("rest:commit") == 2
+
+    def test_requests_through_scheduler(self, fake_github, fake_repo, monkeypatch):
+        for i in range(150):
+            fake_github.add_branch(f"feature-{i:03}")
+        scheduler = RateLimitScheduler()
+        monkeypatch.setattr(transport.HTTPSPooledConnection, "scheduler", scheduler)
+
+        with scheduler.phase("inventory") as usage:
+            build_inventory_async(fake_repo)
+
+        assert usage.requests == 3
+
+    def test_requests_routed_through_token_pool(self, fake_github, fake_repo, monkeypatch):
+        for i in range(150):
+            fake_github.add_branch(f"feature-{i:03}")
+        fake_github.exhausted_tokens.add("token-a")
+        slept = []
+        pool = TokenPool([PoolToken("a", "token-a"), PoolToken("b", "token-b")])
+        scheduler = RateLimitScheduler(sleep=slept.append)
+        scheduler.pool = pool
+        monkeypatch.setattr(transport.HTTPSPooledConnection, "scheduler", scheduler)
+        monkeypatch.setattr(transport.HTTPSPooledConnection, "pool", pool)
+        fake_github.authorizations.clear()
+
+        inventory = build_inventory_async(fake_repo)
+
+        assert len(inventory.names) == 150
+        """token-a answered rate limited and was left at once for token-b, which got every page"""
+        a, b = pool.tokens
+        assert set(slept) == {0.0}
+        assert a.usage.requests == fake_github.authorizations.count("token-a") >= 1
+        assert a.usage.remaining["core"] == 0
+        assert b.usage.requests == 3
+        assert "token" not in fake_github.authorizations
+
+
+class TestMainAsync:
+    @pytest.mark.parametrize("stream", ["false", "true"])
+    def test_delete_idle_branches(self, fake_github, monkeypatch, stream):
+        monkeypatch.setenv("GH_TOKEN", "token")
+        monkeypatch.setenv("GITHUB_API_URL", fake_github.base_url)
+        fake_github.add_branch("main")
+        for i in range(120):
+            fake_github.add_branch(f"feature-{i:03}", days_ago=30 if i % 2 else 1)
+        fake_github.add_pull("main", "feature-001")
+        args = ["--repo-url", "https://github.com/owner/repo", "--max-idle-days", "7", "--dry-run", "false"]
+
+        runner = CliRunner()
+        result = runner.invoke(main, args + ["--api", "rest-async", "--stream", stream])
+
+        assert result.exit_code == 0
+        assert len(fake_github.branches) == 1 + 60 + 1
+        assert fake_github.get_branch("feature-001") is not None
+        assert fake_github.count("rest:branches") == 2
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,31 @@
+#!/usr/bin/env python
+
+"""
+Purpose: tests
+"""
+
+import pytest
+from bench_importtime import imported_packages, measure
+
+
+class TestBenchImportTime:
+    @pytest.mark.parametrize("args", [["--version"], ["--help"]])
+    def test_cli_starts_without_api_packages(self, args):
+        result = measure(args)
+
+        # a regression here means a module imported by the CLI at startup imports PyGithub (or requests) again
+        assert result.heavy == []
+        assert "delete_branches.inventory" not in result.modules
+        assert "delete_branches.pipeline" not in result.modules
+
+    def test_cli_import_leaves_api_packages_unloaded(self):
+        packages = imported_packages()
+
+        # import time itself is reported by `make benchmark`; what keeps it low is not loading these
+        assert "delete_branches" in packages
+        assert "github" not in packages
+        assert "requests" not in packages
+
+
+if __name__ == "__main__":
+    pytest.main()
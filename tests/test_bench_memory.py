@@ -0,0 +1,21 @@
+#!/usr/bin/env python
+
+"""
+Purpose: tests
+"""
+
+import pytest
+from bench_memory import run_benchmark
+
+
+class TestBenchMemory:
+    def test_records_retain_a_fraction_of_pygithub_objects(self):
+        pygithub, record = run_benchmark(2000)
+
+        # a regression here means records hold on to raw JSON or PyGithub objects again
+        assert record.per_branch < 400
+        assert record.per_branch * 8 < pygithub.per_branch
+
+
+if __name__ == "__main__":
+    pytest.main()
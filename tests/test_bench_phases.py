@@ -0,0 +1,57 @@
+#!/usr/bin/env python
+
+"""
+Purpose: tests
+"""
+
+import pytest
+from bench_phases import Scenario, run_scenario
+
+
+def requests_by_phase(scenario):
+    results, counts = run_scenario(scenario)
+    return {result.phase: result.requests for result in results}, counts
+
+
+class TestBenchPhases:
+    """request budgets per phase; a change in these numbers is an API call regression (or improvement)"""
+
+    @pytest.fixture
+    def scenario(self):
+        # 300 branches + main, 120 pull request heads, 80 idle branches not exempt
+        return Scenario(branches=300, pulls=120)
+
+    def test_rest_budget(self, scenario):
+        requests, counts = requests_by_phase(scenario)
+
+        # protection rules and rulesets cost one GraphQL and one REST request
+        assert requests == {"auth": 1, "repo": 1, "inventory": 2 + 4, "exemption": 2, "selection": 180, "deletion": 80}
+        assert counts["rest:commit"] == 180
+
+    def test_graphql_budget(self, scenario):
+        scenario.api = "graphql"
+        requests, counts = requests_by_phase(scenario)
+
+        assert requests == {"auth": 1, "repo": 1, "inventory": 2 + 6, "exemption": 0, "selection": 0, "deletion": 80}
+        assert counts.get("rest:commit", 0) == 0
+
+    def test_stream_budget(self, scenario):
+        scenario.stream = True
+        requests, _ = requests_by_phase(scenario)
+
+        # reverse REST listing reads the first page for the last-page link
+        assert requests == {"auth": 1, "repo": 1, "pipeline": 2 + 2 + 5 + 180 + 80}
+
+    def test_rate_limited(self):
+        scenario = Scenario(branches=50, pulls=20, api="graphql", rate_limit=25, rate_limit_window=1.0)
+        results, counts = run_scenario(scenario)
+        deletion = results[-1]
+
+        # the scheduler waits for the reset instead of running into rate-limited responses
+        assert deletion.requests == counts["DELETE"] == 30
+        assert counts.get("rate_limited", 0) == 0
+        assert deletion.wall >= 1.0
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,103 @@
+#!/usr/bin/env python
+
+"""
+Purpose: tests
+"""
+
+from datetime import datetime, timezone
+
+import pytest
+from click.testing import CliRunner
+
+from delete_branches.cache import BranchCache
+from delete_branches.cli import main
+from delete_branches.inventory import BranchInventory, BranchRecord
+
+
+def make_inventory(*records):
+    return BranchInventory({record.name: record for record in records})
+
+
+class TestBranchCache:
+    def test_commit_dates_round_trip(self, tmp_path):
+        commit_date = datetime(2025, 1, 2, 3, 4, 5, tzinfo=timezone.utc)
+        cache = BranchCache(str(tmp_path))
+        cache.store_commit_dates("owner/repo", make_inventory(BranchRecord("a", False, "sha-a", commit_date)))
+
+        inventory = make_inventory(BranchRecord("a", False, "sha-a"), BranchRecord("b", False, "sha-b"))
+        assert cache.fill_commit_dates("owner/repo", inventory) == 1
+        assert inventory.records["a"].commit_date == commit_date
+        assert inventory.records["b"].commit_date is None
+
+        # dates are keyed by repository
+        other = make_inventory(BranchRecord("a", False, "sha-a"))
+        assert cache.fill_commit_dates("owner/other", other) == 0
+        cache.close()
+
+    def test_evict_by_age(self, tmp_path):
+        now = [1_000_000.0]
+        cache = BranchCache(str(tmp_path), max_age_days=1, clock=lambda: now[0])
+        commit_date = datetime(2025, 1, 1, tzinfo=timezone.utc)
+        cache.store_commit_dates("owner/repo", make_inventory(BranchRecord("a", False, "sha-a", commit_date)))
+
+        now[0] += 2 * 86400
+        cache.evict()
+
+        assert cache.fill_commit_dates("owner/repo", make_inventory(BranchRecord("a", False, "sha-a"))) == 0
+        cache.close()
+
+    def test_evict_by_size(self, tmp_path):
+        now = [0.0]
+        cache = BranchCache(str(tmp_path), max_size_mb=0, clock=lambda: now[0])
+        cache.db.execute("INSERT INTO pages VALUES ('url', 'etag', '{}', x'00', 0)")
+
+        cache.evict()
+
+        assert cache.etag("url") is None
+        cache.close()
+
+
+class TestMainCache:
+    @pytest.fixture
+    def fake_repo(self, fake_github, monkeypatch):
+        monkeypatch.setenv("GH_TOKEN", "token")
+        monkeypatch.setenv("GITHUB_API_URL", fake_github.base_url)
+        fake_github.add_branch("main")
+        for index in range(5):
+            fake_github.add_branch(f"feature-{index}", days_ago=index * 10)
+        return fake_github
+
+    def test_second_run_uses_cache(self, fake_repo, tmp_path):
+        args = ["--repo-url", "https://github.com/owner/repo", "--max-idle-days", "15", "--cache-dir", str(tmp_path)]
+        runner = CliRunner()
+
+        first = runner.invoke(main, args)
+        assert first.exit_code == 0
+        assert "Cached Commit Date(s)    : 0" in first.output
+        commits = fake_repo.count("rest:commit")
+        assert commits == 5
+
+        second = runner.invoke(main, args)
+        assert second.exit_code == 0
+        assert "Cached Commit Date(s)    : 5" in second.output
+        assert "Cache Hits (304)         : 2" in second.output
+        assert fake_repo.count("rest:commit") == commits
+        assert fake_repo.count("rest:not_modified") == 2
+        assert second.output.count("(MOCK) Delete branch -") == first.output.count("(MOCK) Delete branch -") == 3
+
+    def test_moved_branch_is_resolved(self, fake_repo, tmp_path):
+        args = ["--repo-url", "https://github.com/owner/repo", "--max-idle-days", "15", "--cache-dir", str(tmp_path)]
+        runner = CliRunner()
+        runner.invoke(main, args)
+
+        fake_repo.remove_branch("feature-4")
+        fake_repo.add_branch("feature-4", days_ago=1)
+        result = runner.invoke(main, args)
+
+        assert result.exit_code == 0
+        assert "Cached Commit Date(s)    : 4" in result.output
+        assert result.output.count("(MOCK) Delete branch -") == 2
+
+
+if __name__ == "__main__":
+    pytest.main()
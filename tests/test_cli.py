@@ -10,7 +10,6 @@ from unittest.mock import Mock, patch
 
 import pytest
 from click.testing import CliRunner
-from github import Repository
 
 from delete_branches.cli import (
     build_set_exclude_branches,
@@ -21,37 +20,7 @@ from delete_branches.cli import (
     get_repo,
     main,
 )
-
-
-@pytest.fixture
-def mock_repo():
-    repo = Mock(spec=Repository.Repository)
-    repo.default_branch = "main"
-    return repo
-
-
-@pytest.fixture
-def mock_branch():
-    def _create_branch(name, protected=False, last_commit_days_ago=0):
-        branch = Mock()
-        branch.name = name
-        branch.protected = protected
-        commit_date = datetime.now(timezone.utc) - timedelta(days=last_commit_days_ago)
-        branch.commit.commit.committer.date = commit_date
-        return branch
-
-    return _create_branch
-
-
-@pytest.fixture
-def mock_pull():
-    def _create_pull(base_ref, head_ref):
-        pull = Mock()
-        pull.base.ref = base_ref
-        pull.head.ref = head_ref
-        return pull
-
-    return _create_pull
+from delete_branches.inventory import build_inventory
 
 
 class TestGetAuth:
@@ -146,7 +115,7 @@ class TestGetExemptBranches:
         # mock PRs
         pull_01 = mock_pull("main", "feature1")
         pull_02 = mock_pull("dev", "feature2")
-        mock_repo.get_pulls.return_value = [pull_01, pull_02]
+        mock_repo.requester.requestJsonAndCheck.return_value = ({}, [pull_01, pull_02])
 
         # create exempt set
         exempt = get_exempt_branches(mock_repo, set_exclude_branches=set(["branch-not-in-all"]))
@@ -179,7 +148,7 @@ class TestGetExemptBranches:
         # mock PRs
         pull_01 = mock_pull("main", "feature1")
         pull_02 = mock_pull("dev", "feature2")
-        mock_repo.get_pulls.return_value = [pull_01, pull_02]
+        mock_repo.requester.requestJsonAndCheck.return_value = ({}, [pull_01, pull_02])
 
         # create exempt set
         exempt = get_exempt_branches(mock_repo, set_exclude_branches=set())
@@ -196,6 +165,7 @@ class TestGetExemptBranches:
 
 class TestGetBranchesToDelete:
     def test_branches_to_delete(self, mock_repo, mock_branch):
+        main_branch = mock_branch("main", protected=True)
         normal_branch_01 = mock_branch("normal_01", protected=False, last_commit_days_ago=10)
         normal_branch_02 = mock_branch("normal_02", protected=False, last_commit_days_ago=15)
         normal_branch_03 = mock_branch("normal_03", protected=False, last_commit_days_ago=5)
@@ -205,7 +175,7 @@ class TestGetBranchesToDelete:
 
         # get all mock branches
         mock_repo.get_branches.return_value = [
-            main,
+            main_branch,
             normal_branch_01,
             normal_branch_02,
             normal_branch_03,
@@ -224,11 +194,33 @@ class TestGetBranchesToDelete:
         # Total branches (7) - Exempt branches (3) = not_exempt_branch_count (4)
         # not_exempt_branch_count                  = not in list_branches_to_delete (1) + list_branches_to_delete (3)
         assert not_exempt_branch_count == 4
+        names_branches_to_delete = [branch.name for branch in list_branches_to_delete]
         assert len(list_branches_to_delete) == 3
-        assert "normal_03" not in list_branches_to_delete
-        assert "normal_04" in list_branches_to_delete
-        assert "normal_05" in list_branches_to_delete
-        assert "normal_06" in list_branches_to_delete
+        assert "normal_03" not in names_branches_to_delete
+        assert "normal_04" in names_branches_to_delete
+        assert "normal_05" in names_branches_to_delete
+        assert "normal_06" in names_branches_to_delete
+
+    def test_branches_to_delete_shared_inventory(self, mock_repo, mock_branch, mock_pull):
+        mock_repo.get_branches.return_value = [
+            mock_branch("main", protected=False),
+            mock_branch("protected_01", protected=True, last_commit_days_ago=30),
+            mock_branch("normal_01", protected=False, last_commit_days_ago=10),
+            mock_branch("normal_02", protected=False, last_commit_days_ago=2),
+        ]
+        mock_repo.requester.requestJsonAndCheck.return_value = ({}, [mock_pull("main", "feature1")])
+
+        inventory = build_inventory(mock_repo)
+        exempt = get_exempt_branches(mock_repo, set(), inventory)
+        cutoff_datetime = datetime.now(timezone.utc) - timedelta(days=7)
+        list_branches_to_delete, not_exempt_branch_count = get_branches_to_delete(
+            mock_repo, exempt, cutoff_datetime, inventory
+        )
+
+        # branches are listed once and shared by both phases
+        assert mock_repo.get_branches.call_count == 1
+        assert not_exempt_branch_count == 2
+        assert [branch.name for branch in list_branches_to_delete] == ["normal_01"]
 
 
 class TestDeleteBranches:
@@ -237,15 +229,13 @@ class TestDeleteBranches:
         max_idle_days = 7
         not_exempt_branch_count = 4
 
-        list_branches_to_delete = ["normal_04", "normal_05", "normal_06"]
-
-        mock_repo.get_branch(
-            side_effect=[
-                mock_branch("normal_04", last_commit_days_ago=12),
-                mock_branch("normal_05", last_commit_days_ago=20),
-                mock_branch("normal_06", last_commit_days_ago=10),
-            ]
-        )
+        mock_repo.url = "https://api.github.com/repos/owner/repo"
+        mock_repo.get_branches.return_value = [
+            mock_branch("normal_04", last_commit_days_ago=12),
+            mock_branch("normal_05", last_commit_days_ago=20),
+            mock_branch("normal_06", last_commit_days_ago=10),
+        ]
+        list_branches_to_delete = list(build_inventory(mock_repo))
 
         delete_branches(mock_repo, dry_run, max_idle_days, list_branches_to_delete, not_exempt_branch_count)
         captured = capsys.readouterr()
@@ -253,6 +243,13 @@ class TestDeleteBranches:
         assert "branch is idle more than" in captured.out
         assert "normal" in captured.out
 
+        # delete is driven from the selected records without fetching branch or ref again
+        mock_repo.get_branch.assert_not_called()
+        mock_repo.get_git_ref.assert_not_called()
+        mock_repo.requester.requestJsonAndCheck.assert_any_call(
+            "DELETE", "https://api.github.com/repos/owner/repo/git/refs/heads/normal_05"
+        )
+
     def test_delete_without_branches_to_delete(self, mock_repo, capsys):
         dry_run = False
         max_idle_days = 7
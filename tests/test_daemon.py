@@ -0,0 +1,259 @@
+#!/usr/bin/env python
+
+"""
+Purpose: tests
+"""
+
+import hashlib
+import hmac
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from click.testing import CliRunner
+from github import Auth, Github
+from replay_webhooks import (
+    delete_event,
+    pull_request_event,
+    push_event,
+    replay,
+)
+
+from delete_branches import transport
+from delete_branches.cli import (
+    RunOptions,
+    index_repo,
+    main,
+)
+from delete_branches.daemon import (
+    BranchDaemon,
+    RepoIndex,
+    TimerWheel,
+    WebhookServer,
+    verify_signature,
+)
+from delete_branches.rules import BranchRules
+from delete_branches.scheduler import RateLimitScheduler
+from delete_branches.sweep import RepoResult
+
+DAY = 86400
+SECRET = "secret"
+
+
+class TestTimerWheel:
+    def test_fires_at_deadline_tick(self):
+        wheel = TimerWheel(tick=60, slots=10, start=0)
+        wheel.schedule(150, "a")
+        wheel.schedule(300, "b")
+
+        assert wheel.advance(119) == []
+        assert wheel.advance(120) == ["a"]
+        assert wheel.advance(400) == ["b"]
+        assert len(wheel) == 0
+
+    def test_past_deadline_fires_on_next_advance(self):
+        wheel = TimerWheel(tick=60, slots=10, start=600)
+        wheel.schedule(10, "late")
+
+        assert wheel.seconds_to_next_tick(600) == 0
+        assert wheel.advance(600) == ["late"]
+
+    def test_later_revolutions_stay_in_slot(self):
+        wheel = TimerWheel(tick=60, slots=10, start=0)
+        wheel.schedule(60 * 25, "far")
+        wheel.schedule(60 * 5, "near")
+
+        assert wheel.advance(60 * 10) == ["near"]
+        assert wheel.advance(60 * 20) == []
+        assert len(wheel) == 1
+        """a gap of several revolutions visits each slot once"""
+        assert wheel.advance(60 * 1000) == ["far"]
+
+
+class TestRepoIndex:
+    def test_pull_requests_released_on_close(self):
+        index = RepoIndex(repo=None, default_branch="main")
+        index.pulls[-1] = ("main", "feature")
+        index.pull_branches.update(("main", "feature"))
+        rules = BranchRules({"release"})
+
+        assert index.exempt("feature", rules)
+        assert index.exempt("release", rules)
+        assert index.open_pull(7, "main", "fix") == []
+        """a listed pull request is closed by its branches when the webhook number is not tracked"""
+        assert index.close_pull(3, "main", "feature") == ["feature"]
+        assert not index.exempt("feature", rules)
+        assert index.open_pull(7, "develop", "fix") == ["main"]
+        assert index.close_pull(7, "develop", "fix") == ["develop", "fix"]
+        assert index.exempt("main", rules)
+
+    def test_verify_signature(self):
+        body = b'{"zen": "Keep it logically awesome."}'
+        signature = "sha256=" + hmac.new(SECRET.encode(), body, hashlib.sha256).hexdigest()
+
+        assert verify_signature(SECRET, body, signature)
+        assert not verify_signature(SECRET, body + b" ", signature)
+        assert not verify_signature(SECRET, body, None)
+
+
+class TestBranchDaemon:
+    @pytest.fixture
+    def clock(self):
+        return [time.time()]
+
+    @pytest.fixture
+    def indexed(self, fake_github, clock, monkeypatch):
+        transport.install()
+        fake_github.add_branch("main")
+        fake_github.add_branch("idle", days_ago=30)
+        fake_github.add_branch("aging", days_ago=5)
+        fake_github.add_branch("pull-head", days_ago=30)
+        fake_github.add_branch("release", days_ago=30)
+        fake_github.add_pull("main", "pull-head")
+        gh = Github(auth=Auth.Token("token"), base_url=fake_github.base_url, seconds_between_requests=0)
+        branch_daemon = BranchDaemon(7, BranchRules({"release"}), dry_run=False, tick=1, clock=lambda: clock[0])
+        options = RunOptions(
+            dry_run=False,
+            max_idle_days=7,
+            branch_max_idle=datetime.now(timezone.utc) - timedelta(days=7),
+            set_exclude_branches={"release"},
+            rules=BranchRules({"release"}),
+        )
+        result = index_repo(gh, f"https://github.com/{fake_github.full_name}", options, RateLimitScheduler(), branch_daemon)
+        yield branch_daemon, result
+        transport.close_sessions()
+
+    def test_index_and_delete_due(self, fake_github, indexed, clock):
+        branch_daemon, result = indexed
+
+        assert result == RepoResult(repo="owner/repo", total=5, exempt=3, not_exempt=2, idle=1)
+        assert branch_daemon.delete_due() == 1
+        assert fake_github.get_branch("idle") is None
+
+        """aging crosses the threshold two days later"""
+        clock[0] += 2 * DAY
+        assert branch_daemon.delete_due() == 1
+        assert fake_github.get_branch("aging") is None
+        assert sorted(branch.name for branch in fake_github.branches) == ["main", "pull-head", "release"]
+        assert branch_daemon.repos["owner/repo"].deleted == 2
+
+    def test_interrupted_delete_counts_outcomes(self, fake_github, indexed, clock, monkeypatch):
+        branch_daemon, _ = indexed
+        index = branch_daemon.repos[fake_github.full_name]
+
+        def delete_first_then_fail(repo, branches, *args):
+            yield branches[0], None
+            raise RuntimeError("connection reset")
+
+        monkeypatch.setattr("delete_branches.daemon.iter_deletes", delete_first_then_fail)
+        clock[0] += 2 * DAY
+
+        assert branch_daemon.delete_due() == 1
+        assert (index.deleted, index.failed) == (1, 1)
+        assert len(branch_daemon.wheel) == 1
+
+    def test_events_update_index(self, fake_github, indexed, clock):
+        branch_daemon, _ = indexed
+        full_name = fake_github.full_name
+        now = datetime.fromtimestamp(clock[0], timezone.utc)
+        aging = fake_github.get_branch("aging")
+
+        """a push moves the deadline of aging out; a closed pull request releases its head branch"""
+        branch_daemon.handle(*push_event(full_name, "aging", aging.sha, now))
+        branch_daemon.handle(*pull_request_event(full_name, "closed", 1, "main", "pull-head"))
+        branch_daemon.handle(*delete_event(full_name, "idle"))
+        branch_daemon.handle(*pull_request_event(full_name, "opened", 2, "main", "new"))
+        branch_daemon.handle(*push_event(full_name, "new", "f" * 40, now - timedelta(days=30)))
+
+        assert branch_daemon.delete_due() == 1
+        assert fake_github.get_branch("pull-head") is None
+        assert fake_github.get_branch("idle") is not None
+        clock[0] += 2 * DAY
+        assert branch_daemon.delete_due() == 0
+        assert fake_github.get_branch("aging") is not None
+
+    def test_commit_dates_resolved_outside_lock(self, fake_github, indexed, clock, monkeypatch):
+        branch_daemon, _ = indexed
+        index = branch_daemon.repos[fake_github.full_name]
+        get_commit = index.repo.get_commit
+        requested, release = threading.Event(), threading.Event()
+
+        def slow_get_commit(sha):
+            requested.set()
+            release.wait(5)
+            return get_commit(sha)
+
+        monkeypatch.setattr(index.repo, "get_commit", slow_get_commit)
+        aging = fake_github.get_branch("aging")
+        """a push without head commit timestamp resolves its date with a request"""
+        thread = threading.Thread(target=branch_daemon.handle, args=push_event(fake_github.full_name, "aging", aging.sha))
+        thread.start()
+        try:
+            assert requested.wait(5)
+            """webhooks and the due sweep go on while the request is in flight"""
+            assert branch_daemon.lock.acquire(timeout=1)
+            branch_daemon.lock.release()
+            assert [branch.name for branch in branch_daemon.due_branches(clock[0])["owner/repo"]] == ["idle"]
+        finally:
+            release.set()
+            thread.join()
+
+        clock[0] += 2 * DAY
+        assert [branch.name for branch in branch_daemon.due_branches(clock[0])["owner/repo"]] == ["aging"]
+
+    def test_replayed_webhooks(self, fake_github, indexed, clock):
+        branch_daemon, _ = indexed
+        stop = threading.Event()
+        branch_daemon.delete_due()
+        server = WebhookServer(("127.0.0.1", 0), branch_daemon, SECRET)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        thread = threading.Thread(target=branch_daemon.run, args=(stop,))
+        thread.start()
+        try:
+            url = f"http://127.0.0.1:{server.server_address[1]}/"
+            full_name = fake_github.full_name
+
+            statuses = replay(url, [pull_request_event(full_name, "closed", 1, "main", "pull-head")], SECRET)
+            assert statuses == [202]
+            assert replay(url, [delete_event(full_name, "aging")], "wrong secret") == [401]
+
+            for _ in range(500):
+                if fake_github.get_branch("pull-head") is None:
+                    break
+                time.sleep(0.01)
+            assert fake_github.get_branch("pull-head") is None
+            assert fake_github.get_branch("aging") is not None
+        finally:
+            stop.set()
+            thread.join()
+            server.shutdown()
+            server.server_close()
+
+
+class TestMainWebhook:
+    @pytest.fixture(autouse=True)
+    def fake_repo(self, fake_github, monkeypatch):
+        monkeypatch.setenv("GH_TOKEN", "token")
+        monkeypatch.setenv("GITHUB_API_URL", fake_github.base_url)
+        monkeypatch.delenv("WEBHOOK_SECRET", raising=False)
+        fake_github.add_branch("main")
+        return fake_github
+
+    def test_webhook_port_keeps_its_own_index(self):
+        args = ["--repo-url", "https://github.com/owner/repo", "--max-idle-days", "7", "--webhook-port", "0"]
+        result = CliRunner().invoke(main, args + ["--stream", "true"])
+
+        assert result.exit_code == 1
+        assert "--webhook-port keeps its own branch index" in result.output
+
+    def test_webhook_secret_required(self):
+        args = ["--repo-url", "https://github.com/owner/repo", "--max-idle-days", "7", "--webhook-port", "0"]
+        result = CliRunner().invoke(main, args)
+
+        assert result.exit_code == 1
+        assert "WEBHOOK_SECRET (environment variable) not found" in result.output
+
+
+if __name__ == "__main__":
+    pytest.main()
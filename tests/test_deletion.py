@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+
+"""
+Purpose: tests
+"""
+
+import threading
+import time
+from unittest.mock import Mock
+
+import pytest
+from github import Auth, Github, GithubException
+
+from delete_branches import transport
+from delete_branches.cli import delete_branches
+from delete_branches.deletion import delete_refs, delete_refs_batched
+from delete_branches.graphql_api import build_inventory_graphql
+from delete_branches.inventory import BranchRecord, build_inventory
+
+
+@pytest.fixture
+def fake_repo(fake_github):
+    transport.install()
+    gh = Github(
+        auth=Auth.Token("token"),
+        base_url=fake_github.base_url,
+        per_page=100,
+        pool_size=8,
+        seconds_between_requests=None,
+        seconds_between_writes=None,
+    )
+    yield gh.get_repo(fake_github.full_name)
+    transport.close_sessions()
+
+
+class TestDeleteRefs:
+    def test_concurrent_delete_ordered_output(self, fake_github, fake_repo, capsys):
+        fake_github.add_branch("main")
+        for i in range(50):
+            fake_github.add_branch(f"feature/{i:02}", days_ago=30)
+
+        list_branches_to_delete = [branch for branch in build_inventory(fake_repo) if branch.name != "main"]
+        for branch in list_branches_to_delete:
+            branch.get_commit_date()
+        requests_before_delete = fake_github.count("GET")
+
+        delete_branches(fake_repo, False, 7, list_branches_to_delete, 50, concurrency=8)
+        captured = capsys.readouterr()
+
+        # deletes follow the selection order and issue no extra lookups
+        names = [line.rsplit(": ", 1)[1] for line in captured.out.splitlines() if "Delete branch -" in line]
+        assert names == [f"feature/{i:02}" for i in range(50)]
+        assert fake_github.count("rest:delete") == 50
+        assert fake_github.count("GET") == requests_before_delete
+        assert [branch.name for branch in fake_github.branches] == ["main"]
+
+    def test_concurrent_requests_in_flight(self):
+        in_flight = []
+        active = 0
+        lock = threading.Lock()
+
+        def request(verb, url):
+            nonlocal active
+            with lock:
+                active += 1
+                in_flight.append(active)
+            time.sleep(0.01)
+            with lock:
+                active -= 1
+
+        repo = Mock()
+        repo.url = "https://api.github.com/repos/owner/repo"
+        repo.requester.requestJsonAndCheck.side_effect = request
+        branches = [BranchRecord(f"b{i}", False, f"{i:040x}") for i in range(20)]
+
+        assert list(delete_refs(repo, branches, concurrency=4)) == branches
+        assert 1 < max(in_flight) <= 4
+
+    def test_failure_cancels_pending(self):
+        repo = Mock()
+        repo.url = "https://api.github.com/repos/owner/repo"
+        repo.requester.requestJsonAndCheck.side_effect = GithubException(422, {"message": "Reference does not exist"})
+        branches = [BranchRecord(f"b{i}", False, f"{i:040x}") for i in range(20)]
+
+        with pytest.raises(GithubException):
+            list(delete_refs(repo, branches, concurrency=2))
+        assert repo.requester.requestJsonAndCheck.call_count < 20
+
+
+class TestDeleteRefsBatched:
+    def test_graphql_batches_report_per_ref(self, fake_github, fake_repo, capsys):
+        fake_github.add_branch("main", protected=True)
+        for i in range(25):
+            fake_github.add_branch(f"feature/{i:02}", days_ago=30)
+
+        list_branches_to_delete = list(build_inventory(fake_repo))
+        for branch in list_branches_to_delete:
+            branch.get_commit_date()
+        fake_github.remove_branch("feature/03")
+
+        deleted, failed = delete_branches(fake_repo, False, 7, list_branches_to_delete, 26, batch_size=10)
+        captured = capsys.readouterr()
+
+        # one mutation per batch of 10, failures do not stop other deletes
+        assert (deleted, failed) == (24, 2)
+        assert "❌ Delete failed - feature/03: Reference does not exist" in captured.out
+        assert "❌ Delete failed - main: Cannot delete protected branch" in captured.out
+        assert fake_github.count("graphql:ref_ids") == 0
+        assert fake_github.count("graphql:delete_refs") == 3
+        assert fake_github.count("rest:delete") == 0
+        assert [branch.name for branch in fake_github.branches] == ["main"]
+
+    def test_graphql_inventory_skips_ref_id_lookup(self, fake_github, fake_repo):
+        for i in range(5):
+            fake_github.add_branch(f"feature/{i}", days_ago=30)
+
+        results = list(delete_refs_batched(fake_repo, build_inventory_graphql(fake_repo), batch_size=2))
+
+        assert [error for _, error in results] == [None] * 5
+        assert fake_github.count("graphql:ref_ids") == 0
+        assert fake_github.count("graphql:delete_refs") == 3
+        assert fake_github.branches == []
+
+
+if __name__ == "__main__":
+    pytest.main()
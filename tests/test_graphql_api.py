@@ -0,0 +1,145 @@
+#!/usr/bin/env python
+
+"""
+Purpose: tests
+"""
+
+import pytest
+from click.testing import CliRunner
+from github import Auth, Github
+
+from delete_branches.cli import get_exempt_branches, main
+from delete_branches.graphql_api import (
+    build_inventory_graphql,
+    get_merged_branches,
+    iter_branch_records_graphql,
+)
+
+
+@pytest.fixture
+def fake_repo(fake_github):
+    gh = Github(
+        auth=Auth.Token("token"),
+        base_url=fake_github.base_url,
+        per_page=100,
+        seconds_between_requests=0,
+        seconds_between_writes=0,
+    )
+    return gh.get_repo(fake_github.full_name)
+
+
+class TestBuildInventoryGraphql:
+    def test_pages_of_refs(self, fake_github, fake_repo):
+        fake_github.add_branch("main", protected=True)
+        for i in range(250):
+            fake_github.add_branch(f"feature-{i:03}", days_ago=i)
+
+        inventory = build_inventory_graphql(fake_repo)
+
+        # 251 refs in 3 pages of 100 without a commit request per branch
+        assert len(inventory) == 251
+        assert fake_github.count("graphql:refs") == 3
+        assert [branch.name for branch in inventory.protected()] == ["main"]
+        assert inventory.records["feature-010"].commit_date == fake_github.get_branch("feature-010").committed_date
+        assert inventory.records["feature-010"].sha == fake_github.get_branch("feature-010").sha
+
+    @pytest.mark.parametrize("reverse, listed", [(False, 150), (True, 250)])
+    def test_deletes_while_listing(self, fake_github, fake_repo, reverse, listed):
+        for i in range(250):
+            fake_github.add_branch(f"feature-{i:03}")
+
+        names = []
+        for record in iter_branch_records_graphql(fake_repo, reverse=reverse):
+            names.append(record.name)
+            fake_github.remove_branch(record.name)
+
+        # cursors are offsets: deleting listed refs skips refs paged forwards, not backwards
+        assert len(names) == listed
+        assert len(set(names)) == listed
+
+    def test_pulls_exempt(self, fake_github, fake_repo, capsys):
+        fake_github.add_branch("main")
+        fake_github.add_branch("dev")
+        fake_github.add_branch("feature1")
+        fake_github.add_branch("feature2")
+        fake_github.add_pull("dev", "feature1")
+
+        inventory = build_inventory_graphql(fake_repo)
+        exempt = get_exempt_branches(fake_repo, set(), inventory)
+
+        assert inventory.pulls == [("dev", "feature1")]
+        assert exempt == {"main", "dev", "feature1"}
+        assert fake_github.count("graphql:pulls") == 1
+
+
+class TestGetMergedBranches:
+    def test_batched_compare(self, fake_github, fake_repo):
+        fake_github.add_branch("main")
+        for i in range(120):
+            fake_github.add_branch(f"feature-{i:03}", merged=i % 3 == 0)
+
+        merged = get_merged_branches(fake_repo, [f"feature-{i:03}" for i in range(120)] + ["deleted"], batch_size=50)
+
+        # 121 branches in 3 requests instead of one compare call per branch
+        assert merged == {f"feature-{i:03}" for i in range(0, 120, 3)}
+        assert fake_github.count("graphql:compare") == 3
+
+    def test_missing_ref_fails_only_its_comparison(self, fake_github, fake_repo):
+        fake_github.add_branch("main")
+        fake_github.add_branch("merged-a", merged=True)
+        fake_github.add_branch("merged-b", merged=True)
+        fake_github.add_branch("ahead")
+
+        merged = get_merged_branches(fake_repo, ["merged-a", "deleted", "ahead", "merged-b"])
+
+        assert merged == {"merged-a", "merged-b"}
+        assert fake_github.count("graphql:compare") == 1
+
+    def test_no_branches(self, fake_github, fake_repo):
+        assert get_merged_branches(fake_repo, []) == set()
+        assert fake_github.count("graphql:compare") == 0
+
+
+class TestMainGraphql:
+    def test_main_api_graphql(self, fake_github, monkeypatch):
+        monkeypatch.setenv("GH_TOKEN", "token")
+        monkeypatch.setenv("GITHUB_API_URL", fake_github.base_url)
+        fake_github.add_branch("main")
+        fake_github.add_branch("idle", days_ago=30)
+        fake_github.add_branch("active", days_ago=1)
+
+        runner = CliRunner()
+        result = runner.invoke(
+            main,
+            ["--repo-url", "https://github.com/owner/repo", "--max-idle-days", "7", "--api", "graphql"],
+        )
+
+        assert result.exit_code == 0
+        assert "api: graphql" in result.output
+        assert "(MOCK) Delete branch" in result.output
+        assert ": idle" in result.output
+        assert ": active" not in result.output
+
+    def test_main_merged(self, fake_github, monkeypatch):
+        monkeypatch.setenv("GH_TOKEN", "token")
+        monkeypatch.setenv("GITHUB_API_URL", fake_github.base_url)
+        fake_github.add_branch("main")
+        fake_github.add_branch("idle", days_ago=30)
+        fake_github.add_branch("merged-active", days_ago=1, merged=True)
+        fake_github.add_branch("active", days_ago=1)
+
+        runner = CliRunner()
+        result = runner.invoke(
+            main, ["--repo-url", "https://github.com/owner/repo", "--max-idle-days", "7", "--merged", "true"]
+        )
+
+        assert result.exit_code == 0
+        assert "Total Number of Branches (Merged-Not-Idle)       : 1" in result.output
+        assert ": idle" in result.output
+        assert ": merged-active" in result.output
+        assert ": active" not in result.output
+        assert fake_github.count("graphql:compare") == 1
+
+
+if __name__ == "__main__":
+    pytest.main()
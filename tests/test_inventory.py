@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+"""
+Purpose: tests
+"""
+
+import threading
+
+import pytest
+from github import Auth, Github
+
+from delete_branches import transport
+from delete_branches.inventory import build_inventory, last_page, list_pulls
+from delete_branches.scheduler import RateLimitScheduler
+
+
+class TestBuildInventory:
+    def test_build_inventory(self, mock_repo, mock_branch):
+        protected_branch_01 = mock_branch("protected_01", protected=True)
+        normal_branch_01 = mock_branch("normal_01", protected=False, last_commit_days_ago=10)
+        mock_repo.get_branches.return_value = [protected_branch_01, normal_branch_01]
+
+        inventory = build_inventory(mock_repo)
+
+        assert len(inventory) == 2
+        assert "normal_01" in inventory
+        assert inventory.names == {"protected_01", "normal_01"}
+        assert [branch.name for branch in inventory.protected()] == ["protected_01"]
+        assert inventory.records["normal_01"].sha == normal_branch_01.commit.sha
+
+    def test_commit_date_resolved_once(self, mock_repo, mock_branch):
+        normal_branch_01 = mock_branch("normal_01", protected=False, last_commit_days_ago=10)
+        mock_repo.get_branches.return_value = [normal_branch_01]
+
+        record = build_inventory(mock_repo).records["normal_01"]
+        commit_date = record.get_commit_date()
+        normal_branch_01.commit.commit.committer.date = None
+
+        assert record.get_commit_date() == commit_date
+
+
+class TestListPulls:
+    def test_last_page(self):
+        link = '<https://api.github.com/x?page=2>; rel="next", <https://api.github.com/x?per_page=100&page=4>; rel="last"'
+
+        assert last_page(link) == 4
+        assert last_page(None) == 1
+
+    def test_pages_fetched_concurrently(self, fake_github):
+        fake_github.add_branch("main")
+        for i in range(250):
+            fake_github.add_pull("main", f"renovate/dep-{i:03}")
+        gh = Github(auth=Auth.Token("token"), base_url=fake_github.base_url, seconds_between_requests=0)
+
+        pulls = list_pulls(gh.get_repo(fake_github.full_name))
+
+        assert pulls == [("main", f"renovate/dep-{i:03}") for i in range(250)]
+        assert fake_github.count("rest:pulls") == 3
+
+    def test_pages_counted_to_caller_phase(self, fake_github, monkeypatch):
+        fake_github.add_branch("main")
+        for i in range(350):
+            fake_github.add_pull("main", f"renovate/dep-{i:03}")
+        scheduler = RateLimitScheduler()
+        transport.install(scheduler)
+        try:
+            gh = Github(auth=Auth.Token("token"), base_url=fake_github.base_url, seconds_between_requests=0)
+            repo = gh.get_repo(fake_github.full_name)
+            requester = repo.requester
+            request = requester.requestJsonAndCheck
+            """pages 2 to 4 only get past the barrier when they are in flight together"""
+            barrier = threading.Barrier(3, timeout=10)
+
+            def request_page(verb, url, parameters=None, *args, **kwargs):
+                if parameters and parameters.get("page", 1) > 1:
+                    barrier.wait()
+                return request(verb, url, parameters, *args, **kwargs)
+
+            monkeypatch.setattr(requester, "requestJsonAndCheck", request_page)
+            with scheduler.phase("exemption"):
+                pulls = list_pulls(repo)
+        finally:
+            transport.install()
+            transport.close_sessions()
+
+        assert len(pulls) == 350
+        assert fake_github.count("rest:pulls") == 4
+        assert scheduler.phases["exemption"].requests == 4
+        """only the repository lookup was sent outside the phase"""
+        assert scheduler.phases["other"].requests == 1
+
+
+if __name__ == "__main__":
+    pytest.main()
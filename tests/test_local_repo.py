@@ -0,0 +1,160 @@
+#!/usr/bin/env python
+
+"""
+Purpose: tests
+"""
+
+import os
+import shutil
+import subprocess
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from click.testing import CliRunner
+from github import Auth, Github
+
+from delete_branches.cli import main
+from delete_branches.local_repo import (
+    build_inventory_local,
+    parse_push_porcelain,
+    push_delete,
+    read_local_heads,
+)
+
+NOW = datetime.now(timezone.utc).replace(microsecond=0)
+BRANCH_AGES = {"main": 0, "idle": 30, "active": 1, "release": 90}
+
+
+def git(*args, cwd=None, days_ago=0):
+    date = (NOW - timedelta(days=days_ago)).isoformat()
+    env = {**os.environ, "GIT_AUTHOR_DATE": date, "GIT_COMMITTER_DATE": date}
+    identity = ["-c", "user.name=dev", "-c", "user.email=dev@example.com"]
+    return subprocess.run(["git", *identity, *args], cwd=cwd, env=env, capture_output=True, check=True).stdout
+
+
+@pytest.fixture
+def work_repo(tmp_path):
+    if shutil.which("git") is None:
+        pytest.skip("git is not installed")
+    work = tmp_path / "work"
+    git("init", "-q", "-b", "main", str(work))
+    git("commit", "-q", "--allow-empty", "-m", "initial", cwd=work, days_ago=100)
+    for name, days_ago in BRANCH_AGES.items():
+        git("checkout", "-q", "-B", name, "main", cwd=work)
+        git("commit", "-q", "--allow-empty", "-m", name, cwd=work, days_ago=days_ago)
+    return work
+
+
+@pytest.fixture
+def bare_repo(work_repo, tmp_path):
+    git("clone", "-q", "--mirror", str(work_repo), str(tmp_path / "mirror.git"))
+    return tmp_path / "mirror.git"
+
+
+@pytest.fixture
+def fake_repo(fake_github, monkeypatch):
+    monkeypatch.setenv("GH_TOKEN", "token")
+    monkeypatch.setenv("GITHUB_API_URL", fake_github.base_url)
+    for name, days_ago in BRANCH_AGES.items():
+        fake_github.add_branch(name, days_ago=days_ago, protected=name == "release")
+    return fake_github
+
+
+class TestReadLocalHeads:
+    def test_bare_clone(self, bare_repo):
+        heads = read_local_heads(str(bare_repo))
+
+        assert {name: date for name, (_, date) in heads.items()} == {
+            name: NOW - timedelta(days=days_ago) for name, days_ago in BRANCH_AGES.items()
+        }
+
+    def test_working_clone_reads_remote_tracking_refs(self, work_repo, tmp_path):
+        git("clone", "-q", str(work_repo), str(tmp_path / "clone"))
+
+        assert set(read_local_heads(str(tmp_path / "clone"))) == set(BRANCH_AGES)
+
+    def test_inventory_asks_api_for_protection_only(self, bare_repo, fake_repo):
+        gh = Github(auth=Auth.Token("token"), base_url=fake_repo.base_url, seconds_between_requests=0)
+        repo = gh.get_repo(fake_repo.full_name)
+        requests_before = fake_repo.count("GET")
+
+        inventory = build_inventory_local(repo, str(bare_repo))
+
+        assert [branch.name for branch in inventory.protected()] == ["release"]
+        assert inventory.records["idle"].commit_date == NOW - timedelta(days=30)
+        assert fake_repo.count("GET") - requests_before == 1
+
+
+class TestPushDelete:
+    def test_parse_push_porcelain(self):
+        output = (
+            "To github.com:owner/repo.git\n"
+            + "-\t:refs/heads/idle\t[deleted]\n"
+            + "!\t:refs/heads/release\t[remote rejected] (protected branch hook declined)\n"
+            + "Done\n"
+        )
+
+        assert parse_push_porcelain(output) == {"release": "[remote rejected] (protected branch hook declined)"}
+
+    def test_push_delete_one_push(self, work_repo, tmp_path):
+        clone = tmp_path / "clone"
+        git("clone", "-q", str(work_repo), str(clone))
+        git("checkout", "-q", "--detach", cwd=work_repo)
+
+        assert push_delete(str(clone), ["idle", "release"]) == {}
+        assert set(read_local_heads(str(clone))) == {"main", "active"}
+
+    def test_push_delete_rejected(self, work_repo, tmp_path):
+        clone = tmp_path / "clone"
+        git("clone", "-q", str(work_repo), str(clone))
+        git("checkout", "-q", "--detach", cwd=work_repo)
+        git("config", "receive.denyDeletes", "true", cwd=work_repo)
+
+        errors = push_delete(str(clone), ["idle", "release"])
+
+        # atomic push: no branch is deleted when any is rejected
+        assert set(errors) == {"idle", "release"}
+        assert "deletion prohibited" in errors["idle"] + errors["release"]
+        assert git("branch", "--list", "idle", "release", cwd=work_repo).split() == [b"idle", b"release"]
+
+    def test_push_delete_moved_head(self, work_repo, tmp_path):
+        clone = tmp_path / "clone"
+        git("clone", "-q", str(work_repo), str(clone))
+        git("checkout", "-q", "--detach", cwd=work_repo)
+        heads = read_local_heads(str(clone))
+        git("commit", "-q", "--allow-empty", "-m", "moved", cwd=work_repo)
+        git("branch", "-f", "idle", "HEAD", cwd=work_repo)
+
+        errors = push_delete(str(clone), ["idle", "release"], {name: heads[name][0] for name in ("idle", "release")})
+
+        # compare-and-delete: the lease on the moved branch rejects the atomic push
+        assert set(errors) == {"idle", "release"}
+        assert "stale info" in errors["idle"]
+        assert git("branch", "--list", "idle", "release", cwd=work_repo).split() == [b"idle", b"release"]
+
+
+class TestMainLocalRepo:
+    @pytest.mark.parametrize("stream", ["false", "true"])
+    def test_main_local_repo(self, bare_repo, fake_repo, stream):
+        args = ["--repo-url", "https://github.com/owner/repo", "--max-idle-days", "7", "--dry-run", "false"]
+
+        runner = CliRunner()
+        result = runner.invoke(main, args + ["--local-repo", str(bare_repo), "--stream", stream])
+
+        assert result.exit_code == 0
+        assert [branch.name for branch in fake_repo.branches] == ["main", "active", "release"]
+        # protection comes from the protection rules, no branch listing
+        assert fake_repo.count("rest:commit") == 0
+        assert fake_repo.count("rest:branches") == 0
+        assert fake_repo.count("graphql:protection") == 1
+
+    def test_local_repo_requires_single_repository(self, bare_repo, fake_repo):
+        runner = CliRunner()
+        result = runner.invoke(main, ["--org", "owner", "--max-idle-days", "7", "--local-repo", str(bare_repo)])
+
+        assert result.exit_code == 1
+        assert "--local-repo requires a single --repo-url" in result.output
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,154 @@
+#!/usr/bin/env python
+
+"""
+Purpose: tests
+"""
+
+import shutil
+import subprocess
+import time
+
+import pytest
+from click.testing import CliRunner
+from github import Auth, Github
+
+from delete_branches.cli import get_branches_to_delete, get_exempt_branches, main
+from delete_branches.ls_remote import (
+    build_inventory_ls_remote,
+    fetch_heads,
+    parse_advertisement,
+)
+
+GIT_IDENTITY = ["-c", "user.name=dev", "-c", "user.email=dev@example.com"]
+
+
+def git(*args, cwd=None):
+    return subprocess.run(["git", *GIT_IDENTITY, *args], cwd=cwd, capture_output=True, check=True).stdout
+
+
+@pytest.fixture
+def bare_repo(tmp_path):
+    if shutil.which("git") is None:
+        pytest.skip("git is not installed")
+    work = tmp_path / "work"
+    git("init", "-q", "-b", "main", str(work))
+    git("commit", "-q", "--allow-empty", "-m", "initial", cwd=work)
+    for name in ["feature/a", "feature/b", "release"]:
+        git("branch", name, cwd=work)
+    git("tag", "v1.0", cwd=work)
+    git("clone", "-q", "--bare", str(work), str(tmp_path / "repo.git"))
+    return tmp_path / "repo.git"
+
+
+@pytest.fixture
+def fake_repo(fake_github):
+    gh = Github(
+        auth=Auth.Token("token"),
+        base_url=fake_github.base_url,
+        per_page=100,
+        seconds_between_requests=0,
+        seconds_between_writes=0,
+    )
+    return gh.get_repo(fake_github.full_name)
+
+
+class TestFetchHeads:
+    def test_local_bare_repo(self, bare_repo):
+        heads = fetch_heads(str(bare_repo))
+
+        expected = git("for-each-ref", "--format=%(refname:lstrip=2) %(objectname)", "refs/heads", cwd=bare_repo)
+        assert heads == dict(line.split(" ") for line in expected.decode().splitlines())
+        assert set(heads) == {"main", "feature/a", "feature/b", "release"}
+
+    def test_parse_smart_http_advertisement(self, bare_repo):
+        service = b"001e# service=git-upload-pack\n0000"
+        advertisement = service + git("upload-pack", "--stateless-rpc", "--advertise-refs", str(bare_repo))
+
+        assert parse_advertisement(advertisement) == fetch_heads(str(bare_repo))
+
+    def test_parse_scales_linearly(self):
+        def advertisement(count):
+            lines = [f"{i:040x} refs/heads/branch-{i:06}\n".encode() for i in range(count)]
+            return b"0000" + b"".join(f"{len(line) + 4:04x}".encode() + line for line in lines) + b"0000"
+
+        def best_time(data):
+            timings = []
+            for _ in range(3):
+                started = time.perf_counter()
+                heads = parse_advertisement(data)
+                timings.append(time.perf_counter() - started)
+            return len(heads), min(timings)
+
+        small, large = advertisement(25_000), advertisement(100_000)
+        small_count, small_time = best_time(small)
+        large_count, large_time = best_time(large)
+
+        assert (small_count, large_count) == (25_000, 100_000)
+        # 4x the refs in about 4x the time; re-slicing the remaining buffer per pkt-line made it 16x
+        assert large_time < 8 * small_time
+
+    def test_smart_http(self, fake_github):
+        for i in range(250):
+            fake_github.add_branch(f"feature-{i:03}")
+
+        heads = fetch_heads(f"{fake_github.base_url}/owner/repo.git", "token")
+
+        assert heads == {branch.name: branch.sha for branch in fake_github.branches}
+        assert fake_github.count("git:info_refs") == 1
+
+
+class TestBuildInventoryLsRemote:
+    def test_one_listing_request_and_batched_dates(self, fake_github, fake_repo, capsys):
+        fake_github.add_branch("main", protected=True)
+        for i in range(250):
+            fake_github.add_branch(f"feature-{i:03}", days_ago=i)
+        fake_github.add_pull("main", "feature-000")
+
+        inventory = build_inventory_ls_remote(fake_repo)
+        exempt = get_exempt_branches(fake_repo, set(), inventory)
+        branches, count_not_exempt = get_branches_to_delete(
+            fake_repo, exempt, fake_github.branches[11].committed_date, inventory
+        )
+
+        assert len(inventory) == 251
+        assert [branch.name for branch in inventory.protected()] == ["main"]
+        assert fake_github.count("git:info_refs") == 1
+        assert fake_github.count("rest:branches") == 1
+        # 249 not-exempt branches dated in 3 GraphQL requests, none through the commits API
+        assert count_not_exempt == 249
+        assert fake_github.count("graphql:commits") == 3
+        assert fake_github.count("rest:commit") == 0
+        assert [branch.name for branch in branches] == [f"feature-{i:03}" for i in range(11, 250)]
+
+
+class TestMainLsRemote:
+    def test_main_api_ls_remote(self, fake_github, monkeypatch):
+        monkeypatch.setenv("GH_TOKEN", "token")
+        monkeypatch.setenv("GITHUB_API_URL", fake_github.base_url)
+        fake_github.add_branch("main")
+        fake_github.add_branch("idle", days_ago=30)
+        fake_github.add_branch("active", days_ago=1)
+
+        runner = CliRunner()
+        result = runner.invoke(
+            main,
+            [
+                "--repo-url",
+                "https://github.com/owner/repo",
+                "--max-idle-days",
+                "7",
+                "--api",
+                "ls-remote",
+                "--stream",
+                "true",
+            ],
+        )
+
+        assert result.exit_code == 0
+        assert ": idle" in result.output
+        assert ": active" not in result.output
+        assert fake_github.count("git:info_refs") == 1
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,82 @@
+#!/usr/bin/env python
+
+"""
+Purpose: tests
+"""
+
+import json
+
+import pytest
+from click.testing import CliRunner
+
+from delete_branches.cli import main
+from delete_branches.metrics import percentile
+
+
+class TestPercentile:
+    def test_nearest_rank(self):
+        values = [float(value) for value in range(1, 101)]
+
+        assert percentile(values, 50) == 50.0
+        assert percentile(values, 99) == 99.0
+        assert percentile([3.0], 90) == 3.0
+        assert percentile([], 50) == 0.0
+
+
+class TestMainMetrics:
+    @pytest.fixture
+    def fake_repo(self, fake_github, monkeypatch, tmp_path):
+        monkeypatch.setenv("GH_TOKEN", "token")
+        monkeypatch.setenv("GITHUB_API_URL", fake_github.base_url)
+        monkeypatch.setenv("GITHUB_OUTPUT", str(tmp_path / "output"))
+        monkeypatch.setenv("GITHUB_STEP_SUMMARY", str(tmp_path / "summary.md"))
+        fake_github.add_branch("main")
+        fake_github.add_branch("idle", days_ago=30)
+        fake_github.add_branch("active", days_ago=1)
+        return fake_github
+
+    def test_metrics_file_and_github_outputs(self, fake_repo, tmp_path):
+        metrics_file = tmp_path / "metrics.json"
+        args = ["--repo-url", "https://github.com/owner/repo", "--max-idle-days", "7", "--dry-run", "false"]
+
+        runner = CliRunner()
+        result = runner.invoke(main, args + ["--metrics-file", str(metrics_file)])
+        assert result.exit_code == 0
+
+        metrics = json.loads(metrics_file.read_text())
+        assert list(metrics["phases"]) == ["auth", "repo", "inventory", "exemption", "selection", "deletion"]
+        # branch listing, protection rules (GraphQL) and rulesets
+        assert metrics["phases"]["inventory"]["requests"] == 3
+        assert metrics["phases"]["selection"]["requests"] == 2
+        assert metrics["phases"]["deletion"]["requests"] == 1
+        assert metrics["phases"]["inventory"]["bytes"] > 0
+        assert metrics["phases"]["inventory"]["latency_ms"]["p50"] > 0
+        assert metrics["totals"]["requests"] == fake_repo.count("GET") + fake_repo.count("POST") + fake_repo.count("DELETE")
+        assert metrics["totals"]["deleted"] == 1
+        assert metrics["repositories"][0]["repo"] == "owner/repo"
+
+        outputs = (tmp_path / "output").read_text().splitlines()
+        assert "deleted=1" in outputs
+        assert json.loads(next(line for line in outputs if line.startswith("metrics=")).split("=", 1)[1]) == metrics
+
+        summary = (tmp_path / "summary.md").read_text()
+        assert "| selection | 2 |" in summary
+        assert "Branches: 3, idle: 1, deleted: 1, failed repositories: 0" in summary
+
+    def test_cache_hits(self, fake_repo, tmp_path):
+        metrics_file = tmp_path / "metrics.json"
+        args = ["--repo-url", "https://github.com/owner/repo", "--max-idle-days", "7", "--cache-dir", str(tmp_path)]
+
+        runner = CliRunner()
+        runner.invoke(main, args)
+        result = runner.invoke(main, args + ["--metrics-file", str(metrics_file)])
+        assert result.exit_code == 0
+
+        metrics = json.loads(metrics_file.read_text())
+        assert metrics["phases"]["inventory"]["cache_hits"] == 1
+        assert metrics["phases"]["exemption"]["cache_hits"] == 1
+        assert metrics["totals"]["cache_hits"] == 2
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python
+
+"""
+Purpose: tests
+"""
+
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from click.testing import CliRunner
+
+from delete_branches.cli import main
+from delete_branches.inventory import BranchRecord
+from delete_branches.pipeline import (
+    PipelineCounts,
+    iter_pages,
+    stream_branches_to_delete,
+)
+
+
+class TestStreamBranchesToDelete:
+    def test_iter_pages(self):
+        assert list(iter_pages(range(5), size=2)) == [[0, 1], [2, 3], [4]]
+        assert list(iter_pages([], size=2)) == []
+
+    def test_first_page_selected_before_listing_completes(self, mock_repo):
+        listed = 0
+        old = datetime.now(timezone.utc) - timedelta(days=30)
+
+        def branches():
+            nonlocal listed
+            for i in range(1000):
+                listed += 1
+                yield BranchRecord(f"feature-{i}", i == 1, f"{i:040x}", old)
+
+        counts = PipelineCounts()
+        selected = stream_branches_to_delete(
+            mock_repo, branches(), {"feature-0"}, datetime.now(timezone.utc) - timedelta(days=7), counts
+        )
+
+        assert next(selected).name == "feature-2"
+        assert listed == 100
+        assert sum(1 for _ in selected) == 997
+        assert counts == PipelineCounts(total=1000, exempt=2, not_exempt=998, idle=998)
+
+
+class TestMainStream:
+    @pytest.fixture
+    def fake_repo(self, fake_github, monkeypatch):
+        monkeypatch.setenv("GH_TOKEN", "token")
+        monkeypatch.setenv("GITHUB_API_URL", fake_github.base_url)
+        fake_github.add_branch("main")
+        fake_github.add_branch("release", protected=True, days_ago=90)
+        fake_github.add_branch("feature-pr", days_ago=30)
+        fake_github.add_pull("main", "feature-pr")
+        for i in range(150):
+            fake_github.add_branch(f"feature-{i:03}", days_ago=30 if i % 2 else 1)
+        return fake_github
+
+    @pytest.mark.parametrize("api", ["rest", "graphql"])
+    def test_stream_delete(self, fake_repo, api):
+        runner = CliRunner()
+        result = runner.invoke(
+            main,
+            [
+                "--repo-url",
+                "https://github.com/owner/repo",
+                "--max-idle-days",
+                "7",
+                "--dry-run",
+                "false",
+                "--stream",
+                "true",
+                "--api",
+                api,
+                "--concurrency",
+                "4",
+            ],
+        )
+
+        assert result.exit_code == 0
+        assert "Protected Branch         : release" in result.output
+        assert "Total Number of Branches                         : 153" in result.output
+        assert "Total Number of Branches (Exempt-From-Delete)    : 3" in result.output
+        assert "Total Number of Branches (Selected-For-Delete)   : 75" in result.output
+        assert fake_repo.count("rest:delete") == 75
+        assert {branch.name for branch in fake_repo.branches} == {"main", "release", "feature-pr"} | {
+            f"feature-{i:03}" for i in range(0, 150, 2)
+        }
+
+
+if __name__ == "__main__":
+    pytest.main()
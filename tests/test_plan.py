@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+
+"""
+Purpose: tests
+"""
+
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from click.testing import CliRunner
+
+from delete_branches.cli import main
+from delete_branches.inventory import BranchRecord
+from delete_branches.plan import DeletionPlan, compare_heads
+
+NOW = datetime(2026, 1, 10, tzinfo=timezone.utc)
+
+
+class TestDeletionPlan:
+    def test_reason_and_round_trip(self, tmp_path):
+        plan = DeletionPlan(NOW - timedelta(days=7))
+        plan.repo("owner/repo").add(
+            [BranchRecord("idle", False, "sha-1", NOW - timedelta(days=30)), BranchRecord("merged", False, "sha-2", NOW)]
+        )
+        plan.save(str(tmp_path / "plan.json"), NOW)
+
+        loaded = DeletionPlan.load(str(tmp_path / "plan.json"))
+
+        assert loaded.branch_max_idle == NOW - timedelta(days=7)
+        assert [(entry.branch, entry.sha, entry.reason) for entry in loaded.repo("owner/repo").entries] == [
+            ("idle", "sha-1", "idle"),
+            ("merged", "sha-2", "merged"),
+        ]
+        assert loaded.repo("owner/repo").entries[0].record().commit_date == NOW - timedelta(days=30)
+
+    def test_not_a_plan(self, tmp_path):
+        (tmp_path / "plan.json").write_text(json.dumps({"version": 0}))
+
+        with pytest.raises(ValueError):
+            DeletionPlan.load(str(tmp_path / "plan.json"))
+
+
+class TestMainPlan:
+    @pytest.fixture
+    def fake_repo(self, fake_github, monkeypatch):
+        monkeypatch.setenv("GH_TOKEN", "token")
+        monkeypatch.setenv("GITHUB_API_URL", fake_github.base_url)
+        fake_github.add_branch("main")
+        for i in range(10):
+            fake_github.add_branch(f"feature-{i:02}", days_ago=30 if i < 6 else 1)
+        return fake_github
+
+    @pytest.mark.parametrize("stream", ["false", "true"])
+    def test_plan_out_and_apply(self, fake_repo, tmp_path, stream):
+        plan_file = str(tmp_path / "plan.json")
+        args = ["--repo-url", "https://github.com/owner/repo", "--max-idle-days", "7", "--stream", stream]
+        runner = CliRunner()
+
+        result = runner.invoke(main, args + ["--plan-out", plan_file])
+        assert result.exit_code == 0
+        plan = json.loads(open(plan_file).read())
+        planned = sorted(entry["branch"] for entry in plan["repositories"]["owner/repo"])
+        assert planned == [f"feature-{i:02}" for i in range(6)]
+        assert len(fake_repo.branches) == 11
+
+        # one planned branch got a new commit and another was deleted before the plan is applied
+        fake_repo.remove_branch("feature-00")
+        fake_repo.add_branch("feature-00", days_ago=30)
+        fake_repo.remove_branch("feature-01")
+        fake_repo.requests.clear()
+
+        result = runner.invoke(main, ["--apply-plan", plan_file, "--dry-run", "false"])
+
+        assert result.exit_code == 0
+        assert "Skipped branch - feature-00: head moved" in result.output
+        assert "Skipped branch - feature-01: branch no longer exists" in result.output
+        assert sorted(branch.name for branch in fake_repo.branches) == [
+            "feature-00",
+            "feature-06",
+            "feature-07",
+            "feature-08",
+            "feature-09",
+            "main",
+        ]
+        # no listing or selection: one comparison query and one batched delete
+        assert fake_repo.count("rest:branches") == 0
+        assert fake_repo.count("rest:commit") == 0
+        assert fake_repo.count("graphql:ref_ids") == 1
+        assert fake_repo.count("graphql:delete_refs") == 1
+
+    def test_apply_plan_keeps_branch_moved_after_comparison(self, fake_repo, tmp_path, monkeypatch):
+        plan_file = str(tmp_path / "plan.json")
+        args = ["--repo-url", "https://github.com/owner/repo", "--max-idle-days", "7", "--plan-out", plan_file]
+        runner = CliRunner()
+        assert runner.invoke(main, args).exit_code == 0
+
+        # feature-02 gets a new commit once its head was compared, before its delete is sent
+        def compare_then_push(repo, entries):
+            compared = compare_heads(repo, entries)
+            fake_repo.remove_branch("feature-02")
+            fake_repo.add_branch("feature-02", days_ago=0)
+            return compared
+
+        monkeypatch.setattr("delete_branches.plan.compare_heads", compare_then_push)
+        result = runner.invoke(main, ["--apply-plan", plan_file, "--dry-run", "false"])
+
+        assert result.exit_code == 1
+        assert "❌ Delete failed - feature-02" in result.output
+        assert sorted(branch.name for branch in fake_repo.branches)[:2] == ["feature-02", "feature-06"]
+        assert len(fake_repo.branches) == 6
+
+    def test_apply_plan_without_repository_options(self, fake_repo, tmp_path):
+        plan_file = tmp_path / "plan.json"
+        DeletionPlan(NOW).save(str(plan_file), NOW)
+
+        result = CliRunner().invoke(main, ["--apply-plan", str(plan_file), "--repo-url", "https://github.com/owner/repo"])
+
+        assert result.exit_code == 1
+        assert "--apply-plan takes repositories from the plan" in result.output
+
+    def test_max_idle_days_required_without_plan(self):
+        result = CliRunner().invoke(main, ["--repo-url", "https://github.com/owner/repo"])
+
+        assert result.exit_code == 2
+        assert "Missing option '--max-idle-days'" in result.output
+
+
+if __name__ == "__main__":
+    pytest.main()
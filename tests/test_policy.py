@@ -0,0 +1,158 @@
+#!/usr/bin/env python
+
+"""
+Purpose: tests
+"""
+
+import pytest
+from click.testing import CliRunner
+from github import Auth, Github
+
+from delete_branches.cli import get_branches_to_delete, main
+from delete_branches.inventory import BranchInventory, BranchRecord
+from delete_branches.policy import (
+    BranchPolicy,
+    BranchTable,
+    iter_rows,
+    to_mask,
+)
+
+NOW = 100 * 86400.0
+
+
+@pytest.fixture
+def fake_repo(fake_github):
+    gh = Github(auth=Auth.Token("token"), base_url=fake_github.base_url, per_page=100, seconds_between_requests=0)
+    return gh.get_repo(fake_github.full_name)
+
+
+def select(expression, table):
+    policy = BranchPolicy(expression)
+    return [table.columns["name"][row] for row in iter_rows(policy.evaluate(policy.tree, table))]
+
+
+class TestBranchPolicy:
+    @pytest.fixture
+    def table(self):
+        return BranchTable(
+            {
+                "name": ["renovate/a", "feature/b", "feature/c", "fix-d"],
+                "idle_days": [10.0, 10.0, 45.0, 120.0],
+                "author": ["renovate-bot", "alice", None, "bob"],
+                "pull": ["closed", "none", "merged", "none"],
+                "behind": [3, 250, 40, None],
+            }
+        )
+
+    def test_masks(self):
+        assert to_mask([True, False, True]) == 0b101
+        assert to_mask([]) == 0
+        assert list(iter_rows(0b10110)) == [1, 2, 4]
+        assert list(iter_rows(0)) == []
+
+    def test_name_age_prefixes(self, table):
+        expression = 'matches(name, "renovate/*") and idle_days > 7 or idle_days > 30'
+
+        assert select(expression, table) == ["renovate/a", "feature/c", "fix-d"]
+
+    def test_author_lists_and_unknown_values(self, table):
+        """a branch whose author is unknown matches neither the allow nor the deny list"""
+        assert select('author in ["alice", "bob"]', table) == ["feature/b", "fix-d"]
+        assert select('author not in ["renovate-bot"]', table) == ["feature/b", "fix-d"]
+        assert select('not author in ["renovate-bot"]', table) == ["feature/b", "fix-d"]
+
+    def test_not_keeps_unknown_values_out(self, table):
+        """an unknown value is neither matched nor not matched, however deep the negation"""
+        assert select("not behind > 100", table) == ["renovate/a", "feature/c"]
+        assert select('not (behind > 100 or author == "alice")', table) == ["renovate/a"]
+        assert select("not not behind > 100", table) == ["feature/b"]
+        assert select('not (behind > 100 and author == "alice")', table) == ["renovate/a", "feature/c", "fix-d"]
+        assert select("not (behind < 0 or idle_days > 100)", table) == ["renovate/a", "feature/b", "feature/c"]
+
+    def test_pull_states_and_thresholds(self, table):
+        assert select('pull in ["closed", "merged"]', table) == ["renovate/a", "feature/c"]
+        assert select("100 <= behind", table) == ["feature/b"]
+        assert select("5 < behind <= 100 or True and False", table) == ["feature/c"]
+
+    def test_columns_used(self):
+        policy = BranchPolicy('idle_days > 30 and (behind > 10 or matches(author, "^dependabot"))')
+
+        assert policy.columns == {"idle_days", "behind", "author"}
+
+    @pytest.mark.parametrize(
+        "expression, message",
+        [
+            ("idle_days >", "invalid syntax"),
+            ("color == 'red'", "unknown column 'color'"),
+            ("pull == 'clsoed'", "pull is one of closed, merged, none, open"),
+            ("author > 3", "author is compared with strings"),
+            ("name in 'main'", "'in' takes a list"),
+            ("__import__('os')", "unsupported expression"),
+            ("idle_days > limit", "'limit' is not a constant"),
+        ],
+    )
+    def test_invalid_policy(self, expression, message):
+        with pytest.raises(ValueError, match=message):
+            BranchPolicy(expression)
+
+
+class TestPolicySelection:
+    def test_one_fetch_for_every_criterion(self, fake_github, fake_repo):
+        fake_github.add_branch("main")
+        fake_github.add_branch("abandoned", days_ago=40, author="alice", behind=300)
+        fake_github.add_branch("closed", days_ago=40, author="alice", behind=5)
+        fake_github.add_branch("bot", days_ago=40, author="release-bot", behind=300)
+        fake_github.add_branch("recent", days_ago=1, behind=300)
+        for i in range(60):
+            fake_github.add_branch(f"idle-{i:02}", days_ago=40, behind=1)
+        fake_github.close_pull("closed")
+        inventory = BranchInventory(
+            {
+                branch.name: BranchRecord(branch.name, False, branch.sha, branch.committed_date)
+                for branch in fake_github.branches
+            },
+            pulls=[],
+        )
+        policy = BranchPolicy('author != "release-bot" and (pull == "closed" or behind > 100)')
+
+        selected, not_exempt = get_branches_to_delete(
+            fake_repo, {"main"}, inventory.records["recent"].commit_date, inventory, policy=policy
+        )
+
+        assert [branch.name for branch in selected] == ["abandoned", "closed"]
+        assert not_exempt == 64
+        """attributes of the 63 idle branches come from 2 requests of 50 branches, whatever the number of criteria"""
+        assert fake_github.count("graphql:attributes") == 2
+        assert fake_github.count("graphql:compare") == 0
+
+
+class TestMainPolicy:
+    @pytest.fixture(autouse=True)
+    def fake_repo(self, fake_github, monkeypatch):
+        monkeypatch.setenv("GH_TOKEN", "token")
+        monkeypatch.setenv("GITHUB_API_URL", fake_github.base_url)
+        fake_github.add_branch("main")
+        fake_github.add_branch("renovate/lib", days_ago=10, author="renovate")
+        fake_github.add_branch("feature", days_ago=10)
+        fake_github.add_branch("old-feature", days_ago=60)
+        return fake_github
+
+    @pytest.mark.parametrize("stream", ["false", "true"])
+    def test_policy_narrows_selection(self, fake_github, stream):
+        args = ["--repo-url", "https://github.com/owner/repo", "--max-idle-days", "7", "--dry-run", "false"]
+        policy = 'matches(name, "renovate/*") or idle_days > 30'
+        result = CliRunner().invoke(main, args + ["--policy", policy, "--stream", stream])
+
+        assert result.exit_code == 0, result.output
+        assert sorted(branch.name for branch in fake_github.branches) == ["feature", "main"]
+
+    def test_invalid_policy(self):
+        args = ["--repo-url", "https://github.com/owner/repo", "--max-idle-days", "7"]
+        result = CliRunner().invoke(main, args + ["--policy", "idle_days >> 3"])
+
+        assert result.exit_code == 1
+        assert "invalid policy 'idle_days >> 3'" in result.output
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,94 @@
+#!/usr/bin/env python
+
+"""
+Purpose: tests
+"""
+
+from unittest.mock import Mock
+
+import pytest
+from click.testing import CliRunner
+from github import Auth, Github, GithubException
+
+from delete_branches.cli import main
+from delete_branches.inventory import BranchRecord
+from delete_branches.protection import (
+    ProtectionRules,
+    get_protection_rules,
+    ruleset_branch_patterns,
+)
+
+
+class TestProtectionRules:
+    def test_ruleset_branch_patterns(self):
+        ref_names = ["~DEFAULT_BRANCH", "refs/heads/release/**", "~ALL"]
+
+        assert ruleset_branch_patterns(ref_names, "main") == ["main", "release/*", "*"]
+
+    def test_patterns_and_rulesets(self):
+        protection = ProtectionRules(["main", "hotfix-*"], [(["release/*"], ["release/old-*"])])
+        names = {"main", "hotfix-1", "release/1.0", "release/old-1", "feature"}
+
+        assert protection.filter(names) == {"main", "hotfix-1", "release/1.0"}
+        assert "release/old-1" not in protection
+        assert "release/1.0" in protection
+
+    def test_mark(self):
+        records = [BranchRecord("release/1.0", False, "a"), BranchRecord("feature", False, "b")]
+
+        ProtectionRules(rulesets=[(["release/*"], [])]).mark(records)
+
+        assert [record.protected for record in records] == [True, False]
+
+    def test_not_readable(self, capsys):
+        repo = Mock()
+        repo.full_name = "owner/repo"
+        repo.requester.graphql_query.side_effect = GithubException(403, {"message": "Resource not accessible"})
+
+        assert get_protection_rules(repo) is None
+        assert "Protection Rules         : not readable (403)" in capsys.readouterr().out
+
+
+class TestFetchProtectionRules:
+    def test_fetch_once(self, fake_github):
+        fake_github.primary.protection_patterns.append("release/*")
+        fake_github.primary.add_ruleset(["~DEFAULT_BRANCH", "refs/heads/keep/**"], ["refs/heads/keep/tmp-*"])
+        fake_github.primary.add_ruleset(["~ALL"], rules=("pull_request",))
+        fake_github.primary.add_ruleset(["~ALL"], active=False)
+
+        gh = Github(auth=Auth.Token("token"), base_url=fake_github.base_url, seconds_between_requests=0)
+        protection = get_protection_rules(gh.get_repo(fake_github.full_name))
+
+        assert protection is not None
+        assert protection.filter({"main", "release/1", "keep/a", "keep/tmp-1", "feature"}) == {"main", "release/1", "keep/a"}
+        assert fake_github.count("graphql:protection") == 1
+        assert fake_github.count("rest:rulesets") == 1
+        # rules are only listed per ruleset; the disabled ruleset is skipped
+        assert fake_github.count("rest:ruleset") == 2
+
+
+class TestMainProtection:
+    @pytest.fixture
+    def fake_repo(self, fake_github, monkeypatch):
+        monkeypatch.setenv("GH_TOKEN", "token")
+        monkeypatch.setenv("GITHUB_API_URL", fake_github.base_url)
+        fake_github.add_branch("main")
+        for name in ("keep/a", "keep/b", "feature-1", "feature-2"):
+            fake_github.add_branch(name, days_ago=30)
+        fake_github.primary.add_ruleset(["refs/heads/keep/**"])
+        return fake_github
+
+    @pytest.mark.parametrize("api,stream", [("rest", "false"), ("graphql", "true"), ("ls-remote", "false")])
+    def test_ruleset_branches_exempt(self, fake_repo, api, stream):
+        args = ["--repo-url", "https://github.com/owner/repo", "--max-idle-days", "7", "--dry-run", "false"]
+
+        runner = CliRunner()
+        result = runner.invoke(main, args + ["--api", api, "--stream", stream])
+
+        assert result.exit_code == 0
+        assert "Protected Branch         : keep/a" in result.output
+        assert [branch.name for branch in fake_repo.branches] == ["main", "keep/a", "keep/b"]
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,88 @@
+#!/usr/bin/env python
+
+"""
+Purpose: tests
+"""
+
+import pytest
+from click.testing import CliRunner
+
+from delete_branches.cli import main
+from delete_branches.rules import BranchMatcher, BranchRules
+
+BRANCHES = {"main", "release/1.0", "release", "renovate/click-8.x", "feature-wip", "feature/a", "hotfix-1"}
+
+
+class TestBranchMatcher:
+    def test_exact_names(self):
+        matcher = BranchMatcher(["feature/a", "missing"])
+
+        assert matcher.filter(BRANCHES) == {"feature/a"}
+        assert "feature/ab" not in matcher
+
+    def test_trailing_glob_uses_prefix_trie(self):
+        matcher = BranchMatcher(["release/*", "feature*"])
+
+        assert matcher.regex is None
+        assert matcher.filter(BRANCHES) == {"release/1.0", "feature-wip", "feature/a"}
+
+    def test_globs_and_regexes_share_one_regex(self):
+        matcher = BranchMatcher(["*-wip", "hotfix-?", "^renovate/.*"])
+
+        assert matcher.regex is not None
+        assert matcher.filter(BRANCHES) == {"feature-wip", "hotfix-1", "renovate/click-8.x"}
+
+    def test_star_matches_all(self):
+        assert BranchMatcher(["*"]).filter(BRANCHES) == BRANCHES
+
+    def test_empty(self):
+        matcher = BranchMatcher(["", ""])
+
+        assert not matcher
+        assert matcher.filter(BRANCHES) == set()
+
+    def test_invalid_regex(self):
+        with pytest.raises(ValueError, match="invalid branch pattern"):
+            BranchMatcher(["^release/(.*"])
+
+
+class TestBranchRules:
+    def test_exclude_and_include(self):
+        rules = BranchRules(exclude=["feature/a"], include=["feature*"])
+
+        assert rules.exempt("feature/a")
+        assert not rules.exempt("feature-wip")
+        assert rules.exempt("hotfix-1")
+        assert rules.not_included(BRANCHES) == BRANCHES - {"feature-wip", "feature/a"}
+
+    def test_no_include_allows_all(self):
+        rules = BranchRules(exclude=["release/*"])
+
+        assert not rules.exempt("hotfix-1")
+        assert rules.not_included(BRANCHES) == set()
+
+
+class TestMainRules:
+    @pytest.fixture
+    def fake_repo(self, fake_github, monkeypatch):
+        monkeypatch.setenv("GH_TOKEN", "token")
+        monkeypatch.setenv("GITHUB_API_URL", fake_github.base_url)
+        fake_github.add_branch("main")
+        for name in sorted(BRANCHES - {"main"}):
+            fake_github.add_branch(name, days_ago=30)
+        return fake_github
+
+    @pytest.mark.parametrize("stream", ["false", "true"])
+    def test_exclude_and_include_patterns(self, fake_repo, stream):
+        args = ["--repo-url", "https://github.com/owner/repo", "--max-idle-days", "7", "--dry-run", "false"]
+        args += ["--exclude-branches", "release/*, ^renovate/.*", "--include-branches", "release*, renovate/*, feature*"]
+
+        runner = CliRunner()
+        result = runner.invoke(main, args + ["--stream", stream])
+
+        assert result.exit_code == 0
+        assert {branch.name for branch in fake_repo.branches} == {"main", "release/1.0", "renovate/click-8.x", "hotfix-1"}
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,188 @@
+#!/usr/bin/env python
+
+"""
+Purpose: tests
+"""
+
+import json
+
+import pytest
+import requests
+
+from delete_branches.scheduler import RateLimitScheduler
+
+
+def make_response(status=200, headers=None, text="{}"):
+    response = requests.Response()
+    response.status_code = status
+    response.headers.update(headers or {})
+    response._content = text.encode()
+    response.url = "https://api.github.com/repos/owner/repo/branches"
+    return response
+
+
+@pytest.fixture
+def fake_time():
+    class FakeTime:
+        now = 1_000_000.0
+        slept = []
+
+        def clock(self):
+            return self.now
+
+        def sleep(self, seconds):
+            self.slept.append(seconds)
+            self.now += seconds
+
+    return FakeTime()
+
+
+@pytest.fixture
+def scheduler(fake_time):
+    return RateLimitScheduler(sleep=fake_time.sleep, clock=fake_time.clock)
+
+
+URL = "https://api.github.com/repos/owner/repo/branches"
+
+
+class TestRetry:
+    def test_retry_after(self, scheduler, fake_time):
+        responses = iter([make_response(403, {"Retry-After": "30"}), make_response(200)])
+
+        with scheduler.phase("selection") as usage:
+            response = scheduler.send("GET", URL, lambda: next(responses))
+
+        assert response.status_code == 200
+        assert fake_time.slept == [30.0]
+        assert usage.requests == 2
+        assert usage.retries == 1
+
+    def test_primary_rate_limit_exhausted(self, scheduler, fake_time):
+        reset = fake_time.now + 120
+        exhausted = {"X-RateLimit-Remaining": "0", "X-RateLimit-Reset": str(reset)}
+        responses = iter([make_response(403, exhausted), make_response(200)])
+
+        scheduler.send("GET", URL, lambda: next(responses))
+
+        assert fake_time.slept == [121.0]
+
+    def test_secondary_rate_limit_backoff(self, scheduler, fake_time):
+        message = '{"message": "You have exceeded a secondary rate limit"}'
+        responses = iter([make_response(403, text=message), make_response(204)])
+
+        assert scheduler.send("DELETE", URL, lambda: next(responses)).status_code == 204
+        assert fake_time.slept[0] >= 60
+
+    def test_server_error_jittered_backoff(self, scheduler, fake_time):
+        responses = iter([make_response(502), make_response(502), make_response(200)])
+
+        assert scheduler.send("GET", URL, lambda: next(responses)).status_code == 200
+        assert len(fake_time.slept) == 2
+        assert fake_time.slept[0] <= 1 and fake_time.slept[1] <= 2
+
+    def test_give_up_after_max_retries(self, fake_time):
+        scheduler = RateLimitScheduler(max_retries=2, sleep=fake_time.sleep, clock=fake_time.clock)
+        calls = []
+
+        def request():
+            calls.append(1)
+            return make_response(503)
+
+        assert scheduler.send("GET", URL, request).status_code == 503
+        assert len(calls) == 3
+
+    def test_connection_error_retried(self, scheduler):
+        responses = iter([requests.ConnectionError(), make_response(200)])
+
+        def request():
+            response = next(responses)
+            if isinstance(response, Exception):
+                raise response
+            return response
+
+        assert scheduler.send("GET", URL, request).status_code == 200
+
+    def test_not_found_not_retried(self, scheduler, fake_time):
+        assert scheduler.send("GET", URL, lambda: make_response(404)).status_code == 404
+        assert fake_time.slept == []
+
+
+class TestPacing:
+    def test_reserve_waits_for_reset(self, fake_time):
+        scheduler = RateLimitScheduler(reserve=10, sleep=fake_time.sleep, clock=fake_time.clock)
+        headers = {
+            "X-RateLimit-Remaining": "10",
+            "X-RateLimit-Reset": str(fake_time.now + 60),
+            "X-RateLimit-Resource": "core",
+        }
+
+        scheduler.send("GET", URL, lambda: make_response(200, headers))
+        scheduler.send("GET", URL, lambda: make_response(200))
+
+        assert fake_time.slept == [61.0]
+
+    def test_points_budget_paces_writes(self, fake_time):
+        scheduler = RateLimitScheduler(points_per_minute=60, sleep=fake_time.sleep, clock=fake_time.clock)
+
+        for _ in range(14):
+            scheduler.send("DELETE", URL, lambda: make_response(204))
+
+        # 60 points burst = 12 deletes, then one delete (5 points) every 5 seconds
+        assert len(fake_time.slept) == 2
+        assert sum(fake_time.slept) == pytest.approx(10.0)
+
+    def test_graphql_costs_one_point(self):
+        assert RateLimitScheduler.points("POST", "https://api.github.com/graphql") == 1
+        assert RateLimitScheduler.points("DELETE", URL) == 5
+
+    def test_graphql_mutation_costs_a_write(self, fake_time):
+        scheduler = RateLimitScheduler(points_per_minute=60, sleep=fake_time.sleep, clock=fake_time.clock)
+        graphql = "https://api.github.com/graphql"
+        query = json.dumps({"query": "query { viewer { login } }", "variables": {}})
+        mutation = json.dumps({"query": "mutation($repo: ID!) { m0: updateRefs(input: {}) { clientMutationId } }"})
+
+        assert RateLimitScheduler.points("POST", graphql, query) == 1
+        assert RateLimitScheduler.points("POST", graphql, mutation.encode()) == 5
+        with scheduler.phase("deletion") as usage:
+            for _ in range(14):
+                scheduler.send("POST", graphql, lambda: make_response(200), mutation)
+
+        # batched delete mutations are paced like REST deletes: 12 in the burst, then one every 5 seconds
+        assert usage.points == 70
+        assert sum(fake_time.slept) == pytest.approx(10.0)
+
+
+class TestPhaseUsage:
+    def test_usage_per_phase(self, scheduler, capsys):
+        headers = {"X-RateLimit-Remaining": "4990", "X-RateLimit-Reset": "0", "X-RateLimit-Resource": "core"}
+        with scheduler.phase("inventory"):
+            scheduler.send("GET", URL, lambda: make_response(200, headers))
+            scheduler.send("GET", URL, lambda: make_response(304, headers))
+        with scheduler.phase("deletion"):
+            scheduler.send("DELETE", URL, lambda: make_response(204, headers))
+
+        assert scheduler.phases["inventory"].requests == 2
+        assert scheduler.phases["inventory"].used == 1
+        assert scheduler.phases["deletion"].points == 5
+
+        scheduler.print_summary()
+        captured = capsys.readouterr()
+        assert "API Budget by Phase" in captured.out
+        assert "Rate Limit Remaining (core): 4990" in captured.out
+
+    def test_merge_usage_of_another_process(self, scheduler):
+        other = RateLimitScheduler()
+        with other.phase("inventory"):
+            other.send("GET", URL, lambda: make_response(200, {"X-RateLimit-Remaining": "4000"}))
+        with scheduler.phase("inventory"):
+            scheduler.send("GET", URL, lambda: make_response(200, {"X-RateLimit-Remaining": "4500"}))
+
+        scheduler.merge(other.phases, other.remaining, other.reset)
+
+        assert scheduler.phases["inventory"].requests == 2
+        assert len(scheduler.phases["inventory"].latencies) == 2
+        assert scheduler.remaining == {"core": 4000}
+
+
+if __name__ == "__main__":
+    pytest.main()
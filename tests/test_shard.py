@@ -0,0 +1,114 @@
+#!/usr/bin/env python
+
+"""
+Purpose: tests
+"""
+
+import json
+import os
+import sqlite3
+from datetime import datetime, timezone
+
+import pytest
+from click.testing import CliRunner
+
+from delete_branches.cache import CACHE_FILE
+from delete_branches.cli import RunOptions, main
+from delete_branches.shard import partition, shard_config, token_slices
+from delete_branches.token_pool import PoolToken, TokenPool
+
+
+class TestShardConfig:
+    def test_partition_round_robin(self):
+        assert partition(5, 2) == [[0, 2, 4], [1, 3]]
+        assert partition(2, 4) == [[0], [1]]
+        assert partition(0, 4) == []
+
+    def test_budget_and_concurrency_split(self):
+        options = RunOptions(True, 7, datetime.now(timezone.utc), set(), concurrency=8)
+
+        config = shard_config(options, 4, 900, 100, 6, state_file="state.json", plan=True)
+
+        assert config.points_per_minute == 225
+        assert config.reserve == 100
+        assert config.repo_concurrency == 2
+        assert config.pool_size == 16
+        assert config.options.cache is None and config.state_file == "state.json" and config.plan
+
+    def test_token_slices(self):
+        pool = TokenPool([PoolToken(label, f"token-{label}") for label in "abc"])
+        pool.tokens[0].usage.remaining["core"] = 10
+
+        assert [sorted(tokens) for tokens in token_slices(pool, 2)] == [["a", "c"], ["b"]]
+        assert [sorted(tokens) for tokens in token_slices(pool, 4)] == [["a"], ["b"], ["c"], ["a"]]
+        assert token_slices(pool, 2)[0]["a"].remaining == {"core": 10}
+        assert token_slices(None, 2) == [None, None]
+
+
+class TestMainProcesses:
+    @pytest.fixture
+    def fake_org(self, fake_github, monkeypatch):
+        monkeypatch.setenv("GH_TOKEN", "token")
+        monkeypatch.setenv("GITHUB_API_URL", fake_github.base_url)
+        for name in ["alpha", "beta", "gamma", "delta", "epsilon"]:
+            repo = fake_github.add_repo("acme", name)
+            repo.add_branch("main")
+            repo.add_branch(f"{name}-idle", days_ago=30)
+            repo.add_branch(f"{name}-active", days_ago=1)
+        return fake_github
+
+    def test_sharded_sweep_matches_single_process(self, fake_org, tmp_path):
+        runner = CliRunner()
+        args = ["--org", "acme", "--max-idle-days", "7"]
+
+        single = runner.invoke(main, args)
+        sharded = runner.invoke(main, args + ["--processes", "2", "--plan-out", str(tmp_path / "plan.json")])
+
+        assert single.exit_code == 0
+        assert sharded.exit_code == 0, sharded.output
+        """repository blocks and the summary table come out in the same order with the same counts"""
+        single_blocks = single.output.split("Repository               : ")[1:]
+        sharded_blocks = sharded.output.split("Repository               : ")[1:]
+        assert [block.split("\n", 1)[0] for block in sharded_blocks] == [block.split("\n", 1)[0] for block in single_blocks]
+        assert single.output.split("Total (5 repositories)")[1].split("\n")[0] in sharded.output
+        assert "Total (5 repositories)" in sharded.output
+        """API usage and plans of the workers are merged into the parent"""
+        assert "inventory" in sharded.output.split("API Budget by Phase")[1]
+        plan = json.loads((tmp_path / "plan.json").read_text())
+        assert sorted(plan["repositories"]) == [f"acme/{name}" for name in ["alpha", "beta", "delta", "epsilon", "gamma"]]
+        assert plan["repositories"]["acme/beta"][0]["branch"] == "beta-idle"
+
+    def test_workers_share_token_pool_and_cache(self, fake_org, tmp_path, monkeypatch):
+        monkeypatch.setenv("GH_TOKENS", "token-one,token-two")
+        cache_dir = str(tmp_path / "cache")
+        args = ["--org", "acme", "--max-idle-days", "7", "--processes", "2", "--cache-dir", cache_dir]
+        runner = CliRunner()
+
+        first = runner.invoke(main, args + ["--metrics-file", str(tmp_path / "metrics.json")])
+
+        assert first.exit_code == 0, first.output
+        """the parent primes the pool once; each worker uses its slice of it with the primed budget"""
+        assert fake_org.count("rest:rate_limit") == 3
+        tokens = json.loads((tmp_path / "metrics.json").read_text())["tokens"]
+        assert all(token["requests"] > 0 for token in tokens.values())
+
+        """both workers wrote to one cache, read back by the second run"""
+        second = runner.invoke(main, args)
+
+        assert second.exit_code == 0, second.output
+        assert fake_org.count("rest:not_modified") > 0
+        with sqlite3.connect(os.path.join(cache_dir, CACHE_FILE)) as db:
+            assert db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+    def test_processes_with_apply_plan(self, fake_org, tmp_path):
+        plan_file = tmp_path / "plan.json"
+        plan_file.write_text(json.dumps({"version": 1, "branch_max_idle": None, "repositories": {}}))
+
+        result = CliRunner().invoke(main, ["--apply-plan", str(plan_file), "--processes", "2"])
+
+        assert result.exit_code == 1
+        assert "--processes shards --repo-url, --repo-list and --org sweeps" in result.output
+
+
+if __name__ == "__main__":
+    pytest.main()
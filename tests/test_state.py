@@ -0,0 +1,108 @@
+#!/usr/bin/env python
+
+"""
+Purpose: tests
+"""
+
+import json
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from click.testing import CliRunner
+
+from delete_branches.cli import main
+from delete_branches.inventory import BranchRecord
+from delete_branches.state import RepoState, RunState
+
+NOW = datetime(2026, 1, 10, tzinfo=timezone.utc)
+
+
+class TestRepoState:
+    def test_fill_commit_dates_of_unchanged_heads(self):
+        state = RepoState(previous={"a": ("sha-a", NOW), "b": ("sha-b", NOW)})
+        branches = [BranchRecord("a", False, "sha-a"), BranchRecord("b", False, "sha-b2"), BranchRecord("c", False, "sha-c")]
+
+        changed = state.fill_commit_dates(branches)
+
+        assert [branch.name for branch in changed] == ["b", "c"]
+        assert branches[0].commit_date == NOW
+        assert branches[1].commit_date is None
+
+    def test_crossed_idle_threshold(self):
+        state = RepoState(
+            last_run=NOW - timedelta(days=1),
+            branch_max_idle=NOW - timedelta(days=8),
+            previous={"crossed": ("1", NOW - timedelta(days=7, hours=12)), "idle": ("2", NOW - timedelta(days=30))},
+        )
+        branches = [
+            BranchRecord("crossed", False, "1", NOW - timedelta(days=7, hours=12)),
+            BranchRecord("idle", False, "2", NOW - timedelta(days=30)),
+        ]
+
+        assert [branch.name for branch in state.crossed(branches, NOW - timedelta(days=7))] == ["crossed"]
+        assert RepoState().crossed(branches, NOW) == []
+
+    def test_record_known_dates_only(self):
+        state = RepoState()
+
+        state.record([BranchRecord("a", False, "sha-a", NOW), BranchRecord("b", False, "sha-b")])
+
+        assert state.current == {"a": ("sha-a", NOW)}
+
+
+class TestRunState:
+    def test_save_and_load(self, tmp_path):
+        path = str(tmp_path / "state.json")
+        run_state = RunState(path)
+        run_state.repo("owner/repo").record([BranchRecord("a", False, "sha-a", NOW)])
+        run_state.repo("owner/empty")
+        run_state.save(NOW, NOW - timedelta(days=7))
+
+        loaded = RunState(path).repo("owner/repo")
+
+        assert loaded.last_run == NOW
+        assert loaded.branch_max_idle == NOW - timedelta(days=7)
+        assert loaded.previous == {"a": ("sha-a", NOW)}
+        assert list(json.loads((tmp_path / "state.json").read_text())["repositories"]) == ["owner/repo"]
+
+    def test_other_version_ignored(self, tmp_path):
+        (tmp_path / "state.json").write_text(json.dumps({"version": 0, "repositories": {"owner/repo": {}}}))
+
+        assert RunState(str(tmp_path / "state.json")).repo("owner/repo").last_run is None
+
+
+class TestMainState:
+    @pytest.fixture
+    def fake_repo(self, fake_github, monkeypatch):
+        monkeypatch.setenv("GH_TOKEN", "token")
+        monkeypatch.setenv("GITHUB_API_URL", fake_github.base_url)
+        fake_github.add_branch("main")
+        for i in range(20):
+            fake_github.add_branch(f"feature-{i:02}", days_ago=30 if i < 5 else 1)
+        return fake_github
+
+    @pytest.mark.parametrize("stream", ["false", "true"])
+    def test_second_run_resolves_changed_branches_only(self, fake_repo, tmp_path, stream):
+        args = ["--repo-url", "https://github.com/owner/repo", "--max-idle-days", "7", "--dry-run", "false"]
+        args += ["--state-file", str(tmp_path / "state.json"), "--stream", stream]
+        runner = CliRunner()
+
+        result = runner.invoke(main, args)
+        assert result.exit_code == 0
+        assert fake_repo.count("rest:commit") == 20
+
+        fake_repo.remove_branch("feature-10")
+        fake_repo.add_branch("feature-10", days_ago=30)
+        fake_repo.add_branch("feature-new", days_ago=30)
+        result = runner.invoke(main, args)
+
+        assert result.exit_code == 0
+        assert fake_repo.count("rest:commit") == 22
+        assert fake_repo.get_branch("feature-10") is None
+        assert fake_repo.get_branch("feature-new") is None
+        if stream == "false":
+            assert "Total Number of Branches (Changed-Since-Last-Run): 2" in result.output
+
+
+if __name__ == "__main__":
+    pytest.main()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python
+
+"""
+Purpose: tests
+"""
+
+import time
+
+import pytest
+from click.testing import CliRunner
+
+from delete_branches.cli import main
+from delete_branches.sweep import (
+    RepoResult,
+    print_summary_table,
+    read_repo_list,
+    sweep,
+)
+
+
+class TestSweep:
+    def test_output_grouped_in_target_order(self, capsys):
+        def process(target):
+            for step in range(3):
+                print(f"{target} step {step}")
+                time.sleep(0.01 if target == "repo-a" else 0.001)
+            return RepoResult(repo=target, total=3)
+
+        results = sweep(["repo-a", "repo-b", "repo-c"], process, repo_concurrency=3)
+        captured = capsys.readouterr()
+
+        assert [result.repo for result in results] == ["repo-a", "repo-b", "repo-c"]
+        assert captured.out.splitlines() == [
+            f"{repo} step {step}" for repo in ["repo-a", "repo-b", "repo-c"] for step in range(3)
+        ]
+
+    def test_sequential_prints_live(self, capsys):
+        results = sweep(["repo-a"], lambda target: print(target) or RepoResult(repo=target), repo_concurrency=4)
+
+        assert len(results) == 1
+        assert capsys.readouterr().out == "repo-a\n"
+
+    def test_read_repo_list(self, tmp_path):
+        repo_list = tmp_path / "repos.txt"
+        repo_list.write_text("# repositories\nhttps://github.com/owner/a\n\nhttps://github.com/owner/b  # team b\n")
+
+        assert read_repo_list(str(repo_list)) == ["https://github.com/owner/a", "https://github.com/owner/b"]
+
+    def test_print_summary_table(self, capsys):
+        print_summary_table(
+            [
+                RepoResult(repo="owner/a", total=10, exempt=2, not_exempt=8, idle=3, deleted=3),
+                RepoResult(repo="owner/b", total=5, exempt=1, not_exempt=4, idle=1, deleted=1),
+                RepoResult(repo="https://github.com/owner/c", error="repository not found"),
+            ]
+        )
+        captured = capsys.readouterr()
+
+        assert "owner/a" in captured.out
+        assert "Error: repository not found" in captured.out
+        total = captured.out.splitlines()[-1]
+        assert total.startswith("Total (3 repositories)")
+        assert total.split("|")[1].strip() == "15"
+        assert total.split("|")[5].strip() == "4"
+        assert total.endswith("1 failed")
+
+
+class TestMainSweep:
+    @pytest.fixture
+    def fake_org(self, fake_github, monkeypatch):
+        monkeypatch.setenv("GH_TOKEN", "token")
+        monkeypatch.setenv("GITHUB_API_URL", fake_github.base_url)
+        for name in ["alpha", "beta", "gamma"]:
+            repo = fake_github.add_repo("acme", name)
+            repo.add_branch("main")
+            repo.add_branch(f"{name}-idle", days_ago=30)
+            repo.add_branch(f"{name}-active", days_ago=1)
+        fake_github.add_repo("acme", "archived", archived=True).add_branch("old", days_ago=300)
+        return fake_github
+
+    def test_org(self, fake_org):
+        runner = CliRunner()
+        result = runner.invoke(main, ["--org", "acme", "--max-idle-days", "7", "--dry-run", "false"])
+
+        assert result.exit_code == 0
+        assert "Total (3 repositories)" in result.output
+        assert "acme/archived" not in result.output
+        assert [branch.name for branch in fake_org.repos["acme/beta"].branches] == ["main", "beta-active"]
+        assert [branch.name for branch in fake_org.repos["acme/archived"].branches] == ["old"]
+
+        # each repository prints one contiguous block
+        blocks = result.output.split("Repository               : ")[1:]
+        assert [block.split("\n", 1)[0] for block in blocks] == ["acme/alpha", "acme/beta", "acme/gamma"]
+        assert "alpha-idle" in blocks[0] and "beta-idle" not in blocks[0]
+
+    def test_multiple_repo_urls_and_list(self, fake_org, tmp_path):
+        repo_list = tmp_path / "repos.txt"
+        repo_list.write_text("https://github.com/acme/gamma\nhttps://github.com/acme/missing\n")
+
+        runner = CliRunner()
+        result = runner.invoke(
+            main,
+            [
+                "--repo-url",
+                "https://github.com/acme/alpha",
+                "--repo-url",
+                "https://github.com/acme/beta",
+                "--repo-list",
+                str(repo_list),
+                "--max-idle-days",
+                "7",
+            ],
+        )
+
+        # a missing repository is reported in the table and fails the run
+        assert result.exit_code == 1
+        assert "Total (4 repositories)" in result.output
+        assert "https://github.com/acme/missing" in result.output
+        assert "1 failed" in result.output
+
+    def test_no_repository(self, fake_org):
+        runner = CliRunner()
+        result = runner.invoke(main, ["--max-idle-days", "7"])
+
+        assert result.exit_code == 1
+        assert "one of --repo-url, --repo-list or --org is required" in result.output
+
+
+if __name__ == "__main__":
+    pytest.main()
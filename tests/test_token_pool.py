@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+
+"""
+Purpose: tests
+"""
+
+import json
+from datetime import datetime, timedelta, timezone
+from types import SimpleNamespace
+
+import pytest
+from click.testing import CliRunner
+from github import Github
+
+from delete_branches import transport
+from delete_branches.cli import main
+from delete_branches.scheduler import RateLimitScheduler
+from delete_branches.token_pool import (
+    DEFAULT_LIMIT,
+    PooledAuth,
+    PoolToken,
+    TokenPool,
+    TokenUsage,
+    load_token_pool,
+)
+
+
+class FakeIntegration:
+    """issues installation tokens expiring `lifetime` after now"""
+
+    def __init__(self, lifetime: timedelta):
+        self.lifetime = lifetime
+        self.issued = 0
+
+    def get_access_token(self, installation_id):
+        self.issued += 1
+        expires_at = datetime.now(timezone.utc) + self.lifetime
+        return SimpleNamespace(token=f"ghs_{installation_id}_{self.issued}", expires_at=expires_at)
+
+
+def rate_headers(remaining, reset, resource="core"):
+    return {"X-RateLimit-Remaining": str(remaining), "X-RateLimit-Reset": str(reset), "X-RateLimit-Resource": resource}
+
+
+class TestTokenPool:
+    def test_routes_to_token_with_most_budget(self):
+        pool = TokenPool([PoolToken("a", "token-a"), PoolToken("b", "token-b")], clock=lambda: 1000.0)
+        a, b = pool.tokens
+
+        pool.observe(f"token {pool.authorization(a)}", rate_headers(100, 2000))
+        assert pool.acquire() is b
+        pool.observe(f"token {pool.authorization(b)}", rate_headers(50, 2000))
+        assert pool.acquire() is a
+        """the scarcest resource ranks a token"""
+        pool.observe("token token-a", rate_headers(10, 2000, "graphql"))
+        assert pool.acquire() is b
+        assert a.usage.requests == 2 and b.usage.requests == 1
+
+    def test_budget_restored_after_reset(self):
+        now = [1000.0]
+        pool = TokenPool([PoolToken("a", "token-a"), PoolToken("b", "token-b")], clock=lambda: now[0])
+        pool.authorization(pool.tokens[0])
+        pool.observe("token token-a", rate_headers(0, 1500))
+        assert pool.acquire().label == "b"
+
+        now[0] = 1600.0
+        assert pool.tokens[0].remaining("core", now[0]) == DEFAULT_LIMIT
+        pool.observe("token token-a", {**rate_headers(0, 1500), "X-RateLimit-Limit": "15000"})
+        assert pool.tokens[0].remaining("core", now[0]) == 15000
+
+    def test_unknown_authorization_not_accounted(self):
+        pool = TokenPool([PoolToken("a", "token-a")])
+
+        pool.observe("Bearer app-jwt", rate_headers(10, 2000))
+        pool.observe(None, rate_headers(10, 2000))
+
+        assert pool.tokens[0].usage == TokenUsage()
+
+    def test_installation_token_refreshed_before_expiry(self):
+        integration = FakeIntegration(timedelta(hours=1))
+        token = PoolToken("installation 7", integration=integration, installation_id=7)
+
+        assert token.value == "ghs_7_1"
+        assert token.value == "ghs_7_1"
+        """a token expiring inside the refresh margin is replaced"""
+        integration.lifetime = timedelta(minutes=1)
+        token.expires_at = datetime.now(timezone.utc) + timedelta(minutes=4)
+        assert token.value == "ghs_7_2"
+        assert token.value == "ghs_7_3"
+        assert token.refreshes == 3
+
+    def test_accounting_follows_refreshed_token(self):
+        integration = FakeIntegration(timedelta(minutes=1))
+        pool = TokenPool([PoolToken("installation 7", integration=integration, installation_id=7)])
+        token = pool.tokens[0]
+
+        first = pool.authorization(token)
+        second = pool.authorization(token)
+        pool.observe(f"token {first}", rate_headers(99, 2000))
+        pool.observe(f"token {second}", rate_headers(98, 2000))
+
+        assert first != second
+        assert token.usage.requests == 2 and token.usage.remaining == {"core": 98}
+
+    def test_route_picks_token_per_attempt(self):
+        pool = TokenPool([PoolToken("a", "token-a"), PoolToken("b", "token-b")], clock=lambda: 1000.0)
+        headers = {"Authorization": f"token {pool.authorization(pool.tokens[0])}", "Accept": "application/json"}
+        url = "https://api.github.com/repos/owner/repo/branches"
+
+        assert pool.route(headers, url)["Authorization"] == "token token-a"
+        pool.observe("token token-a", rate_headers(0, 2000))
+        assert pool.route(headers, url) == {"Authorization": "token token-b", "Accept": "application/json"}
+        """graphql budget is separate; rate-limit reads and headers of other tokens are left alone"""
+        pool.observe("token token-b", rate_headers(100, 2000, "graphql"))
+        assert pool.route(headers, "https://api.github.com/graphql")["Authorization"] == "token token-a"
+        assert pool.route(headers, "https://api.github.com/rate_limit") is headers
+        assert pool.route({"Authorization": "Bearer app-jwt"}, url) == {"Authorization": "Bearer app-jwt"}
+
+    def test_scheduler_waits_only_for_exhausted_pool(self):
+        now = [1000.0]
+        slept = []
+        pool = TokenPool([PoolToken("a", "token-a"), PoolToken("b", "token-b")], clock=lambda: now[0])
+        scheduler = RateLimitScheduler(sleep=slept.append, clock=lambda: now[0])
+        scheduler.pool = pool
+        url = "https://api.github.com/repos/owner/repo/branches"
+        for token in pool.tokens:
+            pool.authorization(token)
+
+        pool.observe("token token-a", rate_headers(0, 1500))
+        scheduler.acquire("GET", url, scheduler.usage())
+        assert slept == []
+
+        pool.observe("token token-b", rate_headers(0, 1200))
+        scheduler.acquire("GET", url, scheduler.usage())
+        assert slept == [201.0]
+
+    def test_merge_worker_usage(self):
+        pool = TokenPool([PoolToken("a", "token-a"), PoolToken("b", "token-b")])
+        pool.tokens[0].usage = TokenUsage(3, {"core": 100}, {"core": 90}, {"core": 2000.0})
+
+        pool.merge({"a": TokenUsage(2, {"core": 100}, {"core": 80, "graphql": 40}, {"core": 2100.0}), "c": TokenUsage(5)})
+
+        assert pool.tokens[0].usage == TokenUsage(5, {"core": 100}, {"core": 80, "graphql": 40}, {"core": 2100.0})
+        assert pool.tokens[1].usage == TokenUsage()
+
+
+class TestLoadTokenPool:
+    def test_single_token_keeps_plain_auth(self):
+        assert load_token_pool({"GH_TOKEN": "token"}, "https://api.github.com") is None
+
+    def test_tokens_from_environment(self):
+        pool = load_token_pool({"GH_TOKEN": "token", "GH_TOKENS": "one, two,"}, "https://api.github.com")
+
+        assert [token.label for token in pool.tokens] == ["GH_TOKEN", "GH_TOKENS[0]", "GH_TOKENS[1]"]
+        assert [token.value for token in pool.tokens] == ["token", "one", "two"]
+
+    def test_installations_require_app_id(self):
+        with pytest.raises(KeyError, match="GH_APP_ID"):
+            load_token_pool({"GH_APP_INSTALLATION_IDS": "7"}, "https://api.github.com")
+
+    def test_no_token(self):
+        with pytest.raises(KeyError, match="GH_TOKEN"):
+            load_token_pool({}, "https://api.github.com")
+
+
+class TestMainTokenPool:
+    def test_requests_spread_across_tokens(self, fake_github, monkeypatch, tmp_path):
+        monkeypatch.setenv("GH_TOKEN", "token-zero")
+        monkeypatch.setenv("GH_TOKENS", "token-one,token-two")
+        monkeypatch.setenv("GITHUB_API_URL", fake_github.base_url)
+        fake_github.rate_limit = 1000
+        fake_github.add_branch("main")
+        for i in range(6):
+            fake_github.add_branch(f"idle-{i}", days_ago=30)
+        metrics_file = tmp_path / "metrics.json"
+
+        args = ["--repo-url", "https://github.com/owner/repo", "--max-idle-days", "7", "--dry-run", "false"]
+        result = CliRunner().invoke(main, args + ["--metrics-file", str(metrics_file)])
+
+        assert result.exit_code == 0, result.output
+        assert "Token Pool" in result.output
+        assert "token-one" not in result.output
+        tokens = json.loads(metrics_file.read_text())["tokens"]
+        assert sorted(tokens) == ["GH_TOKEN", "GH_TOKENS[0]", "GH_TOKENS[1]"]
+        """the fake rate limit is shared, so each token in turn has the most budget left (per resource)"""
+        requests = [token["requests"] for token in tokens.values()]
+        assert min(requests) > 0 and max(requests) - min(requests) <= 2
+
+    def test_retry_of_exhausted_token_goes_to_another_token(self, fake_github, monkeypatch):
+        fake_github.add_branch("main")
+        fake_github.exhausted_tokens.add("token-zero")
+        slept = []
+        pool = load_token_pool({"GH_TOKEN": "token-zero", "GH_TOKENS": "token-one"}, fake_github.base_url)
+        scheduler = RateLimitScheduler(sleep=slept.append)
+        transport.install(scheduler, pool=pool)
+        try:
+            gh = Github(auth=PooledAuth(pool), base_url=fake_github.base_url, retry=None, seconds_between_requests=None)
+            pool.prime(gh.requester)
+            fake_github.authorizations.clear()
+
+            repo = gh.get_repo(fake_github.full_name)
+        finally:
+            transport.install()
+
+        assert repo.default_branch == "main"
+        """the first attempt found token-zero exhausted; its retry was sent at once with token-one"""
+        assert fake_github.authorizations == ["token-zero", "token-one"]
+        assert slept == [0.0]
+        assert pool.tokens[0].usage.remaining["core"] == 0
+
+
+if __name__ == "__main__":
+    pytest.main()